@@ -0,0 +1,193 @@
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from database import open_connection, invalidate_record_cache, get_last_exported_id, set_last_exported_id
+from state_manager import BOLT_LAYOUT
+
+logger = logging.getLogger("archive")
+
+# Columnar archive of inspection history for analytics (pandas / pyarrow / DuckDB).
+# Layout (hive partitioning, readable with pyarrow.dataset / pandas.read_parquet):
+#   archive/day=2026-10-17/model=PCX%20160/part-<first id>-<last id>.parquet  (ids contained in that file)
+# Every file has the same schema: one int8 column per bolt of the catalog (BOLT_LAYOUT), encoded with
+# STATUS_CODES, plus 'other_bolts' (JSON of any statuses for bolts outside the catalog, else null).
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ARCHIVE_DIR = os.path.join(PROJECT_ROOT, "archive")
+ARCHIVE_NAME = "parquet_archive" # Key in export_state holding the last archived inspections.id
+ARCHIVE_CHUNK_SIZE = 20000
+STATUS_CODES = {"-": 0, "OK": 1, "NG": 2}
+BOLT_COLUMNS = sorted(bolt for bolts in BOLT_LAYOUT.values() for bolt in bolts)
+
+
+class _PartitionWriter:
+    """
+    Writes one (day, model) partition file; rows are appended as row groups. On close the file is
+    renamed into place as part-<first id>-<last id>.parquet, after the ids it actually contains.
+    """
+    def __init__(self, directory, first_id, schema):
+        self.directory = directory
+        self.first_id = first_id
+        self.last_id = first_id
+        self.path = None
+        self.tmp_path = os.path.join(directory, f"part-{first_id:010d}.parquet.tmp")
+        os.makedirs(directory, exist_ok=True)
+        self.writer = pq.ParquetWriter(self.tmp_path, schema, compression="zstd")
+
+    def write(self, table):
+        self.writer.write_table(table)
+        self.last_id = table.column("id")[-1].as_py()
+
+    def close(self):
+        self.writer.close()
+        self.path = os.path.join(self.directory, f"part-{self.first_id:010d}-{self.last_id:010d}.parquet")
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.writer.close()
+        os.remove(self.tmp_path)
+
+
+def _build_schema(bolt_cols):
+    fields = [
+        pa.field("id", pa.int64()),
+        pa.field("frame_id", pa.string()),
+        pa.field("check_time", pa.timestamp("s")),
+        pa.field("final_result", pa.dictionary(pa.int8(), pa.string())),
+    ]
+    fields += [pa.field(bolt, pa.int8()) for bolt in bolt_cols]
+    fields.append(pa.field("other_bolts", pa.string()))
+    return pa.schema(fields)
+
+
+def _rows_to_table(rows, bolt_cols, schema):
+    columns = {
+        "id": [r["id"] for r in rows],
+        "frame_id": [r["frame_id"] for r in rows],
+        "check_time": [datetime.strptime(r["check_time"], "%Y-%m-%d %H:%M:%S") for r in rows],
+        "final_result": [r["final_result"] for r in rows],
+    }
+    bolt_values = {bolt: [] for bolt in bolt_cols}
+    other_bolts = []
+    for r in rows:
+        bolt_data = json.loads(r["bolt_data"])
+        for bolt in bolt_cols:
+            bolt_values[bolt].append(STATUS_CODES.get(bolt_data.pop(bolt, "-"), 0))
+        other_bolts.append(json.dumps(bolt_data) if bolt_data else None)
+    columns.update(bolt_values)
+    columns["other_bolts"] = other_bolts
+    return pa.Table.from_pydict(columns, schema=schema)
+
+
+def archive_inspections(archive_dir=ARCHIVE_DIR, retention_days=None, chunk_size=ARCHIVE_CHUNK_SIZE):
+    """
+    Appends every inspection newer than the last archived id to the Parquet archive.
+    retention_days: if set, archived rows older than this many days are then deleted from SQLite
+                    (history images on disk are left untouched).
+    Returns a summary dict: {"archived", "files", "pruned", "last_id"}.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed; the Parquet archive is unavailable.")
+
+    start = time.perf_counter()
+    conn = open_connection()
+    writers = {}
+    files = []
+    archived = 0
+    try:
+        start_id = get_last_exported_id(ARCHIVE_NAME)
+        end_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM inspections").fetchone()[0]
+        bolt_cols = BOLT_COLUMNS
+        schema = _build_schema(bolt_cols)
+
+        last_id = start_id
+        while last_id < end_id:
+            rows = conn.execute('''
+                SELECT id, frame_id, model, check_time, final_result, bolt_data FROM inspections
+                WHERE id > ? AND id <= ?
+                ORDER BY id
+                LIMIT ?
+            ''', (last_id, end_id, chunk_size)).fetchall()
+            if not rows:
+                break
+
+            # Group the chunk by partition
+            partitions = {}
+            for r in rows:
+                partitions.setdefault((r["check_time"][:10], r["model"]), []).append(r)
+
+            for (day, model), part_rows in partitions.items():
+                key = (day, model)
+                if key not in writers:
+                    directory = os.path.join(archive_dir, f"day={day}", f"model={quote(model, safe='')}")
+                    writers[key] = _PartitionWriter(directory, part_rows[0]["id"], schema)
+                writers[key].write(_rows_to_table(part_rows, bolt_cols, schema))
+
+            # Ids are insertion ordered, so days before this chunk are complete: close their files
+            oldest_day = min(day for day, _ in partitions)
+            for key in [k for k in writers if k[0] < oldest_day]:
+                writers[key].close()
+                files.append(writers.pop(key).path)
+
+            archived += len(rows)
+            last_id = rows[-1]["id"]
+
+        for key in list(writers):
+            writers[key].close()
+            files.append(writers.pop(key).path)
+    except Exception:
+        # Nothing is marked as archived, so drop this run's partial output to avoid duplicates on retry
+        for writer in writers.values():
+            writer.abort()
+        for path in files:
+            os.remove(path)
+        conn.close()
+        raise
+
+    set_last_exported_id(ARCHIVE_NAME, end_id, conn)
+    pruned = _prune_archived(conn, end_id, retention_days) if retention_days else 0
+    conn.close()
+
+    logger.info(f"Archived {archived} inspections into {len(files)} file(s), pruned {pruned} "
+                f"in {time.perf_counter() - start:.1f}s")
+    return {"archived": archived, "files": files, "pruned": pruned, "last_id": end_id}
+
+
+def _prune_archived(conn, archived_id, retention_days, batch=5000):
+    """Deletes archived inspections older than retention_days (per-bolt rows cascade), in small batches."""
+    cutoff = (datetime.now() - timedelta(days=retention_days)).strftime("%Y-%m-%d %H:%M:%S")
+    pruned = 0
+    while True:
+        with conn:
+            cursor = conn.execute('''
+                DELETE FROM inspections WHERE id IN (
+                    SELECT id FROM inspections WHERE id <= ? AND check_time < ? LIMIT ?
+                )
+            ''', (archived_id, cutoff, batch))
+        pruned += cursor.rowcount
+        if cursor.rowcount < batch:
+            break
+    if pruned:
+        invalidate_record_cache()
+    return pruned
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Append new inspections to the Parquet archive.")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--retention-days", type=int, default=None,
+                        help="Delete archived rows older than this from SQLite")
+    args = parser.parse_args()
+    print(archive_inspections(args.archive_dir, retention_days=args.retention_days))
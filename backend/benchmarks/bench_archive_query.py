@@ -0,0 +1,91 @@
+"""
+Benchmark: analyst query on the wide CSV export vs. the partitioned Parquet archive.
+
+Query: NG rate per bolt over the last --days days (what QA typically loads into pandas).
+Both paths start from the same synthetic SQLite history (see bench_db_history.py).
+
+Usage (from the backend folder, requires pandas + pyarrow):
+    python benchmarks/bench_archive_query.py --rows 200000 --days 7
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+import database
+import archive
+from bench_db_history import populate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=7)
+    args = parser.parse_args()
+
+    if pd is None or archive.pa is None:
+        print("pandas and pyarrow are required for this benchmark.")
+        return 1
+
+    tmp_dir = tempfile.mkdtemp(prefix="qgate_bench_")
+    database.DB_PATH = os.path.join(tmp_dir, "bench.db")
+    print(f"Populating {args.rows:,} rows ...")
+    populate(database.DB_PATH, args.rows)
+    database.init_db()
+    since = datetime.now() - timedelta(days=args.days)
+
+    # --- CSV path: export, then load + filter in pandas ---
+    csv_path = os.path.join(tmp_dir, "export.csv")
+    start = time.perf_counter()
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        for chunk in database.iter_csv_export(export_name="bench"):
+            f.write(chunk)
+    csv_export_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    df = pd.read_csv(csv_path, parse_dates=["check_time"])
+    df = df[df["check_time"] >= since]
+    bolt_cols = [c for c in df.columns if c not in database.CSV_BASE_COLUMNS]
+    csv_rates = (df[bolt_cols] == "NG").mean().sort_values(ascending=False)
+    csv_query_s = time.perf_counter() - start
+
+    # --- Parquet path: archive, then read only the needed day partitions ---
+    archive_dir = os.path.join(tmp_dir, "archive")
+    start = time.perf_counter()
+    archive.archive_inspections(archive_dir)
+    archive_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pq_df = pd.read_parquet(archive_dir, filters=[("day", ">=", since.strftime("%Y-%m-%d"))])
+    pq_df = pq_df[pq_df["check_time"] >= since]
+    pq_rates = (pq_df[bolt_cols] == archive.STATUS_CODES["NG"]).mean().sort_values(ascending=False)
+    parquet_query_s = time.perf_counter() - start
+
+    csv_size = os.path.getsize(csv_path)
+    parquet_size = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(archive_dir) for f in files)
+    same = (csv_rates.round(6) == pq_rates.reindex(csv_rates.index).round(6)).all()
+
+    print(f"\n{'path':<10}{'produce s':>12}{'query s':>12}{'size MB':>12}")
+    print(f"{'CSV':<10}{csv_export_s:>12.2f}{csv_query_s:>12.3f}{csv_size / 1e6:>12.1f}")
+    print(f"{'Parquet':<10}{archive_s:>12.2f}{parquet_query_s:>12.3f}{parquet_size / 1e6:>12.1f}")
+    print(f"\nQuery speedup: {csv_query_s / parquet_query_s:.1f}x, results match: {'yes' if same else 'NO'}")
+
+    database.close_connection()
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Benchmark: inspection history queries and inserts on a large SQLite database.
+
+Builds a temporary database with --rows synthetic inspections (default 1,000,000), then compares:
+- legacy: new sqlite3 connection per call, no indexes (the original database.py behaviour)
+- tuned:  persistent WAL connection + migrated indexes (database.get_connection / init_db)
+
+Usage (from the backend folder):
+    python benchmarks/bench_db_history.py --rows 1000000
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+import database
+from state_manager import StateManager
+
+BOLTS = [bolt for side in StateManager().bolt_data.values() for bolt in side]
+
+
+def populate(path, rows, batch=50000):
+    """Creates the original (unindexed) schema and fills it with synthetic rows."""
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE inspections (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            frame_id TEXT NOT NULL,
+            model TEXT NOT NULL,
+            check_time DATETIME NOT NULL,
+            final_result TEXT NOT NULL,
+            bolt_data TEXT NOT NULL,
+            images TEXT NOT NULL
+        )
+    ''')
+    start_time = datetime.now() - timedelta(seconds=rows * 30)
+    images_json = json.dumps({"right_step1": "right/x.jpg", "left_step1": "left/x.jpg"})
+    for offset in range(0, rows, batch):
+        data = []
+        for i in range(offset, min(rows, offset + batch)):
+            bolts = {b: ("NG" if random.random() < 0.02 else "OK") for b in BOLTS}
+            final = "NG" if "NG" in bolts.values() else "OK"
+            check_time = (start_time + timedelta(seconds=i * 30)).strftime("%Y-%m-%d %H:%M:%S")
+            data.append((f"MH1{i:014d}", "PCX 160", check_time, final, json.dumps(bolts), images_json))
+        conn.executemany(
+            "INSERT INTO inspections (frame_id, model, check_time, final_result, bolt_data, images) VALUES (?, ?, ?, ?, ?, ?)",
+            data,
+        )
+        conn.commit()
+    conn.close()
+
+
+def timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def legacy_history(path, limit=50):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute("SELECT * FROM inspections ORDER BY check_time DESC LIMIT ?", (limit,)).fetchall()
+    result = [dict(r) | {"bolt_data": json.loads(r["bolt_data"])} for r in rows]
+    conn.close()
+    return result
+
+
+def legacy_insert(path):
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "INSERT INTO inspections (frame_id, model, check_time, final_result, bolt_data, images) VALUES (?, ?, ?, ?, ?, ?)",
+        ("BENCH", "PCX 160", datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "OK", json.dumps({b: "OK" for b in BOLTS}), "{}"),
+    )
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="qgate_bench_")
+    path = os.path.join(tmp_dir, "bench.db")
+    print(f"Populating {args.rows:,} rows in {path} ...")
+    start = time.perf_counter()
+    populate(path, args.rows)
+    print(f"  done in {time.perf_counter() - start:.1f}s")
+
+    results = {}
+    results["legacy get_history(50)"] = timed(lambda: legacy_history(path), args.repeat)
+    results["legacy save_inspection"] = timed(lambda: legacy_insert(path), args.repeat)
+
+    database.DB_PATH = path
+    start = time.perf_counter()
+    database.init_db()
+    print(f"Migration (index build) took {time.perf_counter() - start:.1f}s")
+
+    results["tuned get_history(50)"] = timed(lambda: database.get_history(50), args.repeat)
+    bolt_data = {b: "OK" for b in BOLTS}
+    results["tuned save_inspection"] = timed(
+        lambda: database.save_inspection("BENCH", "PCX 160", "OK", bolt_data, {}), args.repeat
+    )
+
+    print(f"\n{'operation':<28}{'median ms':>12}")
+    for name, value in results.items():
+        print(f"{name:<28}{value:>12.2f}")
+
+    database.close_connection()
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+Benchmark: Frame ID OCR latency per recognition path.
+
+Paths (result cache disabled, so every crop is really recognized):
+- full:      PaddleOCR detection + recognition pipeline on the crop
+- rec-only:  en_PP-OCRv4_mobile_rec alone on the normalized crop
+- fast:      what production runs (OCR_REC_ONLY = True): rec-only, full pipeline when confidence is low
+Per path it reports median / p95 latency per crop and the share of crops whose text matches the
+full pipeline; for "fast" also how often it fell back.
+
+Sample crops are read from --crops (images of the FRAME_ID label, as cropped by the pipeline). If that
+folder has none, they are cut out of the upper-camera images in --images with best.pt.
+
+Usage (from the backend folder):
+    python benchmarks/bench_ocr_paths.py --crops test_images/frame_id_crops --repeat 3
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+import cv2
+
+from export_model import find_images
+from metrics import metrics
+from ocr_processor import PADDLEOCR_AVAILABLE, RealOcrProcessor
+from pipeline import crop_frame_id
+
+
+def load_crops(crops_dir, images_dir, model_path):
+    crops = [img for img in (cv2.imread(p) for p in find_images(crops_dir)) if img is not None]
+    if crops:
+        return crops
+    from yolo_processor import ULTRALYTICS_AVAILABLE, RealYoloProcessor
+    if not ULTRALYTICS_AVAILABLE:
+        return []
+    yolo = RealYoloProcessor(model_path, inference_mode="SEQUENTIAL")
+    for path in find_images(images_dir):
+        frame = cv2.imread(path)
+        if frame is None:
+            continue
+        _, _, details = yolo.process(frame)
+        info = next((d for d in details if "FRAME_ID" in d["label"]), None)
+        crop = crop_frame_id(frame, info) if info else None
+        if crop is not None:
+            crops.append(crop.copy())
+    return crops
+
+
+def run(read, crops, repeat):
+    """Returns ([text per crop], [latency ms per call])."""
+    read(crops[0])
+    texts, timings = [], []
+    for i in range(repeat):
+        for crop in crops:
+            start = time.perf_counter()
+            text = read(crop)
+            timings.append((time.perf_counter() - start) * 1000)
+            if i == 0:
+                texts.append(text)
+    return texts, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--crops", default=os.path.join(backend_dir, "test_images", "frame_id_crops"))
+    parser.add_argument("--images", default=os.path.join(backend_dir, "test_images"))
+    parser.add_argument("--model", default=os.path.join(backend_dir, "best.pt"))
+    parser.add_argument("--min-confidence", type=float, default=0.85)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if not PADDLEOCR_AVAILABLE:
+        print("paddleocr is required for this benchmark.")
+        return 1
+    crops = load_crops(args.crops, args.images, args.model)
+    if not crops:
+        print(f"No Frame ID crops found in {args.crops} (or detected in {args.images}).")
+        return 1
+    print(f"{len(crops)} crops")
+
+    full = RealOcrProcessor(cache_size=0, rec_only=False)
+    fast = RealOcrProcessor(cache_size=0, rec_only=True, rec_min_confidence=args.min_confidence)
+    if fast.recognizer is None:
+        print("Recognition model could not be loaded.")
+        return 1
+
+    reference, full_timings = run(full.process, crops, args.repeat)
+    rec_texts, rec_timings = run(lambda c: fast._recognize_fast(fast.recognizer, c)[0], crops, args.repeat)
+    before = metrics.snapshot()["counters"].get("ocr.fast_path_fallbacks", 0)
+    fast_texts, fast_timings = run(fast.process, crops, args.repeat)
+    fallbacks = metrics.snapshot()["counters"].get("ocr.fast_path_fallbacks", 0) - before
+    calls = len(crops) * args.repeat + 1 # + warm-up call
+
+    agreement = lambda texts: sum(a == b for a, b in zip(reference, texts)) / len(crops)
+    rows = [
+        ("full", full_timings, 1.0, None),
+        ("rec-only", rec_timings, agreement(rec_texts), None),
+        ("fast", fast_timings, agreement(fast_texts), fallbacks / calls),
+    ]
+
+    print(f"\n{'path':<10}{'median ms':>11}{'p95 ms':>9}{'same text':>11}{'fallback':>10}")
+    for name, timings, same, fallback in rows:
+        p95 = sorted(timings)[int(0.95 * (len(timings) - 1))]
+        fallback = f"{fallback:.1%}" if fallback is not None else "-"
+        print(f"{name:<10}{statistics.median(timings):>11.1f}{p95:>9.1f}{same:>11.1%}{fallback:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
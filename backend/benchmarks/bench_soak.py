@@ -0,0 +1,242 @@
+"""
+Soak / load test: replays unit cycles (enter -> step 1 -> step 2 -> exit) at production line rate
+against the full control loop + inspection pipeline, and reports over time:
+- step1_total_ms / step2_total_ms p50 / p95 / p99 (trigger -> unit state updated, see pipeline.py)
+- dropped triggers: coalesced by the Modbus handler, captures that never completed, units never saved
+- DB write rate (inspections saved per minute) and resident memory growth
+
+The system runs in this process (main.py, mode from --mode), with the SQLite database and history
+images redirected to a temporary folder, so it runs fully offline and leaves the real history untouched.
+Triggers are injected either in-process (ModbusHandler.set_mock_signal) or, with --transport modbus,
+written to holding register 1 by a pymodbus TCP client, exactly like the PLC (requires --mode TEST).
+
+Usage (from the backend folder):
+    python benchmarks/bench_soak.py --units-per-min 30 --duration 3600
+    python benchmarks/bench_soak.py --mode TEST --transport modbus --units-per-min 60 --duration 14400
+"""
+import argparse
+import logging
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+# Holding register 1 values (see the Modbus Register Mapping in README.md)
+CYCLE = [("unit_enter", 1), ("capture_step_1", 2), ("capture_step_2", 3), ("unit_exit", 4)]
+
+
+def rss_mb():
+    """Current resident memory (peak RSS where /proc is not available)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class InProcessTransport:
+    def __init__(self, modbus):
+        self.modbus = modbus
+
+    def send(self, trigger, value):
+        self.modbus.set_mock_signal(trigger)
+
+    def close(self):
+        pass
+
+
+class ModbusClientTransport:
+    """Acts as the PLC: writes the trigger value to holding register 1 over Modbus TCP."""
+    def __init__(self, host, port):
+        from pymodbus.client import ModbusTcpClient
+        self.client = ModbusTcpClient(host, port=port)
+        deadline = time.monotonic() + 10
+        while not self.client.connect():
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Could not connect to the Modbus server on {host}:{port}")
+            time.sleep(0.5)
+
+    def send(self, trigger, value):
+        result = self.client.write_register(1, value)
+        if result.isError():
+            raise RuntimeError(f"Modbus write of {trigger} failed: {result}")
+
+    def close(self):
+        self.client.close()
+
+
+class SoakRun:
+    def __init__(self, main, transport, units_per_min, step_gap):
+        self.main = main
+        self.transport = transport
+        self.cycle_s = 60.0 / units_per_min
+        # Spacing between the signals of one unit (never more than a quarter of the cycle)
+        self.step_gap = min(step_gap, self.cycle_s / 4)
+        self.sent = {trigger: 0 for trigger, _ in CYCLE}
+        self.send_errors = 0
+        self.saved_times = []
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+
+    def on_saved(self, record):
+        with self.lock:
+            self.saved_times.append(time.monotonic())
+
+    def generate(self, duration):
+        """Sends unit cycles on an absolute schedule (no drift when a send is slow)."""
+        start = time.monotonic()
+        unit = 0
+        while not self.stop.is_set():
+            cycle_start = start + unit * self.cycle_s
+            if cycle_start - start >= duration:
+                break
+            for i, (trigger, value) in enumerate(CYCLE):
+                delay = cycle_start + i * self.step_gap - time.monotonic()
+                if delay > 0 and self.stop.wait(delay):
+                    return
+                try:
+                    self.transport.send(trigger, value)
+                    self.sent[trigger] += 1
+                except Exception as e:
+                    logging.error(f"Trigger {trigger} failed: {e}")
+                    self.send_errors += 1
+            unit += 1
+
+    def snapshot(self):
+        data = self.main.metrics.snapshot()
+        with self.lock:
+            saved = len(self.saved_times)
+        return {
+            "time": time.monotonic(),
+            "saved": saved,
+            "rss_mb": rss_mb(),
+            "coalesced": data["counters"].get("modbus.triggers_coalesced", 0),
+            "latencies": data["latencies_ms"],
+        }
+
+
+def completed(snapshot, step):
+    return snapshot["latencies"].get(f"step{step}_total_ms", {}).get("count", 0)
+
+
+def percentiles(snapshot, step):
+    summary = snapshot["latencies"].get(f"step{step}_total_ms")
+    if not summary:
+        return "-"
+    return f"{summary['p50']:.0f}/{summary['p95']:.0f}/{summary['p99']:.0f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", default="MOCK", choices=["MOCK", "TEST"])
+    parser.add_argument("--transport", default="inprocess", choices=["inprocess", "modbus"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5020)
+    parser.add_argument("--units-per-min", type=float, default=30)
+    parser.add_argument("--duration", type=float, default=600, help="Seconds of trigger generation")
+    parser.add_argument("--step-gap", type=float, default=0.5, help="Seconds between the signals of one unit")
+    parser.add_argument("--report-interval", type=float, default=60)
+    parser.add_argument("--drain", type=float, default=30, help="Max seconds to wait for in-flight units at the end")
+    args = parser.parse_args()
+    if args.transport == "modbus" and args.mode != "TEST":
+        parser.error("--transport modbus needs --mode TEST (MOCK does not start the Modbus server)")
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    os.environ["QGATE_SYSTEM_MODE"] = args.mode
+    os.chdir(backend_dir)
+    import database
+    import main as qgate
+
+    # Keep the soak data away from the real history
+    work_dir = tempfile.mkdtemp(prefix="qgate-soak-")
+    database.DB_PATH = os.path.join(work_dir, "inspection_history.db")
+    qgate.state_manager.history_dir = os.path.join(work_dir, "history_images")
+    database.init_db()
+    print(f"Mode {args.mode}, transport {args.transport}, {args.units_per_min:g} units/min, data in {work_dir}")
+
+    control = threading.Thread(target=qgate.control_loop, name="control-loop", daemon=True)
+    control.start()
+    deadline = time.monotonic() + 600
+    while not qgate.models_ready.wait(timeout=0.5):
+        if not control.is_alive():
+            print(f"Startup failed: {qgate.startup_error}")
+            return 1
+        if time.monotonic() > deadline:
+            print("Models did not load within 10 minutes.")
+            return 1
+    # Same as pressing Start on the dashboard: triggers are ignored while the engine is paused
+    qgate.state_manager.set_engine_active(True)
+
+    try:
+        transport = (
+            ModbusClientTransport(args.host, args.port) if args.transport == "modbus"
+            else InProcessTransport(qgate.modbus)
+        )
+    except RuntimeError as e:
+        print(e)
+        return 1
+    run = SoakRun(qgate, transport, args.units_per_min, args.step_gap)
+    database.add_insert_listener(run.on_saved)
+    generator = threading.Thread(target=run.generate, args=(args.duration,), name="soak-generator", daemon=True)
+
+    baseline = run.snapshot()
+    previous = baseline
+    warm = None # First report: memory growth is measured from here, past allocator / cache warm-up
+    generator.start()
+    print(f"\n{'elapsed':>8}{'sent':>7}{'saved':>7}{'writes/min':>12}{'step1 p50/95/99':>18}"
+          f"{'step2 p50/95/99':>18}{'coalesced':>11}{'RSS MB':>9}")
+    try:
+        while generator.is_alive():
+            generator.join(args.report_interval)
+            current = run.snapshot()
+            interval = current["time"] - previous["time"]
+            rate = (current["saved"] - previous["saved"]) * 60 / interval if interval > 0 else 0.0
+            print(f"{current['time'] - baseline['time']:>7.0f}s{run.sent['unit_exit']:>7}{current['saved']:>7}"
+                  f"{rate:>12.1f}{percentiles(current, 1):>18}{percentiles(current, 2):>18}"
+                  f"{current['coalesced']:>11}{current['rss_mb']:>9.0f}")
+            previous = current
+            warm = warm or current
+    except KeyboardInterrupt:
+        run.stop.set()
+        generator.join()
+
+    # Let in-flight units finish before counting what was lost
+    deadline = time.monotonic() + args.drain
+    while run.snapshot()["saved"] < run.sent["unit_exit"] and time.monotonic() < deadline:
+        time.sleep(0.5)
+    final = run.snapshot()
+    transport.close()
+
+    hours = (final["time"] - baseline["time"]) / 3600
+    with run.lock:
+        gaps = [b - a for a, b in zip(run.saved_times, run.saved_times[1:])]
+    print(f"\nUnits sent / saved:        {run.sent['unit_exit']} / {final['saved']} "
+          f"({run.sent['unit_exit'] - final['saved']} not saved)")
+    for step in (1, 2):
+        sent = run.sent[f"capture_step_{step}"]
+        print(f"Step {step} captures:          {completed(final, step)} of {sent} completed, "
+              f"p50/p95/p99 {percentiles(final, step)} ms")
+    print(f"Coalesced triggers:        {final['coalesced'] - baseline['coalesced']} (send errors: {run.send_errors})")
+    if gaps:
+        print(f"DB write rate:             {final['saved'] / (hours * 60):.1f}/min, "
+              f"median gap {statistics.median(gaps):.2f}s, max gap {max(gaps):.2f}s")
+    print(f"Memory:                    {baseline['rss_mb']:.0f} -> {final['rss_mb']:.0f} MB")
+    warm_hours = (final["time"] - warm["time"]) / 3600 if warm else 0
+    if warm_hours > 0:
+        growth = final["rss_mb"] - warm["rss_mb"]
+        print(f"Growth after first report: {growth:+.0f} MB ({growth / warm_hours:+.1f} MB/h)")
+    print("Latency percentiles are over the last 1000 samples of each metric (see metrics.py).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
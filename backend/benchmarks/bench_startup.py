@@ -0,0 +1,71 @@
+"""
+Benchmark: process startup time and memory per SYSTEM_MODE.
+
+Each mode runs in a fresh interpreter (so nothing is cached between runs) and reports:
+- import:   time to `import main` (the dashboard is reachable from this point)
+- ready:    time until load_models() has built and warmed up the YOLO/OCR processors
+- RSS:      peak resident memory of the process
+Heavy frameworks (ultralytics/torch, paddleocr/paddle) are only imported by the REAL processors,
+so MOCK should start in well under a second.
+
+Usage (from the backend folder):
+    python benchmarks/bench_startup.py --modes MOCK TEST REAL --repeat 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD_SCRIPT = r"""
+import json, logging, resource, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.load_models()
+ready = time.perf_counter()
+heavy = [m for m in ("torch", "ultralytics", "paddle", "paddleocr") if m in sys.modules]
+logging.shutdown()
+print("RESULT " + json.dumps({
+    "import_s": imported - start,
+    "ready_s": ready - start,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy": heavy,
+}), flush=True)
+"""
+
+
+def run_once(mode):
+    env = dict(os.environ, QGATE_SYSTEM_MODE=mode)
+    proc = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT], cwd=backend_dir, env=env,
+        capture_output=True, text=True, timeout=600
+    )
+    for line in proc.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    raise RuntimeError(f"{mode} run failed:\n{proc.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["MOCK", "TEST", "REAL"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'mode':<8}{'import s':>10}{'ready s':>10}{'RSS MB':>10}  heavy modules loaded")
+    for mode in args.modes:
+        runs = [run_once(mode) for _ in range(args.repeat)]
+        import_s = statistics.median(r["import_s"] for r in runs)
+        ready_s = statistics.median(r["ready_s"] for r in runs)
+        rss_mb = statistics.median(r["rss_mb"] for r in runs)
+        heavy = ", ".join(runs[-1]["heavy"]) or "-"
+        print(f"{mode:<8}{import_s:>10.2f}{ready_s:>10.2f}{rss_mb:>10.0f}  {heavy}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Benchmark: accuracy and latency of the exported YOLO backends against the PyTorch model.
+
+Every image under test_images/ is run through best.pt (ultralytics, the reference) and each
+given ONNX model (onnxruntime). Per backend it reports median / p95 latency per image and,
+relative to the reference detections (same label, IoU >= --iou):
+- precision / recall of the boxes
+- label agreement: share of images whose set of detected labels is identical (what the dashboard uses)
+
+Usage (from the backend folder, after `python export_model.py --int8`):
+    python benchmarks/bench_yolo_backends.py --onnx best.onnx best-int8.onnx
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+import cv2
+
+from export_model import find_images
+from yolo_processor import ULTRALYTICS_AVAILABLE, ONNXRUNTIME_AVAILABLE, RealYoloProcessor, OnnxYoloProcessor
+
+
+def iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match(reference, candidate, threshold):
+    """Greedy one-to-one matching by label and IoU. Returns the number of matched boxes."""
+    unmatched = list(reference)
+    matched = 0
+    for d in sorted(candidate, key=lambda d: -d.get("conf", 0)):
+        best = max(
+            (r for r in unmatched if r["label"] == d["label"]),
+            key=lambda r: iou(r["box"], d["box"]), default=None
+        )
+        if best is not None and iou(best["box"], d["box"]) >= threshold:
+            unmatched.remove(best)
+            matched += 1
+    return matched
+
+
+def run(processor, images, warmup=3):
+    """Returns ([details per image], [latency ms per image])."""
+    for frame in images[:warmup]:
+        processor.process(frame)
+    details, timings = [], []
+    for frame in images:
+        start = time.perf_counter()
+        _, _, d = processor.process(frame)
+        timings.append((time.perf_counter() - start) * 1000)
+        details.append(d)
+    return details, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=os.path.join(backend_dir, "best.pt"))
+    parser.add_argument("--onnx", nargs="+", default=[os.path.join(backend_dir, "best.onnx")])
+    parser.add_argument("--images", default=os.path.join(backend_dir, "test_images"))
+    parser.add_argument("--iou", type=float, default=0.5)
+    args = parser.parse_args()
+
+    if not ULTRALYTICS_AVAILABLE or not ONNXRUNTIME_AVAILABLE:
+        print("ultralytics and onnxruntime are required for this benchmark.")
+        return 1
+    paths = find_images(args.images)
+    images = [img for img in (cv2.imread(p) for p in paths) if img is not None]
+    if not images:
+        print(f"No images found in {args.images}.")
+        return 1
+    print(f"{len(images)} images from {args.images}")
+
+    reference, ref_timings = run(RealYoloProcessor(args.model, inference_mode="SEQUENTIAL"), images)
+    ref_boxes = sum(len(d) for d in reference)
+    rows = [("pytorch", statistics.median(ref_timings), sorted(ref_timings)[int(0.95 * (len(ref_timings) - 1))],
+             1.0, 1.0, 1.0)]
+
+    for onnx_path in args.onnx:
+        processor = OnnxYoloProcessor(onnx_path)
+        if processor.session is None:
+            print(f"Skipping {onnx_path}: could not be loaded.")
+            continue
+        details, timings = run(processor, images)
+        matched = sum(match(r, d, args.iou) for r, d in zip(reference, details))
+        found = sum(len(d) for d in details)
+        agreement = sum(
+            {x["label"] for x in r} == {x["label"] for x in d} for r, d in zip(reference, details)
+        ) / len(images)
+        rows.append((
+            os.path.basename(onnx_path), statistics.median(timings),
+            sorted(timings)[int(0.95 * (len(timings) - 1))],
+            matched / found if found else 1.0, matched / ref_boxes if ref_boxes else 1.0, agreement
+        ))
+
+    print(f"\n{'backend':<20}{'median ms':>11}{'p95 ms':>9}{'precision':>11}{'recall':>9}{'labels':>9}")
+    for name, median, p95, precision, recall, agreement in rows:
+        print(f"{name:<20}{median:>11.1f}{p95:>9.1f}{precision:>11.3f}{recall:>9.3f}{agreement:>9.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Benchmark: sequential vs batched vs parallel YOLO inference for one capture step.
+
+Usage (from the backend folder):
+    python benchmarks/bench_yolo_parallel.py --model best.pt --iterations 20 --step 1
+
+Frames are read from test_images/step<N>/<camera>/ (first image per camera). If a camera
+folder is empty, a synthetic frame of --width x --height is used instead.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+import cv2
+import numpy as np
+
+from yolo_processor import ULTRALYTICS_AVAILABLE, INFERENCE_MODES, RealYoloProcessor
+
+CAMERAS = ["left", "right", "upper"]
+
+
+def load_frames(step, width, height):
+    frames = {}
+    for cam in CAMERAS:
+        frame = None
+        dir_path = os.path.join(backend_dir, "test_images", f"step{step}", cam)
+        if os.path.isdir(dir_path):
+            files = sorted(f for f in os.listdir(dir_path) if f.lower().endswith(('.png', '.jpg', '.jpeg')))
+            if files:
+                frame = cv2.imread(os.path.join(dir_path, files[0]))
+        if frame is None:
+            frame = np.random.randint(0, 255, (height, width, 3), np.uint8)
+        frames[cam] = frame
+    return frames
+
+
+def run_mode(processor, frames, iterations, warmup):
+    for _ in range(warmup):
+        processor.process_many(frames)
+
+    timings = []
+    results = None
+    for _ in range(iterations):
+        start = time.perf_counter()
+        results = processor.process_many(frames)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=os.path.join(backend_dir, "best.pt"))
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--step", type=int, default=1, choices=[1, 2])
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    args = parser.parse_args()
+
+    if not ULTRALYTICS_AVAILABLE:
+        print("ultralytics is not installed, nothing to benchmark.")
+        return 1
+
+    frames = load_frames(args.step, args.width, args.height)
+    print("Frames: " + ", ".join(f"{k}={v.shape[1]}x{v.shape[0]}" for k, v in frames.items()))
+
+    reference = None
+    print(f"{'mode':<12}{'mean ms':>10}{'p50 ms':>10}{'min ms':>10}{'speedup':>10}  match")
+    baseline_mean = None
+    for mode in INFERENCE_MODES:
+        processor = RealYoloProcessor(args.model, inference_mode=mode)
+        if processor.model is None:
+            print(f"Could not load model from {args.model}")
+            return 1
+        timings, results = run_mode(processor, frames, args.iterations, args.warmup)
+        processor.close()
+
+        labels = {cam: sorted(r[0]) if r else None for cam, r in results.items()}
+        if reference is None:
+            reference = labels
+        mean = statistics.mean(timings)
+        if baseline_mean is None:
+            baseline_mean = mean
+        print(f"{mode:<12}{mean:>10.1f}{statistics.median(timings):>10.1f}{min(timings):>10.1f}"
+              f"{baseline_mean / mean:>9.2f}x  {'yes' if labels == reference else 'NO'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
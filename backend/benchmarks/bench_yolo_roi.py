@@ -0,0 +1,100 @@
+"""
+Benchmark: ROI-only vs full-frame YOLO inference latency (YOLO_ROI_LAYOUT in main.py).
+
+The same camera frames are run through process_many() twice: once on the full frames and once
+with the ROI layout, where each crop is inferred at the pixel scale of full-frame inference.
+Reports median / p95 latency per capture step, the network input pixel fraction of the ROI path
+(yolo.roi_pixel_fraction) and how often both paths detect the same set of bolts.
+
+The layout is a JSON file in the YOLO_ROI_LAYOUT format ({cam: {bolt_id: [x1, y1, x2, y2]}}, 0..1).
+Frames come from test_images/step1/<camera>/.
+
+Usage (from the backend folder):
+    python benchmarks/bench_yolo_roi.py --layout roi_layout.json --backend PYTORCH --steps 20
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+import cv2
+
+from export_model import find_images
+from metrics import metrics
+from yolo_processor import ULTRALYTICS_AVAILABLE, ONNXRUNTIME_AVAILABLE, OnnxYoloProcessor, RealYoloProcessor
+
+CAMERAS = ["left", "right", "upper"]
+
+
+def load_steps(images_dir, steps):
+    """Returns up to 'steps' dicts {camera: frame}, cycling through each camera's images."""
+    paths = {cam: find_images(os.path.join(images_dir, "step1", cam)) for cam in CAMERAS}
+    paths = {cam: p for cam, p in paths.items() if p}
+    if not paths:
+        return []
+    images = {cam: [img for img in (cv2.imread(p) for p in cam_paths) if img is not None] for cam, cam_paths in paths.items()}
+    return [{cam: imgs[i % len(imgs)] for cam, imgs in images.items() if imgs} for i in range(steps)]
+
+
+def run(processor, steps, warmup=2):
+    """Returns ([set of detected bolts per step], [latency ms per step])."""
+    for frames in steps[:warmup]:
+        processor.process_many(frames)
+    detected, timings = [], []
+    for frames in steps:
+        start = time.perf_counter()
+        results = processor.process_many(frames)
+        timings.append((time.perf_counter() - start) * 1000)
+        detected.append({bolt for result in results.values() if result for bolt in result[0]})
+    return detected, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--layout", required=True, help="JSON file in the YOLO_ROI_LAYOUT format")
+    parser.add_argument("--backend", default="PYTORCH", choices=["PYTORCH", "ONNX"])
+    parser.add_argument("--model", default=None, help="best.pt (PYTORCH) or best.onnx (ONNX)")
+    parser.add_argument("--images", default=os.path.join(backend_dir, "test_images"))
+    parser.add_argument("--steps", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.backend == "PYTORCH" and not ULTRALYTICS_AVAILABLE or args.backend == "ONNX" and not ONNXRUNTIME_AVAILABLE:
+        print(f"The {args.backend} backend is not installed.")
+        return 1
+    with open(args.layout) as f:
+        layout = json.load(f)
+    steps = load_steps(args.images, args.steps)
+    if not steps:
+        print(f"No camera images found in {args.images}/step1/<camera>.")
+        return 1
+
+    def build():
+        if args.backend == "ONNX":
+            return OnnxYoloProcessor(args.model or os.path.join(backend_dir, "best.onnx"))
+        return RealYoloProcessor(args.model or os.path.join(backend_dir, "best.pt"), inference_mode="BATCH")
+
+    full_detected, full_timings = run(build(), steps)
+    roi = build()
+    roi.set_rois(layout)
+    roi_detected, roi_timings = run(roi, steps)
+    fraction = metrics.snapshot()["gauges"].get("yolo.roi_pixel_fraction")
+    agreement = sum(a == b for a, b in zip(full_detected, roi_detected)) / len(steps)
+
+    print(f"{len(steps)} steps, cameras: {', '.join(steps[0])}, backend {args.backend}")
+    print(f"\n{'path':<8}{'median ms':>11}{'p95 ms':>9}")
+    for name, timings in (("full", full_timings), ("roi", roi_timings)):
+        p95 = sorted(timings)[int(0.95 * (len(timings) - 1))]
+        print(f"{name:<8}{statistics.median(timings):>11.1f}{p95:>9.1f}")
+    if fraction is not None:
+        print(f"\nROI input pixels: {fraction:.1%} of full-frame inference")
+    print(f"Same detected bolts: {agreement:.1%} of steps")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
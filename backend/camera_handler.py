@@ -4,9 +4,21 @@ import numpy as np
 import time
 import os
 import random
+import threading
+from collections import OrderedDict, deque
+
+from metrics import metrics
 
 logger = logging.getLogger("camera_handler")
 
+# Real cameras: frames kept per camera by the grabber threads (timestamped with time.monotonic())
+FRAME_BUFFER_SIZE = 4
+# Max seconds capture_all waits (for all cameras together) for frames taken at/after the trigger
+FRAME_WAIT_TIMEOUT = 0.2
+# If no such frame arrives in time, the newest frame is only used if it is at most this much older
+# than the trigger (about one frame interval); otherwise the camera is reported as failed
+FRAME_MAX_AGE = 0.1
+
 # Abstract Base Class
 class CameraHandlerBase:
     def __init__(self):
@@ -15,7 +27,8 @@ class CameraHandlerBase:
     def initialize(self):
         pass
         
-    def capture_all(self, step=1):
+    def capture_all(self, step=1, trigger_time=None):
+        """Returns {cam_name: frame}. trigger_time (time.monotonic()) is only used by real cameras."""
         raise NotImplementedError
         
     def release(self):
@@ -26,7 +39,7 @@ class MockCameraHandler(CameraHandlerBase):
     def initialize(self):
         logger.info("MOCK Camera: Initialized.")
 
-    def capture_all(self, step=1):
+    def capture_all(self, step=1, trigger_time=None):
         frames = {}
         for name in self.cam_names:
             frames[name] = self._generate_mock_frame(f"{name} Step {step}")
@@ -44,16 +57,38 @@ class MockCameraHandler(CameraHandlerBase):
         return img
 
 # File Implementation (From Directory)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+# TEST replay order: "RANDOM" (random.Random(seed), reproducible when seeded) or "SEQUENTIAL" (sorted, wrapping)
+REPLAY_ORDERS = ["RANDOM", "SEQUENTIAL"]
+
 class FileCameraHandler(CameraHandlerBase):
-    def __init__(self, base_dir="test_images"):
+    """
+    Replays images from test_images/step{N}/{camera}.
+    - Directory listings are indexed once and only re-scanned when the directory mtime changes
+    - cache_size > 0 keeps that many decoded images in an LRU cache (no JPEG decoding on hits)
+    - replay_fps limits capture_all to that many captures per second, like a real camera (None = no limit)
+    """
+    def __init__(self, base_dir="test_images", replay_order="RANDOM", seed=None, cache_size=0, replay_fps=None):
         super().__init__()
         self.base_dir = base_dir
         self.last_upper_frame = None
+        self.replay_order = replay_order if replay_order in REPLAY_ORDERS else "RANDOM"
+        self.rng = random.Random(seed)
+        self.cache_size = cache_size
+        self.replay_fps = replay_fps
+        self._index = {} # dir_path -> (mtime, sorted file names)
+        self._positions = {} # dir_path -> next index (SEQUENTIAL)
+        self._cache = OrderedDict() # img_path -> (mtime, decoded image)
+        self._last_capture = None
         
     def initialize(self):
-        logger.info(f"TEST Camera: Reading from step-specific directories in {self.base_dir}")
+        logger.info(
+            f"TEST Camera: Reading from step-specific directories in {self.base_dir} "
+            f"(order: {self.replay_order}, cache: {self.cache_size}, fps: {self.replay_fps or 'unlimited'})"
+        )
 
-    def capture_all(self, step=1):
+    def capture_all(self, step=1, trigger_time=None):
+        self._pace()
         frames = {}
         for name in self.cam_names:
             # Special case: Upper camera in Step 2 uses the exact same image from Step 1
@@ -67,33 +102,145 @@ class FileCameraHandler(CameraHandlerBase):
 
             # Construct path: e.g., test_images/step1/right
             dir_path = os.path.join(self.base_dir, f"step{step}", name)
+            files = self._list_images(dir_path)
             
-            if os.path.exists(dir_path):
-                files = [f for f in os.listdir(dir_path) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
-                if files:
-                    chosen_file = random.choice(files)
-                    img_path = os.path.join(dir_path, chosen_file)
-                    img = cv2.imread(img_path)
-                    if img is not None:
-                         frames[name] = img
-                         # Cache upper camera image if this is step 1
-                         if step == 1 and name == "upper":
-                             self.last_upper_frame = img
-                    else:
-                        logger.warning(f"Failed to read image: {img_path}")
-                        frames[name] = self._generate_error_frame(f"Read Error {name}")
+            if files is None:
+                frames[name] = self._generate_error_frame(f"No Dir step{step}/{name}")
+            elif files:
+                img_path = os.path.join(dir_path, self._next_file(dir_path, files))
+                img = self._load(img_path)
+                if img is not None:
+                     frames[name] = img
+                     # Cache upper camera image if this is step 1
+                     if step == 1 and name == "upper":
+                         self.last_upper_frame = img
                 else:
-                    frames[name] = self._generate_error_frame(f"No Files {name}")
+                    logger.warning(f"Failed to read image: {img_path}")
+                    frames[name] = self._generate_error_frame(f"Read Error {name}")
             else:
-                frames[name] = self._generate_error_frame(f"No Dir step{step}/{name}")
+                frames[name] = self._generate_error_frame(f"No Files {name}")
         return frames
 
+    def _pace(self):
+        """Sleeps so that captures are at least 1 / replay_fps seconds apart."""
+        if self.replay_fps:
+            if self._last_capture is not None:
+                delay = self._last_capture + 1.0 / self.replay_fps - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            self._last_capture = time.monotonic()
+
+    def _list_images(self, dir_path):
+        """Sorted image names in dir_path (None if it does not exist), re-listed only when its mtime changed."""
+        try:
+            mtime = os.stat(dir_path).st_mtime_ns
+        except OSError:
+            self._index.pop(dir_path, None)
+            return None
+        cached = self._index.get(dir_path)
+        if cached is None or cached[0] != mtime:
+            files = sorted(f for f in os.listdir(dir_path) if f.lower().endswith(IMAGE_EXTENSIONS))
+            self._index[dir_path] = cached = (mtime, files)
+            logger.info(f"TEST Camera: Indexed {len(files)} image(s) in {dir_path}")
+        return cached[1]
+
+    def _next_file(self, dir_path, files):
+        if self.replay_order == "SEQUENTIAL":
+            position = self._positions.get(dir_path, 0) % len(files)
+            self._positions[dir_path] = position + 1
+            return files[position]
+        return self.rng.choice(files)
+
+    def _load(self, img_path):
+        """Decodes an image, through the LRU cache when enabled (entries are invalidated by file mtime)."""
+        if self.cache_size <= 0:
+            return cv2.imread(img_path)
+        try:
+            mtime = os.stat(img_path).st_mtime_ns
+        except OSError:
+            return None
+        cached = self._cache.get(img_path)
+        if cached is not None and cached[0] == mtime:
+            self._cache.move_to_end(img_path)
+            metrics.incr("camera.file_cache_hits")
+            # Copy: frames are handed to the pipeline, which must not alter the cached image
+            return cached[1].copy()
+        metrics.incr("camera.file_cache_misses")
+        img = cv2.imread(img_path)
+        if img is not None:
+            self._cache[img_path] = (mtime, img)
+            self._cache.move_to_end(img_path)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            img = img.copy()
+        return img
+
     def _generate_error_frame(self, text):
         img = np.zeros((480, 640, 3), np.uint8)
         cv2.putText(img, text, (50, 240), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
         return img
 
 # Real Implementation (Hardware)
+class _CameraGrabber:
+    """
+    Reads one camera continuously on its own thread, keeping the last FRAME_BUFFER_SIZE frames.
+    Draining the device all the time means the driver never hands out stale buffered frames,
+    and all cameras are exposed in parallel instead of one cap.read() after the other per trigger.
+    """
+    def __init__(self, name, cap, buffer_size=FRAME_BUFFER_SIZE):
+        self.name = name
+        self.cap = cap
+        self.frames = deque(maxlen=buffer_size) # (timestamp, frame)
+        self.cond = threading.Condition()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=f"grab-{name}", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def _run(self):
+        failing = False
+        while self.running:
+            ret, frame = self.cap.read()
+            if not ret:
+                if not failing:
+                    logger.warning(f"REAL Camera {self.name}: read failed, retrying.")
+                failing = True
+                metrics.incr(f"camera.{self.name}.read_errors")
+                time.sleep(0.05)
+                continue
+            failing = False
+            with self.cond:
+                self.frames.append((time.monotonic(), frame))
+                self.cond.notify_all()
+
+    def frame_after(self, trigger_time, deadline):
+        """
+        Returns the first buffered frame taken at/after trigger_time, waiting until 'deadline' (time.monotonic()).
+        Falls back to the newest frame if it is at most FRAME_MAX_AGE older than the trigger, else None
+        (a camera that stopped delivering must not have its last image judged again).
+        """
+        with self.cond:
+            while True:
+                frame = next((f for ts, f in self.frames if ts >= trigger_time), None)
+                if frame is not None:
+                    return frame
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.running:
+                    break
+                self.cond.wait(remaining)
+            if self.frames and self.frames[-1][0] >= trigger_time - FRAME_MAX_AGE:
+                metrics.incr(f"camera.{self.name}.stale_frames")
+                return self.frames[-1][1]
+            metrics.incr(f"camera.{self.name}.missing_frames")
+            logger.error(f"REAL Camera {self.name}: no frame within {FRAME_MAX_AGE}s of the trigger.")
+            return None
+
+    def stop(self):
+        self.running = False
+        self.thread.join(timeout=1.0)
+
+
 class RealCameraHandler(CameraHandlerBase):
     def __init__(self):
         super().__init__()
@@ -103,32 +250,37 @@ class RealCameraHandler(CameraHandlerBase):
             "upper": 2
         }
         self.caps = {}
+        self.grabbers = {}
 
     def initialize(self):
         for name, idx in self.cam_indices.items():
             cap = cv2.VideoCapture(idx)
             if cap.isOpened():
+                # Keep the driver queue as short as possible (not supported by every backend)
+                cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
                 self.caps[name] = cap
+                self.grabbers[name] = _CameraGrabber(name, cap)
+                self.grabbers[name].start()
                 logger.info(f"REAL Camera {name} (Idx {idx}) Opened.")
             else:
                 logger.error(f"Failed to open Camera {name} (Idx {idx})")
 
-    def capture_all(self, step=1):
+    def capture_all(self, step=1, trigger_time=None):
+        """Picks each camera's first frame taken at/after the trigger from the grabber buffers."""
+        if trigger_time is None:
+            trigger_time = time.monotonic()
         frames = {}
-        for name, cap in self.caps.items():
-            # In Real Mode, we capture fresh frames for everything unless upper requires caching?
-            # Assuming real cameras also just capture whatever is live.
-            if cap.isOpened():
-                ret, frame = cap.read()
-                if ret:
-                    frames[name] = frame
-                else:
-                    frames[name] = self._generate_error_frame()
-            else:
-                frames[name] = self._generate_error_frame()
+        # One deadline for all cameras: the grabbers run independently, so the total wait is bounded
+        # by FRAME_WAIT_TIMEOUT however many cameras are late
+        deadline = time.monotonic() + FRAME_WAIT_TIMEOUT
+        for name, grabber in self.grabbers.items():
+            frame = grabber.frame_after(trigger_time, deadline)
+            frames[name] = frame if frame is not None else self._generate_error_frame()
         return frames
 
     def release(self):
+        for grabber in self.grabbers.values():
+            grabber.stop()
         for cap in self.caps.values():
             cap.release()
             
@@ -3,97 +3,530 @@ import json
 import csv
 import logging
 import os
+import threading
+import copy
+import io
+import zlib
+from collections import OrderedDict
 from datetime import datetime
 
 logger = logging.getLogger("database")
 
 DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "inspection_history.db")
 
+# Connection tuning applied to every connection.
+# WAL lets the dashboard read history while the pipeline writes; synchronous=NORMAL is durable in WAL mode
+# except for the last transactions on power loss, which is acceptable for inspection logs.
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",      # 16 MB page cache
+    "PRAGMA mmap_size=268435456",    # 256 MB memory-mapped reads
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA foreign_keys=ON",
+]
+
+# Schema migrations, applied in order based on PRAGMA user_version.
+MIGRATIONS = [
+    # 1: Indexes for history queries (ORDER BY check_time, lookups by frame_id, filters on result)
+    [
+        "CREATE INDEX IF NOT EXISTS idx_inspections_check_time ON inspections(check_time)",
+        "CREATE INDEX IF NOT EXISTS idx_inspections_frame_id ON inspections(frame_id)",
+        "CREATE INDEX IF NOT EXISTS idx_inspections_final_result ON inspections(final_result)",
+    ],
+    # 2: Composite indexes so filtered, keyset-paginated history stays index-ordered by check_time
+    [
+        "DROP INDEX IF EXISTS idx_inspections_final_result",
+        "CREATE INDEX IF NOT EXISTS idx_inspections_result_time ON inspections(final_result, check_time)",
+        "CREATE INDEX IF NOT EXISTS idx_inspections_model_time ON inspections(model, check_time)",
+    ],
+    # 3: Normalized per-bolt results (one row per inspection x bolt), backfilled from the bolt_data JSON
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS inspection_bolts (
+            inspection_id INTEGER NOT NULL REFERENCES inspections(id) ON DELETE CASCADE,
+            bolt_id TEXT NOT NULL,
+            status TEXT NOT NULL,
+            PRIMARY KEY (inspection_id, bolt_id)
+        ) WITHOUT ROWID
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_inspection_bolts_bolt_status ON inspection_bolts(bolt_id, status, inspection_id)",
+        '''
+        INSERT OR IGNORE INTO inspection_bolts (inspection_id, bolt_id, status)
+        SELECT i.id, j.key, j.value FROM inspections i, json_each(i.bolt_data) j
+        ''',
+    ],
+    # 4: Bookkeeping for incremental exports ("since last export", keyed on inspections.id)
+    [
+        "CREATE TABLE IF NOT EXISTS export_state (name TEXT PRIMARY KEY, last_id INTEGER NOT NULL)",
+    ],
+    # 5: Hourly summary tables maintained by save_inspection (dashboard statistics), backfilled once
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS inspection_stats_hourly (
+            hour TEXT NOT NULL,      -- 'YYYY-MM-DD HH'
+            model TEXT NOT NULL,
+            ok_count INTEGER NOT NULL,
+            ng_count INTEGER NOT NULL,
+            PRIMARY KEY (hour, model)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS bolt_stats_hourly (
+            hour TEXT NOT NULL,
+            bolt_id TEXT NOT NULL,
+            ng_count INTEGER NOT NULL,
+            total INTEGER NOT NULL,
+            PRIMARY KEY (hour, bolt_id)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT OR REPLACE INTO inspection_stats_hourly (hour, model, ok_count, ng_count)
+        SELECT substr(check_time, 1, 13), model, SUM(final_result = 'OK'), SUM(final_result = 'NG')
+        FROM inspections GROUP BY 1, 2
+        ''',
+        '''
+        INSERT OR REPLACE INTO bolt_stats_hourly (hour, bolt_id, ng_count, total)
+        SELECT substr(i.check_time, 1, 13), b.bolt_id, SUM(b.status = 'NG'), COUNT(*)
+        FROM inspections i JOIN inspection_bolts b ON b.inspection_id = i.id GROUP BY 1, 2
+        ''',
+    ],
+    # 6: Detection boxes per image slot (render mode JSON), so overlays can be drawn by the frontend
+    [
+        "ALTER TABLE inspections ADD COLUMN detections TEXT",
+    ],
+]
+
+_local = threading.local()
+
+# Rows fetched per round trip by the streaming CSV export
+EXPORT_CHUNK_SIZE = 1000
+CSV_BASE_COLUMNS = ["id", "frame_id", "model", "check_time", "final_result"]
+
+# Small LRU of decoded records for single-record lookups; cleared on every insert
+RECORD_CACHE_SIZE = 256
+_record_cache = OrderedDict()
+_record_cache_lock = threading.Lock()
+
+# Callbacks run after every successful insert: callback(record) with the saved record dict
+_insert_listeners = []
+
+def open_connection(path=None, check_same_thread=True):
+    """Opens a new, dedicated tuned connection (caller closes it). Prefer get_connection() for normal queries."""
+    conn = sqlite3.connect(path or DB_PATH, timeout=5.0, check_same_thread=check_same_thread)
+    conn.row_factory = sqlite3.Row # To access columns by name
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def get_connection():
+    """
+    Returns the persistent connection owned by the calling thread (opened on first use).
+    sqlite3 connections must not be shared between threads, so each thread gets its own.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.path != DB_PATH:
+        if conn is not None:
+            conn.close()
+        conn = open_connection()
+        _local.conn = conn
+        _local.path = DB_PATH
+    return conn
+
+def close_connection():
+    """Closes the calling thread's persistent connection, if any."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+def _migrate(conn):
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    for version, statements in enumerate(MIGRATIONS, start=1):
+        if version <= current:
+            continue
+        logger.info(f"Applying database migration {version}...")
+        with conn:
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version}")
+
 def init_db():
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        conn = get_connection()
         
         # Create inspections table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS inspections (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                frame_id TEXT NOT NULL,
-                model TEXT NOT NULL,
-                check_time DATETIME NOT NULL,
-                final_result TEXT NOT NULL,
-                bolt_data TEXT NOT NULL, -- JSON string of {bolt_id: status}
-                images TEXT NOT NULL     -- JSON string of {cam_step: image_path}
-            )
-        ''')
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS inspections (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    frame_id TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    check_time DATETIME NOT NULL,
+                    final_result TEXT NOT NULL,
+                    bolt_data TEXT NOT NULL, -- JSON string of {bolt_id: status}
+                    images TEXT NOT NULL     -- JSON string of {cam_step: image_path}
+                )
+            ''')
         
-        conn.commit()
-        conn.close()
+        _migrate(conn)
         logger.info(f"Database initialized at {DB_PATH}")
     except Exception as e:
         logger.error(f"Error initializing database: {e}")
 
-def save_inspection(frame_id, model, final_result, bolt_data, images):
+def save_inspection(frame_id, model, final_result, bolt_data, images, detections=None):
     """
-    Saves an inspection record to the database.
+    Saves an inspection record (and its per-bolt rows, in the same transaction) to the database.
     bolt_data: dict of bolt statuses
     images: dict of image paths saved on disk
+    detections: optional dict of normalized detection boxes per image slot (render mode JSON)
+    Returns the new record ID, or None on failure.
     """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        conn = get_connection()
         
         check_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         bolt_json = json.dumps(bolt_data)
         images_json = json.dumps(images)
+        detections_json = json.dumps(detections) if detections else None
         
-        cursor.execute('''
-            INSERT INTO inspections (frame_id, model, check_time, final_result, bolt_data, images)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (frame_id, model, check_time, final_result, bolt_json, images_json))
+        with conn:
+            cursor = conn.execute('''
+                INSERT INTO inspections (frame_id, model, check_time, final_result, bolt_data, images, detections)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (frame_id, model, check_time, final_result, bolt_json, images_json, detections_json))
+            record_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO inspection_bolts (inspection_id, bolt_id, status) VALUES (?, ?, ?)",
+                [(record_id, bolt_id, status) for bolt_id, status in bolt_data.items()]
+            )
+            _update_hourly_stats(conn, check_time, model, final_result, bolt_data)
         
-        conn.commit()
-        conn.close()
+        invalidate_record_cache()
         logger.info(f"Saved inspection for frame {frame_id} with result {final_result}")
+        
+        record = {
+            "id": record_id, "frame_id": frame_id, "model": model, "check_time": check_time,
+            "final_result": final_result, "bolt_data": bolt_data, "images": images, "detections": detections
+        }
+        for callback in _insert_listeners:
+            try:
+                callback(record)
+            except Exception as e:
+                logger.error(f"Insert listener error: {e}")
+        return record_id
     except Exception as e:
         logger.error(f"Error saving inspection to database: {e}")
+        return None
+
+def _update_hourly_stats(conn, check_time, model, final_result, bolt_data):
+    """Increments the hourly summary rows for one inspection (inside the caller's transaction)."""
+    hour = check_time[:13]
+    conn.execute('''
+        INSERT INTO inspection_stats_hourly (hour, model, ok_count, ng_count) VALUES (?, ?, ?, ?)
+        ON CONFLICT(hour, model) DO UPDATE SET
+            ok_count = ok_count + excluded.ok_count,
+            ng_count = ng_count + excluded.ng_count
+    ''', (hour, model, int(final_result == "OK"), int(final_result == "NG")))
+    conn.executemany('''
+        INSERT INTO bolt_stats_hourly (hour, bolt_id, ng_count, total) VALUES (?, ?, ?, 1)
+        ON CONFLICT(hour, bolt_id) DO UPDATE SET
+            ng_count = ng_count + excluded.ng_count,
+            total = total + 1
+    ''', [(hour, bolt_id, int(status == "NG")) for bolt_id, status in bolt_data.items()])
+
+def add_insert_listener(callback):
+    """Registers callback(record), called after every successful save_inspection()."""
+    _insert_listeners.append(callback)
 
 def get_history(limit=50):
     """
     Retrieves the most recent inspection records.
     """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row # To access columns by name
-        cursor = conn.cursor()
+        conn = get_connection()
         
-        cursor.execute('''
+        # Served by idx_inspections_check_time (index order is (check_time, id))
+        rows = conn.execute('''
             SELECT * FROM inspections 
-            ORDER BY check_time DESC 
+            ORDER BY check_time DESC, id DESC
             LIMIT ?
-        ''', (limit,))
-        
-        rows = cursor.fetchall()
+        ''', (limit,)).fetchall()
         
         # Convert rows to a list of dicts, parsing JSON back to objects
-        history = []
-        for row in rows:
-            record = dict(row)
-            record['bolt_data'] = json.loads(record['bolt_data'])
-            record['images'] = json.loads(record['images'])
-            history.append(record)
-            
-        conn.close()
-        return history
+        return [_row_to_record(row) for row in rows]
     except Exception as e:
         logger.error(f"Error retrieving history: {e}")
         return []
 
-def export_to_csv():
+def _normalize_time(value):
+    """Accepts 'YYYY-MM-DD HH:MM[:SS]' or ISO 'YYYY-MM-DDTHH:MM[:SS]' and returns the check_time format."""
+    return datetime.fromisoformat(value.replace(" ", "T")).strftime("%Y-%m-%d %H:%M:%S")
+
+def encode_cursor(record):
+    return f"{record['check_time']}|{record['id']}"
+
+def decode_cursor(cursor):
+    check_time, record_id = cursor.rsplit("|", 1)
+    return check_time, int(record_id)
+
+def query_history(limit=50, cursor=None, date_from=None, date_to=None, final_result=None,
+                  model=None, frame_id_prefix=None, ng_bolt=None):
+    """
+    Keyset-paginated, filtered history (newest first). All filters are applied in SQL.
+    cursor: value of 'next_cursor' from the previous page ("check_time|id"), None for the first page.
+    ng_bolt: only units where this bolt ID was NG.
+    Returns (records, next_cursor); next_cursor is None on the last page.
+    """
+    try:
+        return _query_history(limit, cursor, date_from, date_to, final_result, model, frame_id_prefix, ng_bolt)
+    except ValueError:
+        raise # Malformed cursor / date: reported back to the caller
+    except Exception as e:
+        logger.error(f"Error querying history: {e}")
+        return [], None
+
+def _query_history(limit, cursor, date_from, date_to, final_result, model, frame_id_prefix, ng_bolt):
+    conditions = []
+    params = []
+
+    if cursor:
+        # Keyset on (check_time, id): the leading range term lets idx_inspections_check_time seek directly
+        cursor_time, cursor_id = decode_cursor(cursor)
+        conditions.append("check_time <= ? AND (check_time < ? OR id < ?)")
+        params += [cursor_time, cursor_time, cursor_id]
+    if date_from:
+        conditions.append("check_time >= ?")
+        params.append(_normalize_time(date_from))
+    if date_to:
+        conditions.append("check_time <= ?")
+        params.append(_normalize_time(date_to))
+    if final_result:
+        conditions.append("final_result = ?")
+        params.append(final_result)
+    if model:
+        conditions.append("model = ?")
+        params.append(model)
+    if frame_id_prefix:
+        # Prefix match as an index range on idx_inspections_frame_id (LIKE would not use the index)
+        prefix = frame_id_prefix.upper()
+        conditions.append("frame_id >= ? AND frame_id < ?")
+        params += [prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)]
+    if ng_bolt:
+        conditions.append("id IN (SELECT inspection_id FROM inspection_bolts WHERE bolt_id = ? AND status = 'NG')")
+        params.append(ng_bolt)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = get_connection().execute(f'''
+        SELECT * FROM inspections
+        {where}
+        ORDER BY check_time DESC, id DESC
+        LIMIT ?
+    ''', (*params, limit + 1)).fetchall()
+
+    records = [_row_to_record(row) for row in rows[:limit]]
+    next_cursor = encode_cursor(records[-1]) if len(rows) > limit else None
+    return records, next_cursor
+
+def _time_range_sql(date_from, date_to, model, alias="i"):
+    """Builds the shared WHERE clause for aggregate queries over inspections."""
+    conditions = []
+    params = []
+    if date_from:
+        conditions.append(f"{alias}.check_time >= ?")
+        params.append(_normalize_time(date_from))
+    if date_to:
+        conditions.append(f"{alias}.check_time <= ?")
+        params.append(_normalize_time(date_to))
+    if model:
+        conditions.append(f"{alias}.model = ?")
+        params.append(model)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+def get_bolt_ng_rates(date_from=None, date_to=None, model=None):
+    """
+    Per-bolt totals and NG rate, computed entirely in SQL from inspection_bolts.
+    Returns [{"bolt_id", "total", "ng", "ng_rate"}] sorted by NG rate (worst first).
+    """
+    where, params = _time_range_sql(date_from, date_to, model) # ValueError on malformed dates
+    try:
+        rows = get_connection().execute(f'''
+            SELECT b.bolt_id AS bolt_id,
+                   COUNT(*) AS total,
+                   SUM(b.status = 'NG') AS ng
+            FROM inspections i
+            CROSS JOIN inspection_bolts b ON b.inspection_id = i.id -- drive from the check_time range
+            {where}
+            GROUP BY b.bolt_id
+            ORDER BY CAST(SUM(b.status = 'NG') AS REAL) / COUNT(*) DESC, b.bolt_id
+        ''', params).fetchall()
+        return [
+            {"bolt_id": r["bolt_id"], "total": r["total"], "ng": r["ng"], "ng_rate": round(r["ng"] / r["total"], 4)}
+            for r in rows
+        ]
+    except Exception as e:
+        logger.error(f"Error computing bolt NG rates: {e}")
+        return []
+
+def get_result_counts(date_from=None, date_to=None, model=None):
+    """Count of inspections per final result, e.g. {"OK": 120, "NG": 3}."""
+    where, params = _time_range_sql(date_from, date_to, model) # ValueError on malformed dates
+    try:
+        rows = get_connection().execute(f'''
+            SELECT i.final_result AS final_result, COUNT(*) AS count
+            FROM inspections i
+            {where}
+            GROUP BY i.final_result
+        ''', params).fetchall()
+        return {r["final_result"]: r["count"] for r in rows}
+    except Exception as e:
+        logger.error(f"Error computing result counts: {e}")
+        return {}
+
+def _row_to_record(row):
+    record = dict(row)
+    record['bolt_data'] = json.loads(record['bolt_data'])
+    record['images'] = json.loads(record['images'])
+    record['detections'] = json.loads(record['detections']) if record.get('detections') else None
+    return record
+
+def invalidate_record_cache():
+    with _record_cache_lock:
+        _record_cache.clear()
+
+def _cached_lookup(key, query, params):
+    """Runs a single-row query through the LRU cache. Returns a copy of the record or None."""
+    with _record_cache_lock:
+        if key in _record_cache:
+            _record_cache.move_to_end(key)
+            return copy.deepcopy(_record_cache[key])
+
+    row = get_connection().execute(query, params).fetchone()
+    if row is None:
+        return None
+    record = _row_to_record(row)
+
+    with _record_cache_lock:
+        _record_cache[key] = record
+        _record_cache.move_to_end(key)
+        while len(_record_cache) > RECORD_CACHE_SIZE:
+            _record_cache.popitem(last=False)
+    return copy.deepcopy(record)
+
+def get_inspection(record_id):
+    """Fetches one inspection by primary key. Returns None if it does not exist."""
+    try:
+        return _cached_lookup(("id", record_id), "SELECT * FROM inspections WHERE id = ?", (record_id,))
+    except Exception as e:
+        logger.error(f"Error retrieving inspection {record_id}: {e}")
+        return None
+
+def get_by_frame_id(frame_id):
+    """Fetches the most recent inspection of a Frame ID (via idx_inspections_frame_id). Returns None if not found."""
+    try:
+        return _cached_lookup(
+            ("frame_id", frame_id),
+            "SELECT * FROM inspections WHERE frame_id = ? ORDER BY id DESC LIMIT 1",
+            (frame_id,)
+        )
+    except Exception as e:
+        logger.error(f"Error retrieving inspection for frame {frame_id}: {e}")
+        return None
+
+def get_bolt_columns(conn=None):
+    """
+    Sorted list of every bolt ID present in the history.
+    Loose index scan on idx_inspection_bolts_bolt_status: one index seek per distinct bolt.
+    """
+    conn = conn or get_connection()
+    rows = conn.execute('''
+        WITH RECURSIVE bolts(bolt_id) AS (
+            SELECT MIN(bolt_id) FROM inspection_bolts
+            UNION ALL
+            SELECT (SELECT MIN(bolt_id) FROM inspection_bolts WHERE bolt_id > bolts.bolt_id)
+            FROM bolts WHERE bolts.bolt_id IS NOT NULL
+        )
+        SELECT bolt_id FROM bolts WHERE bolt_id IS NOT NULL
+    ''').fetchall()
+    return [r[0] for r in rows]
+
+def get_last_exported_id(name="csv"):
+    row = get_connection().execute("SELECT last_id FROM export_state WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else 0
+
+def set_last_exported_id(name, last_id, conn=None):
+    conn = conn or get_connection()
+    with conn:
+        conn.execute('''
+            INSERT INTO export_state (name, last_id) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET last_id = excluded.last_id
+        ''', (name, last_id))
+
+def iter_csv_export(since_last=False, export_name="csv", chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Streams the inspection history as CSV text chunks (header first), one chunk per DB page.
+    Each bolt status becomes its own column. Memory use is bounded by chunk_size.
+    since_last: only rows with id greater than the last completed export of 'export_name'.
+    The export covers rows up to the max id at start; for since_last exports that id is recorded as
+    the new export position once the whole stream has been consumed (an aborted download changes nothing).
+    Full exports never move the position.
+    Uses its own connection, since a streaming response may resume the generator on other threads.
+    """
+    conn = open_connection(check_same_thread=False)
+    try:
+        start_id = 0
+        if since_last:
+            row = conn.execute("SELECT last_id FROM export_state WHERE name = ?", (export_name,)).fetchone()
+            start_id = row[0] if row else 0
+        end_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM inspections").fetchone()[0]
+
+        bolt_cols = get_bolt_columns(conn)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_BASE_COLUMNS + bolt_cols)
+        yield buffer.getvalue()
+
+        last_id = start_id
+        while last_id < end_id:
+            rows = conn.execute('''
+                SELECT id, frame_id, model, check_time, final_result, bolt_data FROM inspections
+                WHERE id > ? AND id <= ?
+                ORDER BY id
+                LIMIT ?
+            ''', (last_id, end_id, chunk_size)).fetchall()
+            if not rows:
+                break
+
+            buffer.seek(0)
+            buffer.truncate()
+            for row in rows:
+                bolt_data = json.loads(row["bolt_data"])
+                writer.writerow([row[col] for col in CSV_BASE_COLUMNS] + [bolt_data.get(b, "-") for b in bolt_cols])
+            last_id = rows[-1]["id"]
+            yield buffer.getvalue()
+
+        if since_last:
+            set_last_exported_id(export_name, end_id, conn)
+    finally:
+        conn.close()
+
+def gzip_chunks(chunks):
+    """Gzip-compresses an iterable of text chunks on the fly, yielding bytes."""
+    compressor = zlib.compressobj(wbits=31) # 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_to_csv(since_last=False, gzip=False):
     """
-    Exports the entire inspection database to a timestamped CSV file.
+    Exports the inspection database to a timestamped CSV file (optionally .csv.gz).
     Each bolt status becomes its own column for easy analysis.
-    Returns the file path of the generated CSV.
+    since_last: only rows added since the previous completed export.
+    Returns (file path, error message).
     """
     try:
         # --- Define export directory (project root / csv_export) ---
@@ -101,45 +534,24 @@ def export_to_csv():
         export_dir = os.path.join(project_root, "csv_export")
         os.makedirs(export_dir, exist_ok=True) # Create folder if it doesn't exist
 
-        # --- Query all records from DB ---
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM inspections ORDER BY check_time ASC")
-        rows = cursor.fetchall()
-        conn.close()
-
-        if not rows:
+        start_id = get_last_exported_id() if since_last else 0
+        if not get_connection().execute("SELECT 1 FROM inspections WHERE id > ? LIMIT 1", (start_id,)).fetchone():
             return None, "No data to export."
 
-        # --- Build rows and discover all unique bolt columns ---
-        records = []
-        all_bolt_keys = set()
-        for row in rows:
-            record = dict(row)
-            record['bolt_data'] = json.loads(record['bolt_data'])
-            record['images'] = json.loads(record['images'])
-            all_bolt_keys.update(record['bolt_data'].keys())
-            records.append(record)
-
-        # --- Define CSV columns ---
-        base_cols = ["id", "frame_id", "model", "check_time", "final_result"]
-        bolt_cols = sorted(list(all_bolt_keys))
-        all_cols = base_cols + bolt_cols
-
-        # --- Write to CSV file ---
+        # --- Stream rows from the DB straight into the file ---
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"inspection_export_{timestamp}.csv"
+        filename = f"inspection_export_{timestamp}.csv" + (".gz" if gzip else "")
         filepath = os.path.join(export_dir, filename)
 
-        with open(filepath, "w", newline="", encoding="utf-8") as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=all_cols)
-            writer.writeheader()
-            for record in records:
-                row_data = {col: record.get(col, "") for col in base_cols}
-                for bolt in bolt_cols:
-                    row_data[bolt] = record['bolt_data'].get(bolt, "-")
-                writer.writerow(row_data)
+        chunks = iter_csv_export(since_last=since_last)
+        if gzip:
+            with open(filepath, "wb") as f:
+                for data in gzip_chunks(chunks):
+                    f.write(data)
+        else:
+            with open(filepath, "w", newline="", encoding="utf-8") as csvfile:
+                for chunk in chunks:
+                    csvfile.write(chunk)
 
         logger.info(f"CSV exported successfully: {filepath}")
         return filepath, None
@@ -0,0 +1,96 @@
+"""
+Converts best.pt for the CPU inference backend (YOLO_BACKEND = "ONNX" in main.py).
+
+Usage (from the backend folder, requires ultralytics; --int8 also requires onnxruntime):
+    python export_model.py --model best.pt --imgsz 640          # writes best.onnx
+    python export_model.py --model best.pt --int8               # also writes best-int8.onnx
+
+INT8 uses static (QDQ) quantization calibrated on images from test_images/, falling back to dynamic
+(weight-only) quantization when no images are found. Compare the results against the PyTorch model
+with benchmarks/bench_yolo_backends.py before switching production to it.
+"""
+import argparse
+import logging
+import os
+import random
+
+import cv2
+
+from yolo_processor import letterbox, to_blob
+
+logger = logging.getLogger("export_model")
+
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+
+def find_images(base_dir):
+    """All images below base_dir (e.g. test_images/step1/right/*.jpg)."""
+    return sorted(
+        os.path.join(root, name)
+        for root, _, files in os.walk(base_dir)
+        for name in files if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def export_onnx(model_path, imgsz=640):
+    """Exports the ultralytics model to ONNX with a dynamic batch axis (for batched multi-camera inference)."""
+    from ultralytics import YOLO
+    onnx_path = YOLO(model_path).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+    logger.info(f"Exported {model_path} -> {onnx_path}")
+    return str(onnx_path)
+
+
+def quantize_int8(onnx_path, calibration_dir, imgsz=640, max_images=100):
+    """Writes <name>-int8.onnx next to onnx_path and returns its path."""
+    from onnxruntime.quantization import (
+        CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, quantize_static
+    )
+    import onnxruntime as ort
+
+    output_path = os.path.splitext(onnx_path)[0] + "-int8.onnx"
+    images = find_images(calibration_dir)
+    if not images:
+        logger.warning(f"No calibration images in {calibration_dir}, using dynamic quantization.")
+        quantize_dynamic(onnx_path, output_path, weight_type=QuantType.QUInt8)
+        return output_path
+
+    random.seed(0)
+    images = random.sample(images, min(max_images, len(images)))
+    input_name = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self):
+            self.paths = iter(images)
+
+        def get_next(self):
+            for path in self.paths:
+                frame = cv2.imread(path)
+                if frame is not None:
+                    return {input_name: to_blob([letterbox(frame, (imgsz, imgsz))[0]])}
+            return None
+
+    # Only convolutions are quantized: the box decoding / concat tail stays float, which keeps
+    # localization close to the float model while the conv backbone gets the INT8 speed-up.
+    quantize_static(
+        onnx_path, output_path, _Reader(),
+        quant_format=QuantFormat.QDQ, activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+        per_channel=True, op_types_to_quantize=["Conv"]
+    )
+    logger.info(f"Quantized {onnx_path} -> {output_path} (calibrated on {len(images)} images)")
+    return output_path
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Export best.pt to ONNX (optionally INT8) for CPU inference.")
+    parser.add_argument("--model", default=os.path.join(backend_dir, "best.pt"))
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--int8", action="store_true", help="Also write an INT8 quantized model")
+    parser.add_argument("--calibration-dir", default=os.path.join(backend_dir, "test_images"))
+    args = parser.parse_args()
+
+    path = export_onnx(args.model, args.imgsz)
+    if args.int8:
+        path = quantize_int8(path, args.calibration_dir, args.imgsz)
+    print(path)
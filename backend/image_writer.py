@@ -0,0 +1,81 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from metrics import metrics
+
+logger = logging.getLogger("image_writer")
+
+
+class ImageWriter:
+    """
+    Background pool for image disk writes and JPEG encoding.
+    - submit() takes ownership of the frame: callers must not modify it afterwards.
+    - Backpressure: at most 'max_pending' jobs may be queued/running; submit() blocks beyond that.
+    - flush() waits for specific futures (or everything pending) before e.g. a DB save.
+    """
+    def __init__(self, max_workers=2, max_pending=12):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-writer")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pending = set()
+
+    def submit(self, func, *args):
+        """Runs func(*args) on the pool and returns its Future. Blocks while the pool is saturated."""
+        start = time.perf_counter()
+        self._slots.acquire()
+        metrics.record("image_writer.backpressure_wait_ms", (time.perf_counter() - start) * 1000)
+
+        try:
+            future = self._executor.submit(self._run, func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._pending.add(future)
+            metrics.set_gauge("image_writer.queue_depth", len(self._pending))
+        future.add_done_callback(self._on_done)
+        return future
+
+    @staticmethod
+    def _run(func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        except Exception as e:
+            logger.error(f"Image writer job failed: {e}")
+            metrics.incr("image_writer.errors")
+            raise
+        finally:
+            metrics.record("image_writer.job_ms", (time.perf_counter() - start) * 1000)
+
+    def _on_done(self, future):
+        with self._lock:
+            self._pending.discard(future)
+            metrics.set_gauge("image_writer.queue_depth", len(self._pending))
+        self._slots.release()
+
+    def flush(self, futures=None, timeout=None):
+        """
+        Waits until the given futures (default: everything currently pending) have completed.
+        Returns the set of futures that did not finish within the timeout.
+        """
+        if futures is None:
+            with self._lock:
+                futures = list(self._pending)
+        if not futures:
+            return set()
+        _, not_done = wait(futures, timeout=timeout)
+        if not_done:
+            logger.warning(f"Image writer flush timed out with {len(not_done)} job(s) still pending.")
+        return not_done
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def shutdown(self):
+        self.flush()
+        self._executor.shutdown(wait=True)
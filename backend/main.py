@@ -6,21 +6,31 @@ backend_dir = os.path.dirname(os.path.abspath(__file__))
 os.environ['PADDLE_PDX_HOME'] = backend_dir
 os.environ['PADDLE_HOME'] = backend_dir
 import asyncio
+import json
 import logging
 import threading
 import time
 import os
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 
 from modbus_handler import get_modbus_handler
 from camera_handler import get_camera_handler
 from yolo_processor import get_yolo_processor
 from ocr_processor import get_ocr_processor
-from state_manager import StateManager
-from database import init_db, save_inspection, get_history, export_to_csv
+from state_manager import StateManager, diff_state
+from database import (
+    init_db, query_history, get_inspection, get_by_frame_id, export_to_csv, iter_csv_export, gzip_chunks,
+    get_bolt_ng_rates, get_result_counts, add_insert_listener
+)
+from pipeline import InspectionPipeline
+from metrics import metrics
+from stats import stats_tracker
 
 # Setup Logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -35,11 +45,24 @@ model_path = os.path.join(current_dir, "best.pt")
 async def lifespan(app: FastAPI):
     # Startup logic
     init_db()
+    stats_tracker.load()
+    add_insert_listener(stats_tracker.record)
+    loop = asyncio.get_running_loop()
+    state_manager.add_listener(lambda version: loop.call_soon_threadsafe(manager.notify))
+    broadcaster = asyncio.create_task(manager.run_broadcaster())
     loop_thread = threading.Thread(target=control_loop, daemon=True)
     loop_thread.start()
     yield
     # Shutdown logic
+    broadcaster.cancel()
+    if pipeline:
+        pipeline.stop()
+    state_manager.image_writer.shutdown()
     camera.release()
+    if yolo:
+        yolo.close()
+    if ocr:
+        ocr.close()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -53,171 +76,255 @@ app.add_middleware(
 )
 
 # --- CONFIGURATION ---
-# Modes: "MOCK", "TEST", "REAL"
-SYSTEM_MODE = "TEST" 
+# Modes: "MOCK", "TEST", "REAL" (can be overridden with the QGATE_SYSTEM_MODE environment variable)
+SYSTEM_MODE = os.environ.get("QGATE_SYSTEM_MODE", "TEST")
+# YOLO multi-camera inference: "SEQUENTIAL", "BATCH" (one batched model call) or "PARALLEL" (worker pool)
+YOLO_INFERENCE_MODE = "BATCH"
+# YOLO backend: "PYTORCH" (best.pt via ultralytics) or "ONNX" (exported model via onnxruntime/OpenVINO,
+# created with export_model.py; use "best-int8.onnx" for the INT8 quantized export)
+YOLO_BACKEND = "PYTORCH"
+YOLO_ONNX_MODEL = "best.onnx"
+# ROI-only inference: per camera, where each expected bolt sits as normalized (x1, y1, x2, y2) frame
+# coordinates. Regions are padded and merged into crops; only the crops are inferred. Cameras missing
+# here (or an empty dict) use the full frame. Example:
+#   {"upper": {"BS_6X18_FENDER_C_REAR_FRONT": (0.20, 0.55, 0.35, 0.70), "FRAME_ID": (0.40, 0.30, 0.70, 0.45)}}
+YOLO_ROI_LAYOUT = {}
+# Annotated image rendering: "FULL" (full-res copy with boxes), "LIGHT" (boxes on a downscaled display copy for
+# the live view; the full-res history image is annotated by the background image writer) or "JSON" (raw frame;
+# boxes stored in state/DB and drawn by the frontend)
+YOLO_RENDER_MODE = "FULL"
+# Per-class minimum confidence on top of the model's own threshold, by dashboard label, e.g. {"FRAME_ID": 0.5}
+YOLO_CLASS_THRESHOLDS = {}
+# Max time (seconds) the control loop blocks waiting for a trigger before re-checking
+TRIGGER_WAIT_TIMEOUT = 1.0
+# Staged pipeline (capture -> detect -> OCR -> persist -> DB). False runs all stages on the control-loop thread.
+PIPELINE_THREADED = True
+PIPELINE_QUEUE_SIZE = 4
+# Max seconds to wait for the Frame ID OCR (which runs alongside YOLO) before using a fallback ID
+OCR_TIMEOUT = 2.0
+# OCR engine: "SINGLE" (one attempt) or "VOTING" (preprocessed variants in parallel, per-character vote)
+OCR_ENGINE_MODE = "SINGLE"
+# Time budget (seconds) for the VOTING variants; keep it below OCR_TIMEOUT
+OCR_VOTING_BUDGET = 1.0
+# Recognition-only fast path on the YOLO crop; the full det + rec pipeline runs below this confidence
+OCR_REC_ONLY = True
+OCR_REC_MIN_CONFIDENCE = 0.85
+# WebSocket fan-out: min seconds between broadcasts, per-client backlog, and send timeout for slow clients
+WS_MIN_INTERVAL = 0.05
+WS_CLIENT_QUEUE_SIZE = 8
+WS_SEND_TIMEOUT = 5.0
+# Upper bound for /api/history page size
+HISTORY_MAX_PAGE_SIZE = 500
+# Parquet archive: delete archived rows older than this many days from SQLite (None = keep everything)
+ARCHIVE_RETENTION_DAYS = None
+# Model warm-up at startup: camera frame size (h, w, c) used for the dummy YOLO inference. Set it to the
+# production camera resolution of the deployment (or QGATE_WARMUP_FRAME_SHAPE="HxW", e.g. "1080x1920"),
+# otherwise the first real frame still pays for the resize/letterbox setup of its size.
+WARMUP_FRAME_SHAPE = tuple(map(int, os.environ.get("QGATE_WARMUP_FRAME_SHAPE", "480x640").split("x"))) + (3,)
+# TEST mode image replay: "RANDOM" / "SEQUENTIAL" order, RNG seed (None = unseeded),
+# decoded-image LRU cache size (0 = off) and max captures per second (None = as fast as triggered)
+TEST_REPLAY_ORDER = "RANDOM"
+TEST_REPLAY_SEED = None
+TEST_FRAME_CACHE_SIZE = 64
+TEST_REPLAY_FPS = None
 logger.info(f"System Starting in Mode: {SYSTEM_MODE}")
 
 # Global Components
 state_manager = StateManager()
 modbus = get_modbus_handler(SYSTEM_MODE, state_manager=state_manager)
-camera = get_camera_handler(SYSTEM_MODE, base_dir=test_images_path)
-yolo = get_yolo_processor(SYSTEM_MODE, model_path=model_path)
-ocr = get_ocr_processor(SYSTEM_MODE)
+camera = get_camera_handler(
+    SYSTEM_MODE, base_dir=test_images_path, replay_order=TEST_REPLAY_ORDER, seed=TEST_REPLAY_SEED,
+    cache_size=TEST_FRAME_CACHE_SIZE, replay_fps=TEST_REPLAY_FPS
+)
+# YOLO/OCR models and the pipeline are created by load_models() on the control-loop thread
+yolo = None
+ocr = None
+pipeline = None
+models_ready = threading.Event()
+startup_error = None # Set when camera/model startup failed; reported by /api/health
+startup_timings = {}
+
+def _load_and_warm(name, factory, warmup):
+    """Builds one processor and runs its warm-up, recording load and first/warm inference times."""
+    start = time.perf_counter()
+    processor = factory()
+    load_s = time.perf_counter() - start
+    timings = warmup(processor)
+    startup_timings[name] = {
+        "load_s": round(load_s, 2),
+        "first_inference_ms": round(timings[0], 1),
+        "warm_inference_ms": round(timings[-1], 1),
+    }
+    logger.info(f"{name.upper()} loaded in {load_s:.2f}s, first inference {timings[0]:.0f} ms, "
+                f"warm inference {timings[-1]:.0f} ms")
+    return processor
+
+def load_models():
+    """Loads the YOLO and OCR models concurrently, warms both up, then builds the inspection pipeline."""
+    global yolo, ocr, pipeline
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="model-loader") as executor:
+        yolo_future = executor.submit(
+            _load_and_warm, "yolo",
+            lambda: get_yolo_processor(
+                SYSTEM_MODE, model_path=model_path, inference_mode=YOLO_INFERENCE_MODE,
+                backend=YOLO_BACKEND, onnx_path=os.path.join(current_dir, YOLO_ONNX_MODEL), rois=YOLO_ROI_LAYOUT,
+                render_mode=YOLO_RENDER_MODE, class_thresholds=YOLO_CLASS_THRESHOLDS,
+                bolt_ids=list(state_manager.bolt_statuses)
+            ),
+            lambda p: p.warmup(WARMUP_FRAME_SHAPE)
+        )
+        ocr_future = executor.submit(
+            _load_and_warm, "ocr",
+            lambda: get_ocr_processor(
+                SYSTEM_MODE, engine_mode=OCR_ENGINE_MODE, voting_budget=OCR_VOTING_BUDGET,
+                rec_only=OCR_REC_ONLY, rec_min_confidence=OCR_REC_MIN_CONFIDENCE
+            ),
+            lambda p: p.warmup()
+        )
+        yolo, ocr = yolo_future.result(), ocr_future.result()
+
+    pipeline = InspectionPipeline(
+        camera, yolo, ocr, state_manager, modbus,
+        threaded=PIPELINE_THREADED, queue_size=PIPELINE_QUEUE_SIZE, ocr_timeout=OCR_TIMEOUT
+    )
+    startup_timings["total_s"] = round(time.perf_counter() - start, 2)
+    models_ready.set()
+    logger.info(f"Models ready after {startup_timings['total_s']:.2f}s")
 
 # Websocket Connection Manager
 class ConnectionManager:
+    """
+    Single fan-out path for live state. StateManager change notifications wake the broadcaster,
+    which serializes each change once and queues the same text to every client. Each client has
+    its own bounded queue + sender task, so a slow client never blocks the others: when its queue
+    overflows the pending deltas are dropped and replaced by one full snapshot (coalescing).
+    """
     def __init__(self):
         self.active_connections: list[WebSocket] = []
+        self._queues: dict[WebSocket, asyncio.Queue] = {}
+        self._senders: dict[WebSocket, asyncio.Task] = {}
+        self._changed = asyncio.Event()
+        self._last_state = None
+
+    def notify(self):
+        """Called (on the event loop) whenever the StateManager version changes."""
+        self._changed.set()
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
+        queue = asyncio.Queue(maxsize=WS_CLIENT_QUEUE_SIZE)
+        # First message is always a full snapshot, deltas follow
+        queue.put_nowait(json.dumps({"type": "full", **state_manager.get_full_state()}))
         self.active_connections.append(websocket)
+        self._queues[websocket] = queue
+        self._senders[websocket] = asyncio.create_task(self._sender(websocket, queue))
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        if websocket in self.active_connections:
+            self.active_connections.remove(websocket)
+        self._queues.pop(websocket, None)
+        sender = self._senders.pop(websocket, None)
+        if sender and sender is not asyncio.current_task():
+            sender.cancel()
+
+    async def _sender(self, websocket: WebSocket, queue: asyncio.Queue):
+        try:
+            while True:
+                message = await queue.get()
+                await asyncio.wait_for(websocket.send_text(message), timeout=WS_SEND_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Connection closed or too slow, removing: {e!r}")
+            self.disconnect(websocket)
+            try:
+                await websocket.close()
+            except Exception:
+                pass
 
     async def broadcast_state(self):
         state = state_manager.get_full_state()
+        if state["version"] == self._last_state["version"]:
+            return
+        delta_text = json.dumps(diff_state(self._last_state, state))
+        full_text = None
+        self._last_state = state
+
         # Iterate over a copy to allow removal
         for connection in self.active_connections[:]:
+            queue = self._queues.get(connection)
+            if queue is None:
+                continue
+            if queue.full():
+                # Slow client: drop its backlog and resync it with a single full snapshot
+                while not queue.empty():
+                    queue.get_nowait()
+                if full_text is None:
+                    full_text = json.dumps({"type": "full", **state})
+                queue.put_nowait(full_text)
+                metrics.incr("ws.coalesced")
+            else:
+                queue.put_nowait(delta_text)
+        metrics.incr("ws.broadcasts")
+
+    async def run_broadcaster(self):
+        """Waits for state-change notifications and broadcasts, at most once per WS_MIN_INTERVAL."""
+        self._last_state = state_manager.get_full_state()
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
             try:
-                await connection.send_json(state)
+                await self.broadcast_state()
             except Exception as e:
-                logger.warning(f"Connection closed, removing: {e}")
-                self.disconnect(connection)
+                logger.error(f"WebSocket broadcast error: {e}")
+            await asyncio.sleep(WS_MIN_INTERVAL) # Coalesce bursts of changes into one message
 
 manager = ConnectionManager()
 
 # --- Control Loop ---
 def control_loop():
+    """
+    Trigger dispatcher. Capture/detect/OCR/persist/DB work runs in the staged InspectionPipeline,
+    so this thread only waits for PLC triggers and submits them in order.
+    """
+    global startup_error
     logger.info("Control loop started.")
-    camera.initialize()
+    # Triggers raised while the models warm up stay pending in the Modbus handler
+    try:
+        camera.initialize()
+        load_models()
+        pipeline.start()
+    except Exception as e:
+        startup_error = f"{type(e).__name__}: {e}"
+        logger.exception(f"Startup failed, triggers will not be served: {startup_error}")
+        return
     
     while True:
         try:
+            # 1. Block until the PLC (or debug API) sets a trigger - no polling delay
+            triggers, trigger_times = modbus.wait_for_triggers(timeout=TRIGGER_WAIT_TIMEOUT)
+            if not any(triggers.values()):
+                continue
+
             # Check if system is unpaused/running
             if not state_manager.system_status["engine_active"]:
-                modbus.read_triggers() # FLUSH/IGNORE all incoming triggers for safety
-                time.sleep(0.5) 
+                # Triggers are already consumed: FLUSH/IGNORE all incoming triggers for safety
+                logger.info(f"Engine paused. Ignoring triggers: {[k for k, v in triggers.items() if v]}")
                 continue
-
-            # 1. Read Modbus Triggers
-            triggers = modbus.read_triggers()
             
             # 2. Handle Capture Logic
             if triggers["capture_step_1"] or triggers["capture_step_2"]:
                 step = 1 if triggers["capture_step_1"] else 2
                 logger.info(f"Capture Step {step} triggered.")
-                
-                # Capture Frames (All Cameras) specific to the step
-                frames = camera.capture_all(step=step)
-                logger.info(f"Frames captured for step {step}")
-                
-                # Run Detection and Update State with Annotated Images
-                detected_bolts = []
-                upper_detection_details = []
-                temp_annotated_frames = {}
-                
-                for cam_key, frame in frames.items():
-                    if frame is not None:
-                        # Process frame and get image with bounding boxes + raw info
-                        bolts, annotated_img, details = yolo.process(frame)
-                        detected_bolts.extend(bolts)
-                        temp_annotated_frames[cam_key] = annotated_img
-                        
-                        if cam_key == "upper":
-                            upper_detection_details = details
-                    else:
-                        temp_annotated_frames[cam_key] = None
-
-                # Perform OCR to read Frame ID if Step = 1
-                if step == 1:
-                    logger.info("Attempting to read Frame ID via Crop + OCR.")
-                    extracted_id = None
-                    
-                    # Look for FRAME_ID or similar label in the detections
-                    frame_id_info = next((d for d in upper_detection_details if "FRAME_ID" in d["label"]), None)
-                    
-                    if frame_id_info and frames.get("upper") is not None:
-                        try:
-                            upper_img = frames["upper"]
-                            h, w = upper_img.shape[:2]
-                            logger.info(f"Upper Frame Resolution: {w}x{h}")
-                            
-                            # d["box"] is [x1, y1, x2, y2]
-                            box = frame_id_info["box"]
-                            x1, y1, x2, y2 = map(int, box)
-                            
-                            # Bounds checking
-                            x1, y1 = max(0, x1), max(0, y1)
-                            x2, y2 = min(w, x2), min(h, y2)
-                            
-                            if x2 > x1 and y2 > y1:
-                                # Add a small margin
-                                margin = 15
-                                x1_m = max(0, x1 - margin)
-                                y1_m = max(0, y1 - margin)
-                                x2_m = min(w, x2 + margin)
-                                y2_m = min(h, y2 + margin)
-                                
-                                crop = upper_img[y1_m:y2_m, x1_m:x2_m]
-                                logger.info(f"Targeting OCR Crop: Label={frame_id_info['label']} Crop Shape={crop.shape}")
-                                extracted_id = ocr.process(crop)
-                            else:
-                                logger.warning(f"Invalid crop coordinates: {x1, y1, x2, y2} for frame {w}x{h}")
-                        except Exception as e:
-                            logger.error(f"Error during OCR cropping: {e}")
-                    
-                    if extracted_id:
-                        logger.info(f"OCR Success. Frame ID Set: {extracted_id}")
-                        state_manager.set_frame_id(extracted_id)
-                    else:
-                        logger.warning("OCR Failed (or no Frame ID label detected). Generating Fallback UUID.")
-                        state_manager.generate_frame_id()
-
-                # Now that Frame ID is set (for Step 1) or already exists (for Step 2),
-                # save and update the images.
-                for cam_key, annotated_img in temp_annotated_frames.items():
-                    state_manager.update_image(cam_key, step, annotated_img)
-                
-                # Deduplicate the list (in case a bolt is seen by multiple cameras)
-                detected_bolts = list(set(detected_bolts))
-                
-                logger.info(f"Detected bolts: {detected_bolts}")
-                
-                # Update status for detected bolts to OK
-                for bolt_id in detected_bolts:
-                    state_manager.update_bolt_status(bolt_id, "OK")
-
-                # If Step 2 finished, finalize results (Pending -> NG)
-                if step == 2:
-                    logger.info("Step 2 finished. Finalizing results and saving to DB.")
-                    db_payload = state_manager.finalize_results()
-                    
-                    # Save to Database
-                    save_inspection(
-                        frame_id=db_payload["frame_id"],
-                        model=db_payload["model"],
-                        final_result=db_payload["final_result"],
-                        bolt_data=db_payload["bolt_data"],
-                        images=db_payload["images"]
-                    )
-
-                    # If result is NG, send alarm signal to PLC via Modbus Register 2
-                    if db_payload["final_result"] == "NG":
-                        logger.warning(f"Unit {db_payload['frame_id']} is NG. Triggering PLC Alarm on Register 2.")
-                        modbus.send_ng_alarm()
-
-            # 3. Handle Unit Enter/Exit (Exit MUST happen after save)
+                pipeline.submit_capture(step, trigger_time=trigger_times[f"capture_step_{step}"])
+
+            # 3. Handle Unit Enter/Exit (Exit is queued behind the step-2 save of the current unit)
             if triggers["unit_enter"]:
-                logger.info("Unit ENTER signal received.")
-                state_manager.system_status["unit_present"] = True
+                pipeline.submit_unit_enter()
                 
             if triggers["unit_exit"]:
-                logger.info("Unit EXIT signal received. Resetting state.")
-                state_manager.reset()
-
-            time.sleep(0.1) # Prevent CPU hogging
+                pipeline.submit_unit_exit()
             
         except Exception as e:
             logger.error(f"Error in control loop: {e}")
@@ -231,35 +338,79 @@ def control_loop():
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
     try:
+        # Sending is done by the ConnectionManager broadcaster (full snapshot first, then deltas).
+        # Images are referenced by version; the browser fetches them from /api/live/{slot}.jpg.
+        # Here we only wait for the client to go away.
         while True:
-            # We fetch state and send only to THIS connection.
-            # manager.broadcast_state() was redundant and N^2 complex.
-            state = state_manager.get_full_state()
-            await websocket.send_json(state)
-            await asyncio.sleep(0.2) # Faster updates (5fps)
+            await websocket.receive_text()
     except WebSocketDisconnect:
         manager.disconnect(websocket)
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
         manager.disconnect(websocket)
 
+@app.get("/api/live/{slot}.jpg")
+async def live_image(slot: str, request: Request):
+    """Latest dashboard JPEG for an image slot (e.g. right_step1), with ETag revalidation."""
+    jpeg, version = state_manager.get_live_image(slot)
+    if jpeg is None:
+        return Response(status_code=404)
+
+    etag = f'"{slot}-{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=jpeg, media_type="image/jpeg", headers=headers)
+
 @app.post("/api/engine/toggle")
 async def toggle_engine():
     """Toggle the master start/stop state of the inspection engine."""
     current = state_manager.system_status["engine_active"]
-    state_manager.system_status["engine_active"] = not current
+    state_manager.set_engine_active(not current)
     status_text = "RUNNING" if not current else "STOPPED"
     logger.info(f"Engine state toggled to: {status_text}")
     return {"status": "success", "engine_active": not current}
 
 @app.post("/api/export/csv")
-async def export_csv():
-    """Export the entire inspection database to a timestamped CSV file."""
-    filepath, error = export_to_csv()
+async def export_csv(since_last: bool = False, gzip: bool = False):
+    """
+    Export the inspection database to a timestamped CSV file in csv_export/.
+    since_last: only units added since the previous completed export. gzip: write .csv.gz.
+    Runs in a worker thread so the event loop (live WebSocket) is not blocked.
+    """
+    filepath, error = await run_in_threadpool(export_to_csv, since_last, gzip)
     if error:
         return {"status": "error", "message": error}
     return {"status": "success", "file": filepath}
 
+@app.get("/api/export/csv/download")
+async def download_csv(since_last: bool = False, gzip: bool = False):
+    """Stream the inspection history as a CSV (optionally gzip) download, without building it in memory."""
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    chunks = iter_csv_export(since_last=since_last)
+    if gzip:
+        filename = f"inspection_export_{timestamp}.csv.gz"
+        return StreamingResponse(
+            gzip_chunks(chunks), media_type="application/gzip",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+    filename = f"inspection_export_{timestamp}.csv"
+    return StreamingResponse(
+        chunks, media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.post("/api/archive/run")
+async def run_archive():
+    """Append new inspections to the Parquet archive (and apply ARCHIVE_RETENTION_DAYS pruning)."""
+    try:
+        from archive import archive_inspections # pyarrow is only needed when archiving
+        summary = await run_in_threadpool(archive_inspections, retention_days=ARCHIVE_RETENTION_DAYS)
+    except Exception as e:
+        logger.error(f"Archive job failed: {e}")
+        return {"status": "error", "message": str(e)}
+    return {"status": "success", "data": summary}
+
 @app.post("/api/system/quit")
 async def quit_system():
     """Remotely shut down the entire backend service."""
@@ -282,21 +433,84 @@ async def debug_trigger(signal: str):
         return {"status": "success", "triggered": signal}
     return {"status": "error", "message": "Invalid signal"}
 
+@app.get("/api/health")
+async def health(response: Response):
+    """
+    Readiness probe: 'ready' once the models are loaded and warmed up, 503 'starting' before that
+    and 503 'error' (with the message) if camera/model startup failed.
+    """
+    if startup_error is not None:
+        response.status_code = 503
+        return {"status": "error", "mode": SYSTEM_MODE, "message": startup_error}
+    if not models_ready.is_set():
+        response.status_code = 503
+        return {"status": "starting", "mode": SYSTEM_MODE}
+    return {"status": "ready", "mode": SYSTEM_MODE, "startup": startup_timings}
+
+@app.get("/api/metrics")
+async def fetch_metrics():
+    """Runtime performance metrics (latencies, counters, gauges)."""
+    return {"status": "success", "data": metrics.snapshot()}
+
+@app.get("/api/stats")
+async def fetch_stats():
+    """Live dashboard statistics: shift yield, per-bolt NG rates, throughput (constant cost, served from memory)."""
+    return {"status": "success", "data": stats_tracker.snapshot()}
+
 @app.get("/api/history")
-async def fetch_history(limit: int = 50):
-    """Fetch recent inspection history from database."""
-    history = get_history(limit)
-    return {"status": "success", "data": history}
+async def fetch_history(
+    limit: int = 50,
+    cursor: str | None = None,
+    date_from: str | None = None,
+    date_to: str | None = None,
+    result: str | None = None,
+    model: str | None = None,
+    frame_id: str | None = None,
+    ng_bolt: str | None = None,
+):
+    """
+    Fetch inspection history (newest first) with keyset pagination and server-side filters.
+    Pass the returned 'next_cursor' as 'cursor' to get the next page.
+    frame_id is a prefix match, ng_bolt keeps only units where that bolt was NG.
+    """
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+    try:
+        history, next_cursor = query_history(
+            limit=limit, cursor=cursor, date_from=date_from, date_to=date_to,
+            final_result=result, model=model, frame_id_prefix=frame_id, ng_bolt=ng_bolt
+        )
+    except ValueError as e:
+        return {"status": "error", "message": f"Invalid parameter: {e}"}
+    return {"status": "success", "data": history, "next_cursor": next_cursor}
 
 @app.get("/api/history/{record_id}")
 async def fetch_history_detail(record_id: int):
-    """Fetch specific history detail (optional if all data is in list, but good for future expansion)"""
-    history = get_history(limit=100) # Quick hack to find it locally. In production, query DB directly by ID.
-    for record in history:
-        if record["id"] == record_id:
-            return {"status": "success", "data": record}
+    """Fetch a single inspection record by its database ID."""
+    record = get_inspection(record_id)
+    if record:
+        return {"status": "success", "data": record}
+    return {"status": "error", "message": "Record not found"}
+
+@app.get("/api/history/frame/{frame_id}")
+async def fetch_history_by_frame(frame_id: str):
+    """Fetch the latest inspection record of a Frame ID."""
+    record = get_by_frame_id(frame_id)
+    if record:
+        return {"status": "success", "data": record}
     return {"status": "error", "message": "Record not found"}
 
+@app.get("/api/analytics/bolts")
+async def fetch_bolt_analytics(date_from: str | None = None, date_to: str | None = None, model: str | None = None):
+    """Per-bolt NG rates and OK/NG counts over an optional date range, aggregated in SQL."""
+    try:
+        data = {
+            "results": get_result_counts(date_from, date_to, model),
+            "bolts": get_bolt_ng_rates(date_from, date_to, model),
+        }
+    except ValueError as e:
+        return {"status": "error", "message": f"Invalid parameter: {e}"}
+    return {"status": "success", "data": data}
+
 # Resolve path to frontend relative to this file
 frontend_dir = os.path.join(current_dir, "../frontend")
 
@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import deque
+
+
+class MetricsRegistry:
+    """
+    Minimal thread-safe in-process metrics store.
+    - record(): latency-style samples (count/avg/min/max + percentiles over a recent window)
+    - incr():   monotonically increasing counters
+    - set_gauge(): last-value gauges (queue depths, etc.)
+    Exposed to the dashboard through /api/metrics.
+    """
+    def __init__(self, window=1000):
+        self.lock = threading.Lock()
+        self.window = window
+        self._samples = {}
+        self._summaries = {}
+        self._counters = {}
+        self._gauges = {}
+        self.started_at = time.time()
+
+    def record(self, name, value):
+        with self.lock:
+            if name not in self._samples:
+                self._samples[name] = deque(maxlen=self.window)
+                self._summaries[name] = {"count": 0, "total": 0.0, "min": value, "max": value}
+            self._samples[name].append(value)
+            summary = self._summaries[name]
+            summary["count"] += 1
+            summary["total"] += value
+            summary["min"] = min(summary["min"], value)
+            summary["max"] = max(summary["max"], value)
+
+    def incr(self, name, amount=1):
+        with self.lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def set_gauge(self, name, value):
+        with self.lock:
+            self._gauges[name] = value
+
+    def reset(self):
+        with self.lock:
+            self._samples.clear()
+            self._summaries.clear()
+            self._counters.clear()
+            self._gauges.clear()
+            self.started_at = time.time()
+
+    @staticmethod
+    def _percentile(sorted_values, pct):
+        if not sorted_values:
+            return None
+        idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+        return sorted_values[idx]
+
+    def snapshot(self):
+        with self.lock:
+            latencies = {}
+            for name, samples in self._samples.items():
+                summary = self._summaries[name]
+                ordered = sorted(samples)
+                latencies[name] = {
+                    "count": summary["count"],
+                    "avg": round(summary["total"] / summary["count"], 3),
+                    "min": round(summary["min"], 3),
+                    "max": round(summary["max"], 3),
+                    "p50": round(self._percentile(ordered, 50), 3),
+                    "p95": round(self._percentile(ordered, 95), 3),
+                    "p99": round(self._percentile(ordered, 99), 3),
+                }
+            return {
+                "uptime_s": round(time.time() - self.started_at, 1),
+                "latencies_ms": latencies,
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+            }
+
+
+# Shared registry used by all backend modules
+metrics = MetricsRegistry()
@@ -1,9 +1,12 @@
 import logging
 import asyncio
 import threading
+import time
 from pymodbus.server import StartTcpServer
 from pymodbus.datastore import ModbusSequentialDataBlock, ModbusDeviceContext, ModbusServerContext
 
+from metrics import metrics
+
 logger = logging.getLogger("modbus_handler")
 
 # Mapping of integer values to trigger names (For use on Modbus Holding Register Address 1)
@@ -46,7 +49,7 @@ class TriggerDataBlock(ModbusSequentialDataBlock):
 class ModbusHandler:
     """
     Unified Modbus Handler.
-    - Exposes a 'read_triggers()' method for main.py's control loop.
+    - Exposes 'wait_for_triggers()' (blocking, event-driven) and 'read_triggers()' (non-blocking) for main.py's control loop.
     - Exposes a 'set_mock_signal()' for the /debug/trigger API (curl commands).
     - Can optionally run an asynchronous ModbusTCP Server in a background thread to listen for a real PLC.
     """
@@ -60,6 +63,10 @@ class ModbusHandler:
         # Internal state to hold triggered events
         self.lock = threading.Lock()
         self._triggers = {k: False for k in self.addresses}
+        # Monotonic timestamp of the first pending occurrence of each trigger (for latency metrics)
+        self._trigger_times = {k: None for k in self.addresses}
+        # Signalled whenever a trigger is set, so the control loop can block instead of polling
+        self._trigger_cond = threading.Condition(self.lock)
         
         self.active_clients = 0
         self.datablock = None  # Will be set once the server starts, used for writing back to PLC
@@ -92,8 +99,7 @@ class ModbusHandler:
         
         if address == 1 and value in TRIGGER_VALUES:
             trigger_name = TRIGGER_VALUES[value]
-            with self.lock:
-                self._triggers[trigger_name] = True
+            self._set_trigger(trigger_name)
             logger.info(f"PLC Modbus Signal Triggered [Value {value}]: {trigger_name}")
 
     def start_server_thread(self):
@@ -125,23 +131,51 @@ class ModbusHandler:
     def set_mock_signal(self, register_name):
         """Used by the /debug/trigger API (curl commands) to securely inject a fake signal."""
         if register_name in self.addresses:
-            with self.lock:
-                self._triggers[register_name] = True
+            self._set_trigger(register_name)
             logger.info(f"API/Mock Signal Triggered: {register_name}")
 
+    def _set_trigger(self, trigger_name):
+        """Marks a trigger as pending and wakes up any thread blocked in wait_for_triggers()."""
+        with self._trigger_cond:
+            if self._triggers[trigger_name]:
+                # Same trigger fired again before the control loop consumed it (OR logic merges them)
+                metrics.incr("modbus.triggers_coalesced")
+            else:
+                self._triggers[trigger_name] = True
+                self._trigger_times[trigger_name] = time.monotonic()
+            metrics.incr(f"modbus.trigger.{trigger_name}")
+            self._trigger_cond.notify_all()
+
+    def _consume_triggers(self):
+        """Returns (triggers, trigger_times) and resets them. Caller must hold self.lock."""
+        result = {}
+        times = {}
+        for k, v in self._triggers.items():
+            result[k] = v
+            times[k] = self._trigger_times[k]
+            self._triggers[k] = False # Auto-reset after read
+            self._trigger_times[k] = None
+        return result, times
+
     def read_triggers(self):
         """
         Consumed by main.py's control loop. 
         Returns current triggers and resets them immediately (OR logic).
         """
-        result = {}
         with self.lock:
-            for k, v in self._triggers.items():
-                result[k] = v
-                self._triggers[k] = False # Auto-reset after read
-                
+            result, _ = self._consume_triggers()
         return result
 
+    def wait_for_triggers(self, timeout=None):
+        """
+        Blocks until at least one trigger is pending (or the timeout expires), then consumes them.
+        Returns (triggers, trigger_times) where trigger_times holds the time.monotonic() value at
+        which each pending trigger was received (None for triggers that are not set).
+        """
+        with self._trigger_cond:
+            self._trigger_cond.wait_for(lambda: any(self._triggers.values()), timeout=timeout)
+            return self._consume_triggers()
+
     def send_ng_alarm(self):
         """
         Called by main.py when a unit inspection result is NG.
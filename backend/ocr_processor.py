@@ -1,11 +1,22 @@
+import hashlib
+import importlib.util
 import logging
+import os
 import random
+import re
+import threading
+import time
 import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
 
-try:
-    from paddleocr import PaddleOCR
-except ImportError:
-    PaddleOCR = None
+import cv2
+import numpy as np
+
+from metrics import metrics
+
+# paddleocr (and paddle) are only imported when a RealOcrProcessor is built, see yolo_processor.py
+PADDLEOCR_AVAILABLE = importlib.util.find_spec("paddleocr") is not None
 
 logger = logging.getLogger("ocr_processor")
 
@@ -13,64 +24,280 @@ class OcrProcessorBase:
     def process(self, frame):
         raise NotImplementedError
 
+    def warmup(self, crop_shape=(80, 320, 3), runs=2):
+        """
+        Runs dummy OCR on a blank image of the typical Frame ID crop size.
+        Returns the duration of each run in ms; the first one is the cold (first-inference) time.
+        """
+        timings = []
+        for i in range(runs):
+            # A different blank image per run, so result caches cannot short-circuit the warm-up
+            crop = np.full(crop_shape, 255 - i, np.uint8)
+            start = time.perf_counter()
+            self.process(crop)
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    def close(self):
+        pass
+
 class MockOcrProcessor(OcrProcessorBase):
     def __init__(self):
         logger.info("MOCK OCR: Initialized.")
 
+    def warmup(self, crop_shape=(80, 320, 3), runs=2):
+        return [0.0] * runs
+
     def process(self, frame):
         # MOCK logic: generate a random frame ID
         logger.info("MOCK OCR: Generating synthetic Frame ID.")
         return "MH1" + uuid.uuid4().hex[:12].upper()
 
+# Engine modes for RealOcrProcessor:
+# - "SINGLE": one PaddleOCR attempt on the crop (original behaviour)
+# - "VOTING": recognition on several preprocessed variants of the crop in parallel (within a time
+#             budget), combined by a per-character confidence-weighted vote
+OCR_ENGINE_MODES = ["SINGLE", "VOTING"]
+
+def make_variants(crop):
+    """
+    Preprocessed versions of a Frame ID crop: original, Otsu-binarized, contrast-enhanced, slightly rotated.
+    (No rescaled variants: both recognition paths resize the crop to a fixed input height anyway.)
+    """
+    variants = [crop]
+
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    _, binary = cv2.threshold(cv2.GaussianBlur(gray, (3, 3), 0), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    variants.append(cv2.cvtColor(binary, cv2.COLOR_GRAY2BGR))
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(4, 4)).apply(gray)
+    variants.append(cv2.cvtColor(clahe, cv2.COLOR_GRAY2BGR))
+
+    h, w = crop.shape[:2]
+    for angle in (-2, 2):
+        matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+        variants.append(cv2.warpAffine(crop, matrix, (w, h), borderMode=cv2.BORDER_REPLICATE))
+    return variants
+
+def vote_characters(candidates):
+    """
+    Combines (text, confidence) readings: the most supported length wins, then every position
+    takes the character with the highest summed confidence. Returns None without candidates.
+    """
+    candidates = [(text, conf) for text, conf in candidates if text]
+    if not candidates:
+        return None
+    length_votes = Counter()
+    for text, conf in candidates:
+        length_votes[len(text)] += conf
+    length = length_votes.most_common(1)[0][0]
+
+    same_length = [(text, conf) for text, conf in candidates if len(text) == length]
+    result = []
+    for i in range(length):
+        char_votes = Counter()
+        for text, conf in same_length:
+            char_votes[text[i]] += conf
+        result.append(char_votes.most_common(1)[0][0])
+    return "".join(result)
+
+# Recognition-only fast path: YOLO already localizes the FRAME_ID label, so the crop is fed straight
+# to the text recognition model; the full detection + recognition pipeline only runs when the
+# fast path is unavailable or its confidence is below rec_min_confidence.
+REC_MODEL_NAME = "en_PP-OCRv4_mobile_rec"
+REC_INPUT_HEIGHT = 48
+
+def normalize_label_crop(crop):
+    """Prepares a single-line label crop for the recognizer: upright, 3 channels, REC_INPUT_HEIGHT px high."""
+    if crop.ndim == 2:
+        crop = cv2.cvtColor(crop, cv2.COLOR_GRAY2BGR)
+    h, w = crop.shape[:2]
+    if h > w * 1.5:
+        # Label seen sideways: text lines are always wider than tall
+        crop = cv2.rotate(crop, cv2.ROTATE_90_CLOCKWISE)
+        h, w = w, h
+    scale = REC_INPUT_HEIGHT / h
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+    return cv2.resize(crop, (max(1, int(round(w * scale))), REC_INPUT_HEIGHT), interpolation=interpolation)
+
+def clean_text(text):
+    """Only keep alphanumeric (Frame IDs are upper-case letters and digits)."""
+    return re.sub(r'[^A-Z0-9]', '', str(text).upper())
+
 class RealOcrProcessor(OcrProcessorBase):
-    def __init__(self):
+    def __init__(self, engine_mode="SINGLE", voting_budget=1.0, voting_workers=2, cache_size=128,
+                 rec_only=True, rec_min_confidence=0.85, engine_factory=None, recognizer_factory=None):
+        """
+        engine_factory / recognizer_factory build the PaddleOCR pipeline and the standalone recognizer
+        (one per voting worker too); they default to the local PP-OCRv4 models.
+        """
         self.ocr = None
-        if PaddleOCR:
+        self.recognizer = None
+        self.rec_only = rec_only
+        self.rec_min_confidence = rec_min_confidence
+        self.engine_mode = engine_mode if engine_mode in OCR_ENGINE_MODES else "SINGLE"
+        self.voting_budget = voting_budget
+        self.voting_workers = voting_workers
+        self._executor = None
+        self._local = threading.local()
+
+        # Content-hash LRU of crop -> result, so identical crops (e.g. TEST-mode replays) skip OCR
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        self._engine_factory = engine_factory or self._create_engine
+        self._recognizer_factory = recognizer_factory or self._create_recognizer
+        if PADDLEOCR_AVAILABLE or engine_factory is not None:
             try:
-                # FORCE environment variables before anything else
-                import os
-                os.environ['FLAGS_use_onednn'] = '0'
-                os.environ['FLAGS_enable_pir_in_executor'] = '0'
-                os.environ['PADDLE_PDX_DISABLE_MODEL_SOURCE_CHECK'] = 'True'
-                
-                # Absolute local paths to ensure zero internet dependence
-                base_dir = os.path.dirname(os.path.abspath(__file__))
-                # Correct Path: inside the .paddlex hidden folder
-                local_model_path = os.path.join(base_dir, ".paddlex", "official_models")
-                
-                self.ocr = PaddleOCR(
-                    use_doc_orientation_classify=False,
-                    use_doc_unwarping=False,
-                    det_model_dir=os.path.join(local_model_path, "PP-OCRv4_mobile_det"),
-                    rec_model_dir=os.path.join(local_model_path, "en_PP-OCRv4_mobile_rec"),
-                    ocr_version='PP-OCRv4', # MATCH the folders exactly
-                    use_angle_cls=False, 
-                    lang='en',
-                    device='cpu',
-                    enable_mkldnn=False
-                )
-                logger.info("REAL OCR: Lightweight PP-OCRv4 Initialized (Safest Mode).")
+                self.ocr = self._engine_factory()
+                logger.info(f"REAL OCR: Lightweight PP-OCRv4 Initialized (Safest Mode, Engine mode: {self.engine_mode}).")
             except Exception as e:
                 logger.exception(f"REAL OCR: Error initializing PaddleOCR {e}")
+            if self.ocr and self.rec_only:
+                self.recognizer = self._recognizer_factory()
         else:
             logger.error("paddleocr not installed! Real OCR mode will fail.")
 
+    @staticmethod
+    def _create_engine():
+        # FORCE environment variables before anything else
+        os.environ['FLAGS_use_onednn'] = '0'
+        os.environ['FLAGS_enable_pir_in_executor'] = '0'
+        os.environ['PADDLE_PDX_DISABLE_MODEL_SOURCE_CHECK'] = 'True'
+        from paddleocr import PaddleOCR
+
+        # Absolute local paths to ensure zero internet dependence
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        # Correct Path: inside the .paddlex hidden folder
+        local_model_path = os.path.join(base_dir, ".paddlex", "official_models")
+
+        return PaddleOCR(
+            use_doc_orientation_classify=False,
+            use_doc_unwarping=False,
+            det_model_dir=os.path.join(local_model_path, "PP-OCRv4_mobile_det"),
+            rec_model_dir=os.path.join(local_model_path, "en_PP-OCRv4_mobile_rec"),
+            ocr_version='PP-OCRv4', # MATCH the folders exactly
+            use_angle_cls=False,
+            lang='en',
+            device='cpu',
+            enable_mkldnn=False
+        )
+
+    @staticmethod
+    def _create_recognizer():
+        """Standalone text recognition model (same local weights as the full pipeline). None if unavailable."""
+        try:
+            from paddleocr import TextRecognition
+            base_dir = os.path.dirname(os.path.abspath(__file__))
+            model_dir = os.path.join(base_dir, ".paddlex", "official_models", REC_MODEL_NAME)
+            recognizer = TextRecognition(model_name=REC_MODEL_NAME, model_dir=model_dir, device='cpu', enable_mkldnn=False)
+            logger.info(f"REAL OCR: Recognition-only fast path enabled ({REC_MODEL_NAME}).")
+            return recognizer
+        except Exception as e:
+            logger.warning(f"REAL OCR: Recognition-only fast path unavailable, using the full pipeline: {e}")
+            return None
+
     def process(self, frame):
         if not self.ocr or frame is None:
             return None
-            
+
+        key = (frame.shape, hashlib.blake2b(np.ascontiguousarray(frame).tobytes(), digest_size=16).digest())
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                metrics.incr("ocr.cache_hits")
+                return self._cache[key]
+        metrics.incr("ocr.cache_misses")
+
+        if self.engine_mode == "VOTING":
+            text = self._process_voting(frame)
+        else:
+            text, _ = self._read(self.ocr, self.recognizer, frame)
+
+        if text:
+            logger.info(f"REAL OCR: Detected Text -> {text}")
+            # Only successful reads are cached: a failure (exception, voting budget exceeded) is retried next time
+            with self._cache_lock:
+                self._cache[key] = text
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return text
+
+    def _worker_engine(self):
+        """Returns the (PaddleOCR, recognizer) pair owned by the current worker thread (instances are not thread-safe)."""
+        engines = getattr(self._local, "engines", None)
+        if engines is None:
+            recognizer = self._recognizer_factory() if self.recognizer is not None else None
+            engines = (self._engine_factory(), recognizer)
+            self._local.engines = engines
+            logger.info(f"REAL OCR: Loaded worker engine for {threading.current_thread().name}")
+        return engines
+
+    def _process_voting(self, crop):
+        """Recognizes all variants on the worker pool and votes over those finished within the budget."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.voting_workers, thread_name_prefix="ocr-vote")
+        futures = [
+            self._executor.submit(lambda v=variant: self._read(*self._worker_engine(), v))
+            for variant in make_variants(crop)
+        ]
+        done, not_done = wait(futures, timeout=self.voting_budget)
+        for future in not_done:
+            future.cancel()
+        if not_done:
+            metrics.incr("ocr.voting_budget_exceeded")
+
+        candidates = []
+        for future in done:
+            # e.g. a worker engine that failed to build: that variant is skipped, the others still vote
+            if future.exception() is not None:
+                logger.error(f"OCR voting variant failed: {future.exception()}")
+                metrics.incr("ocr.errors")
+                continue
+            candidates.append(future.result())
+        text = vote_characters(candidates)
+        logger.info(f"REAL OCR: Voting over {len(candidates)}/{len(futures)} variants -> {text}")
+        return text
+
+    def _read(self, engine, recognizer, crop):
+        """Recognition-only attempt first (when available); full pipeline if it is unsure. Returns (text, confidence)."""
+        if recognizer is not None:
+            text, confidence = self._recognize_fast(recognizer, crop)
+            if text and confidence >= self.rec_min_confidence:
+                metrics.incr("ocr.fast_path_hits")
+                return text, confidence
+            metrics.incr("ocr.fast_path_fallbacks")
+        return self._recognize(engine, crop)
+
+    def _recognize_fast(self, recognizer, crop):
+        """Runs only the recognition model on the label crop. Returns (cleaned text or None, confidence)."""
+        try:
+            result = recognizer.predict(normalize_label_crop(crop))
+            if not result:
+                return None, 0.0
+            safe_text = clean_text(result[0]["rec_text"])
+            confidence = float(result[0]["rec_score"])
+            return (safe_text if len(safe_text) >= 3 else None), confidence
+        except Exception as e:
+            logger.error(f"OCR Recognition Error: {e}")
+            return None, 0.0
+
+    def _recognize(self, engine, frame):
+        """One PaddleOCR attempt. Returns (cleaned text or None, mean confidence)."""
         try:
             # Perform OCR on the frame
-            result = self.ocr.ocr(frame)
+            result = engine.ocr(frame)
             logger.info(f"REAL OCR: Raw result -> {result}")
-            
+
             extracted_text = ""
+            scores = []
             if result and isinstance(result, list) and len(result) > 0:
                 item = result[0]
                 # Format A: High-level dict (seen in logs)
                 if isinstance(item, dict) and 'rec_texts' in item:
                     texts = item.get('rec_texts', [])
                     extracted_text = "".join(str(t) for t in texts)
+                    scores = [float(score) for score in item.get('rec_scores', [])]
                 # Format B: Classic list hierarchy
                 elif isinstance(item, list):
                     for line in item:
@@ -80,28 +307,35 @@ class RealOcrProcessor(OcrProcessorBase):
                                 confidence = line[1][1]
                                 if confidence > 0.5:
                                     extracted_text += str(text)
+                                    scores.append(float(confidence))
                         except (IndexError, TypeError):
                             continue
-            
+
             # Basic cleanup (remove spaces/special chars)
-            import re
-            # Only keep alphanumeric
-            safe_text = re.sub(r'[^A-Z0-9]', '', str(extracted_text).upper())
-            
-            if len(safe_text) >= 3: 
-                logger.info(f"REAL OCR: Detected Text -> {safe_text}")
-                return safe_text
-            return None
-                
+            safe_text = clean_text(extracted_text)
+            confidence = sum(scores) / len(scores) if scores else 0.0
+
+            if len(safe_text) >= 3:
+                return safe_text, confidence
+            return None, confidence
+
         except Exception as e:
             logger.error(f"OCR Inference Error: {e}")
-            return None
+            return None, 0.0
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
 
-def get_ocr_processor(mode="MOCK"):
+def get_ocr_processor(mode="MOCK", engine_mode="SINGLE", voting_budget=1.0, rec_only=True, rec_min_confidence=0.85):
     if mode == "REAL" or mode == "TEST": 
-        if PaddleOCR:
+        if PADDLEOCR_AVAILABLE:
             logger.info("Initializing REAL OCR Processor for Mode: " + mode)
-            return RealOcrProcessor()
+            return RealOcrProcessor(
+                engine_mode=engine_mode, voting_budget=voting_budget,
+                rec_only=rec_only, rec_min_confidence=rec_min_confidence
+            )
         else:
             logger.warning("paddleocr missing, falling back to MOCK OCR for Mode: " + mode)
             return MockOcrProcessor()
@@ -0,0 +1,37 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import metrics
+
+logger = logging.getLogger("ocr_service")
+
+
+class OcrService:
+    """
+    Runs Frame ID OCR on a dedicated worker thread, so it overlaps with YOLO on the side cameras.
+    - submit(crop) returns a Future resolving to the recognized text, or None when nothing was read.
+    - One worker by default: PaddleOCR instances are not safe to share between threads.
+    """
+    def __init__(self, ocr, max_workers=1):
+        self.ocr = ocr
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ocr")
+
+    def submit(self, crop):
+        """Queues OCR of a Frame ID crop (the caller must not modify it afterwards)."""
+        return self._executor.submit(self._run, crop, time.perf_counter())
+
+    def _run(self, crop, submitted):
+        start = time.perf_counter()
+        metrics.record("ocr.queue_wait_ms", (start - submitted) * 1000)
+        try:
+            return self.ocr.process(crop)
+        except Exception as e:
+            logger.error(f"OCR job failed: {e}")
+            metrics.incr("ocr.errors")
+            return None
+        finally:
+            metrics.record("ocr.process_ms", (time.perf_counter() - start) * 1000)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,340 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from database import save_inspection
+from metrics import metrics
+from ocr_service import OcrService
+from yolo_processor import normalize_detections
+
+logger = logging.getLogger("pipeline")
+
+# Stage names, in execution order. Every job passes through every stage (FIFO, one worker each),
+# so unit ordering and the step-1 -> step-2 -> exit sequence are preserved end to end.
+# Frame ID OCR is not a stage: it runs on the OcrService, started by 'detect' and awaited by 'persist'.
+STAGES = ["capture", "detect", "persist", "db"]
+
+# Max seconds the DB stage waits for a unit's background image writes before saving without them
+IMAGE_FLUSH_TIMEOUT = 10.0
+
+
+class UnitContext:
+    """Data shared by all jobs of one unit (motorcycle frame), from ENTER until EXIT."""
+    def __init__(self, seq):
+        self.seq = seq
+        self.frame_id = None
+        # {storage_key: Future} of background image writes, flushed before the DB save
+        self.image_futures = {}
+
+
+class PipelineJob:
+    """
+    One unit of work travelling through the pipeline.
+    kind: "capture" (step 1 / step 2), "unit_enter" or "unit_exit".
+    Enter/exit jobs carry no data; they only flow through the stages so that their state changes
+    are applied in order with the captures around them.
+    """
+    def __init__(self, kind, unit, step=None, trigger_time=None):
+        self.kind = kind
+        self.unit = unit
+        self.step = step
+        self.trigger_time = trigger_time if trigger_time is not None else time.monotonic()
+        self.failed = False
+
+        # Filled in by the stages
+        self.frames = {}
+        self.annotated_frames = {}
+        self.detections = {} # {cam_key: detection details}
+        self.detected_bolts = []
+        self.upper_detection_details = []
+        self.ocr_future = None
+        self.db_payload = None
+
+
+class _StageWorker:
+    """Runs one stage function on its own thread, reading jobs from a bounded queue."""
+    def __init__(self, name, func, queue_size, next_worker=None):
+        self.name = name
+        self.func = func
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.next_worker = next_worker
+        self.thread = threading.Thread(target=self._run, name=f"pipeline-{name}", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def put(self, job):
+        # Blocks when the queue is full: backpressure propagates to the upstream stage
+        self.queue.put(job)
+        metrics.set_gauge(f"pipeline.queue.{self.name}", self.queue.qsize())
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                if self.next_worker:
+                    self.next_worker.put(None)
+                break
+            metrics.set_gauge(f"pipeline.queue.{self.name}", self.queue.qsize())
+            run_stage(self.name, self.func, job)
+            if self.next_worker:
+                self.next_worker.put(job)
+
+
+def run_stage(name, func, job):
+    """Executes a stage function for a job, recording its latency. Errors mark the job as failed."""
+    if job.failed:
+        return
+    start = time.perf_counter()
+    try:
+        func(job)
+    except Exception as e:
+        logger.error(f"Error in pipeline stage '{name}' ({job.kind}, step {job.step}): {e}")
+        job.failed = True
+    if job.kind == "capture":
+        metrics.record(f"pipeline.{name}_ms", (time.perf_counter() - start) * 1000)
+
+
+def crop_frame_id(upper_img, frame_id_info, margin=15):
+    """Crops the FRAME_ID label (plus a small margin) out of the upper camera image. Returns None if invalid."""
+    h, w = upper_img.shape[:2]
+    logger.info(f"Upper Frame Resolution: {w}x{h}")
+
+    # d["box"] is [x1, y1, x2, y2]
+    x1, y1, x2, y2 = map(int, frame_id_info["box"])
+
+    # Bounds checking
+    x1, y1 = max(0, x1), max(0, y1)
+    x2, y2 = min(w, x2), min(h, y2)
+
+    if x2 <= x1 or y2 <= y1:
+        logger.warning(f"Invalid crop coordinates: {x1, y1, x2, y2} for frame {w}x{h}")
+        return None
+
+    x1_m = max(0, x1 - margin)
+    y1_m = max(0, y1 - margin)
+    x2_m = min(w, x2 + margin)
+    y2_m = min(h, y2 + margin)
+    return upper_img[y1_m:y2_m, x1_m:x2_m]
+
+
+class InspectionPipeline:
+    """
+    Staged inspection pipeline: capture -> detect (+ async OCR) -> encode/persist -> DB.
+
+    With threaded=True each stage runs on its own worker thread connected by bounded queues, so
+    e.g. the DB insert of unit N's step 2 overlaps with capture/YOLO of unit N+1's step 1.
+    With threaded=False all stages run inline on the caller's thread (original sequential behaviour).
+
+    Only the 'persist' stage mutates the live StateManager, and it processes jobs strictly in
+    trigger order, so the dashboard sees exactly the same sequence of state changes as before.
+    """
+    def __init__(self, camera, yolo, ocr, state_manager, modbus, threaded=True, queue_size=4, ocr_timeout=2.0):
+        self.camera = camera
+        self.yolo = yolo
+        self.ocr = ocr
+        self.ocr_service = OcrService(ocr)
+        # Max seconds 'persist' waits for the Frame ID OCR before using a fallback ID
+        self.ocr_timeout = ocr_timeout
+        self.state_manager = state_manager
+        self.modbus = modbus
+        self.threaded = threaded
+        self.queue_size = queue_size
+
+        self._unit_seq = 0
+        self._unit = UnitContext(self._unit_seq)
+        self._workers = []
+
+        funcs = {
+            "capture": self._stage_capture,
+            "detect": self._stage_detect,
+            "persist": self._stage_persist,
+            "db": self._stage_db,
+        }
+        self._stage_funcs = [(name, funcs[name]) for name in STAGES]
+
+    def start(self):
+        if not self.threaded or self._workers:
+            return
+        next_worker = None
+        for name, func in reversed(self._stage_funcs):
+            next_worker = _StageWorker(name, func, self.queue_size, next_worker)
+            self._workers.insert(0, next_worker)
+        for worker in self._workers:
+            worker.start()
+        logger.info(f"Inspection pipeline started with stages: {' -> '.join(STAGES)}")
+
+    def stop(self):
+        if self._workers:
+            self._workers[0].put(None)
+            self._workers = []
+        self.ocr_service.shutdown()
+
+    # --- Submission (called from the control loop, in trigger order) ---
+    def submit_capture(self, step, trigger_time=None):
+        self._submit(PipelineJob("capture", self._unit, step=step, trigger_time=trigger_time))
+
+    def submit_unit_enter(self):
+        self._submit(PipelineJob("unit_enter", self._unit))
+
+    def submit_unit_exit(self):
+        self._submit(PipelineJob("unit_exit", self._unit))
+        # Everything triggered after EXIT belongs to the next unit
+        self._unit_seq += 1
+        self._unit = UnitContext(self._unit_seq)
+
+    def _submit(self, job):
+        if self.threaded and self._workers:
+            self._workers[0].put(job)
+        else:
+            for name, func in self._stage_funcs:
+                run_stage(name, func, job)
+
+    # --- Stages ---
+    def _stage_capture(self, job):
+        if job.kind != "capture":
+            return
+        metrics.record("trigger_to_capture_ms", (time.monotonic() - job.trigger_time) * 1000)
+        # Capture Frames (All Cameras) specific to the step
+        job.frames = self.camera.capture_all(step=job.step, trigger_time=job.trigger_time)
+        logger.info(f"Frames captured for step {job.step}")
+
+    def _stage_detect(self, job):
+        if job.kind != "capture":
+            return
+        frames = job.frames
+        if job.step == 1 and frames.get("upper") is not None and len(frames) > 1:
+            # Upper camera first, so Frame ID OCR runs while the side cameras are being detected
+            self._collect_detections(job, self.yolo.process_many({"upper": frames["upper"]}))
+            self._start_ocr(job)
+            frames = {cam_key: frame for cam_key, frame in frames.items() if cam_key != "upper"}
+        # The cameras are processed in one go (batched / worker pool, see YOLO_INFERENCE_MODE)
+        self._collect_detections(job, self.yolo.process_many(frames))
+        if job.step == 1 and job.ocr_future is None:
+            self._start_ocr(job)
+
+    def _collect_detections(self, job, detections):
+        for cam_key, detection in detections.items():
+            if detection is not None:
+                # Image with bounding boxes + raw info
+                bolts, annotated_img, details = detection
+                job.detected_bolts.extend(bolts)
+                job.annotated_frames[cam_key] = annotated_img
+                job.detections[cam_key] = details
+
+                if cam_key == "upper":
+                    job.upper_detection_details = details
+            else:
+                job.annotated_frames[cam_key] = None
+
+    def _start_ocr(self, job):
+        """Crops the FRAME_ID label out of the upper image and submits it to the OCR service."""
+        # Look for FRAME_ID or similar label in the detections
+        frame_id_info = next((d for d in job.upper_detection_details if "FRAME_ID" in d["label"]), None)
+        if not frame_id_info or job.frames.get("upper") is None:
+            return
+        try:
+            crop = crop_frame_id(job.frames["upper"], frame_id_info)
+            if crop is not None:
+                logger.info(f"Targeting OCR Crop: Label={frame_id_info['label']} Crop Shape={crop.shape}")
+                job.ocr_future = self.ocr_service.submit(crop)
+        except Exception as e:
+            logger.error(f"Error during OCR cropping: {e}")
+
+    def _resolve_frame_id(self, job):
+        """Waits (at most ocr_timeout) for the step-1 OCR result and sets the unit's Frame ID."""
+        extracted_id = None
+        if job.ocr_future is not None:
+            start = time.perf_counter()
+            try:
+                extracted_id = job.ocr_future.result(timeout=self.ocr_timeout)
+            except FutureTimeoutError:
+                logger.warning(f"OCR did not finish within {self.ocr_timeout}s.")
+                metrics.incr("ocr.timeouts")
+            except Exception as e:
+                logger.error(f"OCR Error: {e}")
+            metrics.record("ocr.wait_ms", (time.perf_counter() - start) * 1000)
+
+        if extracted_id:
+            logger.info(f"OCR Success. Frame ID Set: {extracted_id}")
+            job.unit.frame_id = extracted_id
+        elif job.unit.frame_id is None:
+            logger.warning("OCR Failed (or no Frame ID label detected). Generating Fallback UUID.")
+            job.unit.frame_id = self.state_manager.make_fallback_frame_id()
+
+    def _stage_persist(self, job):
+        if job.kind == "unit_enter":
+            logger.info("Unit ENTER signal received.")
+            self.state_manager.set_unit_present(True)
+            return
+        if job.kind == "unit_exit":
+            logger.info("Unit EXIT signal received. Resetting state.")
+            self.state_manager.reset()
+            return
+
+        # The Frame ID is needed from here on (history image filenames)
+        if job.step == 1:
+            self._resolve_frame_id(job)
+            self.state_manager.set_frame_id(job.unit.frame_id)
+
+        # Now that Frame ID is set (for Step 1) or already exists (for Step 2),
+        # save and update the images.
+        # Render mode JSON: the image is the raw frame, the boxes go along for the frontend to draw
+        # Render mode LIGHT: the small annotated copy is only for the live view; history keeps the full-res
+        # frame, annotated by the background image writer
+        render_mode = self.yolo.render_mode
+        for cam_key, annotated_img in job.annotated_frames.items():
+            frame, boxes, display_frame, annotate = annotated_img, None, None, None
+            if render_mode == "JSON" and annotated_img is not None:
+                boxes = normalize_detections(job.detections.get(cam_key, []), annotated_img.shape)
+            elif render_mode == "LIGHT" and annotated_img is not None and job.frames.get(cam_key) is not None:
+                frame, display_frame = job.frames[cam_key], annotated_img
+                annotate = job.detections.get(cam_key, [])
+            future = self.state_manager.update_image(
+                cam_key, job.step, frame, boxes=boxes, display_frame=display_frame, annotate=annotate
+            )
+            if future is not None:
+                job.unit.image_futures[f"{cam_key}_step{job.step}"] = future
+
+        # Deduplicate (a bolt may be seen by multiple cameras) and mark all detected bolts OK in one batch
+        detected = dict.fromkeys(job.detected_bolts, "OK")
+        logger.info(f"Detected bolts: {list(detected)}")
+        self.state_manager.update_bolt_statuses(detected)
+
+        # If Step 2 finished, finalize results (Pending -> NG) and snapshot the payload for the DB stage
+        if job.step == 2:
+            logger.info("Step 2 finished. Finalizing results.")
+            job.db_payload = self.state_manager.finalize_results()
+
+    def _stage_db(self, job):
+        if job.kind != "capture":
+            return
+        if job.db_payload is not None:
+            db_payload = job.db_payload
+
+            # Make sure every history image referenced by the record is on disk
+            futures = job.unit.image_futures
+            not_done = self.state_manager.image_writer.flush(list(futures.values()), timeout=IMAGE_FLUSH_TIMEOUT)
+            for storage_key, future in futures.items():
+                if future in not_done or future.exception() is not None:
+                    logger.warning(f"History image for {storage_key} was not written, dropping its path.")
+                    db_payload["images"][storage_key] = None
+
+            # Save to Database
+            save_inspection(
+                frame_id=db_payload["frame_id"],
+                model=db_payload["model"],
+                final_result=db_payload["final_result"],
+                bolt_data=db_payload["bolt_data"],
+                images=db_payload["images"],
+                detections=db_payload["detections"]
+            )
+
+            # If result is NG, send alarm signal to PLC via Modbus Register 2
+            if db_payload["final_result"] == "NG":
+                logger.warning(f"Unit {db_payload['frame_id']} is NG. Triggering PLC Alarm on Register 2.")
+                self.modbus.send_ng_alarm()
+
+        metrics.record(f"step{job.step}_total_ms", (time.monotonic() - job.trigger_time) * 1000)
@@ -1,12 +1,45 @@
 import threading
 import json
-import base64
 import cv2
 import os
 import uuid
 from datetime import datetime
 import time
 
+from image_writer import ImageWriter
+from metrics import metrics
+from yolo_processor import draw_detections
+
+# Bolt List using descriptive IDs, per camera (also the fixed column set of the Parquet archive)
+BOLT_LAYOUT = {
+    "right": [
+        "NUT_FLANGE_6MM_GROUNDING",
+        "BOLT_FIXING_RADIATOR_RESERVE",
+        "BOLT_AXLE_FRONT_WHEEL",
+        "BF_10X55_LINK_ASSY_ENG_HANGER_R",
+        "BF_10X38_REAR_CUSHION_R",
+        "BF_10X65_MUFFLER_CENTER_UPPER",
+        "BF_10X65_MUFFLER_REAR_UNDER",
+        "BF_10X65_MUFFLER_FRONT_UNDER"
+    ],
+    "upper": [
+        "BS_6X18_FENDER_C_REAR_FRONT",
+        "BS_6X18_FENDER_C_REAR_REAR"
+    ],
+    "left": [
+        "NUT_FRONT_AXLE_12MM",
+        "BOLT_TORX_8X28_CALIPER_UNDER",
+        "BOLT_TORX_8X28_CALIPER_UPPER",
+        "BF_8X12_HORN_COMP",
+        "BOLT_SIDE_STAND_PIVOT",
+        "BF_6X12_CLAMP_THROTTLE_CABLE",
+        "BF_10X55_LINK_ASSY_ENG_HANGER_L",
+        "BF_10X38_REAR_CUSHION_L",
+        "BOLT_WASHER_6X12_REAR_FENDER",
+        "BF_10X255_LINK_ASSY_ENG_HANGER_L"
+    ]
+}
+
 class StateManager:
     _instance = None
     _lock = threading.Lock()
@@ -38,40 +71,12 @@ class StateManager:
         self.current_frame_id = "-"
         
         # Bolt List & Statuses using descriptive IDs
-        self.bolt_data = {
-            "right": [
-                "NUT_FLANGE_6MM_GROUNDING",
-                "BOLT_FIXING_RADIATOR_RESERVE",
-                "BOLT_AXLE_FRONT_WHEEL",
-                "BF_10X55_LINK_ASSY_ENG_HANGER_R",
-                "BF_10X38_REAR_CUSHION_R",
-                "BF_10X65_MUFFLER_CENTER_UPPER",
-                "BF_10X65_MUFFLER_REAR_UNDER",
-                "BF_10X65_MUFFLER_FRONT_UNDER"
-            ],
-            "upper": [
-                "BS_6X18_FENDER_C_REAR_FRONT",
-                "BS_6X18_FENDER_C_REAR_REAR"
-            ],
-            "left": [
-                "NUT_FRONT_AXLE_12MM",
-                "BOLT_TORX_8X28_CALIPER_UNDER",
-                "BOLT_TORX_8X28_CALIPER_UPPER",
-                "BF_8X12_HORN_COMP",
-                "BOLT_SIDE_STAND_PIVOT",
-                "BF_6X12_CLAMP_THROTTLE_CABLE",
-                "BF_10X55_LINK_ASSY_ENG_HANGER_L",
-                "BF_10X38_REAR_CUSHION_L",
-                "BOLT_WASHER_6X12_REAR_FENDER",
-                "BF_10X255_LINK_ASSY_ENG_HANGER_L"
-            ]
-        }
+        self.bolt_data = {cam_key: list(bolts) for cam_key, bolts in BOLT_LAYOUT.items()}
         
         # Status Map: { "NUT_FLANGE_6MM_GROUNDING": "-", ... }
         self.bolt_statuses = {bolt: "-" for sublist in self.bolt_data.values() for bolt in sublist}
         
-        # Images (Base64 strings)
-        # Images (Base64 strings for frontend, File paths for DB)
+        # Images (JPEG bytes for the live dashboard, File paths for DB)
         # 6 slots: 3 cameras * 2 steps
         self.images = {
             "right_step1": None, "right_step2": None,
@@ -79,14 +84,51 @@ class StateManager:
             "left_step1": None,  "left_step2": None
         }
         self.image_paths = {k: None for k in self.images}
+        # Normalized detection boxes per slot when the frontend draws the overlays (YOLO render mode JSON)
+        self.image_boxes = {k: None for k in self.images}
+        
+        # Versioning: 'version' is bumped on every state change, each image slot carries the
+        # version at which it last changed (served via /api/live/{slot}.jpg, used as ETag)
+        self.version = 0
+        self.image_versions = {k: 0 for k in self.images}
+        
+        # Callbacks invoked with the new version on every state change (must not block)
+        self._listeners = []
+        
+        # Bumped on every reset so late background image jobs never repopulate a cleared dashboard
+        self._generation = 0
         
         # Ensure history directory exists
         self.history_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "history_images")
         os.makedirs(self.history_dir, exist_ok=True)
+        
+        # History writes + dashboard JPEG encoding run off the control-loop thread
+        self.image_writer = ImageWriter()
+
+    def add_listener(self, callback):
+        """Registers callback(version), called on every state change. It runs under the state lock, so it must not block."""
+        with self.lock:
+            self._listeners.append(callback)
+
+    def _bump_version(self):
+        """Marks the state as changed and notifies listeners. Caller must hold self.lock."""
+        self.version += 1
+        for callback in self._listeners:
+            try:
+                callback(self.version)
+            except Exception:
+                pass
+        return self.version
 
     def set_plc_connected(self, status: bool):
         with self.lock:
             self.system_status["plc_connected"] = status
+            self._bump_version()
+
+    def set_engine_active(self, active: bool):
+        with self.lock:
+            self.system_status["engine_active"] = active
+            self._bump_version()
 
     def reset(self):
         with self.lock:
@@ -97,24 +139,54 @@ class StateManager:
             self.system_status["unit_present"] = False
             
             self.current_frame_id = "-"
+            self._generation += 1
+            version = self._bump_version()
             
             # Reset all image slots
+            for k in self.images:
+                if self.images[k] is not None:
+                    self.image_versions[k] = version
             self.images = {k: None for k in self.images}
             self.image_paths = {k: None for k in self.images}
+            self.image_boxes = {k: None for k in self.images}
+
+    def set_unit_present(self, present: bool):
+        with self.lock:
+            self.system_status["unit_present"] = present
+            self._bump_version()
+
+    @staticmethod
+    def make_fallback_frame_id():
+        """Random traceable ID used when the Frame ID cannot be read by OCR."""
+        return "MH1" + uuid.uuid4().hex[:12].upper()
 
     def generate_frame_id(self):
         with self.lock:
             if self.current_frame_id == "-":
-                self.current_frame_id = "MH1" + uuid.uuid4().hex[:12].upper()
+                self.current_frame_id = self.make_fallback_frame_id()
+                self._bump_version()
 
     def set_frame_id(self, frame_id):
         with self.lock:
             self.current_frame_id = frame_id
+            self._bump_version()
 
     def update_bolt_status(self, bolt_id, status):
         with self.lock:
             if bolt_id in self.bolt_statuses:
                 self.bolt_statuses[bolt_id] = status
+                self._bump_version()
+
+    def update_bolt_statuses(self, statuses):
+        """Applies several {bolt_id: status} updates under one lock, with a single version bump."""
+        with self.lock:
+            changed = False
+            for bolt_id, status in statuses.items():
+                if bolt_id in self.bolt_statuses and self.bolt_statuses[bolt_id] != status:
+                    self.bolt_statuses[bolt_id] = status
+                    changed = True
+            if changed:
+                self._bump_version()
 
     def finalize_results(self):
         """Checks for any pending bolts and sets them to NG"""
@@ -122,6 +194,7 @@ class StateManager:
             for bolt_id, status in self.bolt_statuses.items():
                 if status == "-":
                     self.bolt_statuses[bolt_id] = "NG"
+            self._bump_version()
                     
             # Return payload for DB save
             return {
@@ -129,26 +202,58 @@ class StateManager:
                  "model": self.system_status["model"],
                  "final_result": "OK" if "NG" not in self.bolt_statuses.values() else "NG",
                  "bolt_data": dict(self.bolt_statuses),
-                 "images": dict(self.image_paths)
+                 "images": dict(self.image_paths),
+                 "detections": {k: v for k, v in self.image_boxes.items() if v is not None} or None
             }
                 
-    def update_image(self, camera_key, step, frame):
+    def update_image(self, camera_key, step, frame, boxes=None, display_frame=None, annotate=None):
         """
-        Converts CV2 frame to Base64 and stores it.
+        Saves the frame to history_images/ and publishes a downscaled JPEG to the dashboard.
         key: 'right', 'left', 'upper'
         step: 1 or 2
+        boxes: optional normalized detections drawn by the frontend on top of the (raw) image
+        display_frame: optional ready-made image for the live dashboard (instead of downscaling frame)
+        annotate: optional detection details drawn on (a copy of) frame before it is saved to history
+        The disk write and JPEG encoding run on the background ImageWriter, which takes ownership
+        of 'frame'. The history path is recorded immediately (so finalize_results() includes it);
+        the returned Future must be flushed before that path is persisted. Returns None if no frame.
         """
-        if frame is not None:
-            # Save full-res file to disk for history
-            side_dir = os.path.join(self.history_dir, camera_key)
-            os.makedirs(side_dir, exist_ok=True)
-            capture_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        if frame is None:
+            return None
+
+        storage_key = f"{camera_key}_step{step}"
+        side_dir = os.path.join(self.history_dir, camera_key)
+        capture_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+
+        with self.lock:
+            if storage_key not in self.images:
+                return None
             filename = f"{self.current_frame_id}-{camera_key}_step_{step}-{capture_time}.jpg"
-            filepath = os.path.join(side_dir, filename)
-            cv2.imwrite(filepath, frame)
-            
-            # Downscale for live dashboard to reduce bandwidth/latency
-            # Max width 640px is plenty for dashboard display
+            # Store relative filepath to history_images folder
+            self.image_paths[storage_key] = f"{camera_key}/{filename}"
+            self.image_boxes[storage_key] = boxes
+            generation = self._generation
+
+        filepath = os.path.join(side_dir, filename)
+        return self.image_writer.submit(
+            self._write_image, storage_key, side_dir, filepath, frame, generation, display_frame, annotate
+        )
+
+    def _write_image(self, storage_key, side_dir, filepath, frame, generation, display_frame=None, annotate=None):
+        """ImageWriter job: full-res history file + downscaled JPEG for the live dashboard."""
+        # Save full-res file to disk for history
+        start = time.perf_counter()
+        if annotate:
+            frame = draw_detections(frame, annotate)
+        os.makedirs(side_dir, exist_ok=True)
+        if not cv2.imwrite(filepath, frame):
+            raise IOError(f"cv2.imwrite failed for {filepath}")
+        metrics.record("image_writer.write_ms", (time.perf_counter() - start) * 1000)
+
+        # Downscale for live dashboard to reduce bandwidth/latency
+        # Max width 640px is plenty for dashboard display
+        start = time.perf_counter()
+        if display_frame is None:
             h, w = frame.shape[:2]
             max_w = 640
             if w > max_w:
@@ -157,17 +262,28 @@ class StateManager:
             else:
                 display_frame = frame
 
-            _, buffer = cv2.imencode('.jpg', display_frame, [int(cv2.IMWRITE_JPEG_QUALITY), 80])
-            b64_str = base64.b64encode(buffer).decode('utf-8')
-            storage_key = f"{camera_key}_step{step}"
+        _, buffer = cv2.imencode('.jpg', display_frame, [int(cv2.IMWRITE_JPEG_QUALITY), 80])
+        jpeg_bytes = buffer.tobytes()
+        metrics.record("image_writer.encode_ms", (time.perf_counter() - start) * 1000)
 
-            with self.lock:
-                if storage_key in self.images:
-                    self.images[storage_key] = f"data:image/jpeg;base64,{b64_str}"
-                    # Store relative filepath to history_images folder
-                    self.image_paths[storage_key] = f"{camera_key}/{filename}"
+        with self.lock:
+            if generation == self._generation:
+                self.images[storage_key] = jpeg_bytes
+                self.image_versions[storage_key] = self._bump_version()
+        return filepath
+
+    def get_live_image(self, storage_key):
+        """Returns (jpeg_bytes, version) for a dashboard image slot, or (None, version) if empty."""
+        with self.lock:
+            if storage_key not in self.images:
+                return None, None
+            return self.images[storage_key], self.image_versions[storage_key]
 
     def get_full_state(self):
+        """
+        Snapshot of the live dashboard state. Images are not embedded: each slot is either None or
+        {"version", "url"[, "boxes"]}, and the JPEG itself is served by /api/live/{slot}.jpg.
+        """
         with self.lock:
             # Calculate Final Result
             if not self.system_status["unit_present"]:
@@ -184,10 +300,32 @@ class StateManager:
             self.system_status["final_result"] = final
             self.system_status["frame_id"] = self.current_frame_id
 
+            images = {}
+            for key, jpeg in self.images.items():
+                version = self.image_versions[key]
+                images[key] = {"version": version, "url": f"/api/live/{key}.jpg?v={version}"} if jpeg else None
+                if jpeg and self.image_boxes[key] is not None:
+                    images[key]["boxes"] = self.image_boxes[key]
+
             return {
-                "system": self.system_status,
+                "version": self.version,
+                "system": dict(self.system_status),
                 "timestamp": time.time(),
                 "bolt_data": self.bolt_data,
-                "statuses": self.bolt_statuses,
-                "images": self.images
+                "statuses": dict(self.bolt_statuses),
+                "images": images
             }
+
+
+def diff_state(old, new):
+    """
+    Computes a delta between two get_full_state() snapshots.
+    Only changed entries of 'system', 'statuses' and 'images' are included; 'bolt_data' is static.
+    """
+    delta = {"type": "delta", "version": new["version"], "timestamp": new["timestamp"]}
+    for section in ["system", "statuses", "images"]:
+        old_section = old.get(section) or {}
+        changed = {k: v for k, v in new[section].items() if k not in old_section or old_section[k] != v}
+        if changed:
+            delta[section] = changed
+    return delta
@@ -0,0 +1,157 @@
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+from database import get_connection
+
+logger = logging.getLogger("stats")
+
+# Shift start hours (each shift lasts until the next one starts; the last one runs past midnight)
+SHIFT_STARTS = [("1", 6), ("2", 14), ("3", 22)]
+RECENT_SHIFTS = 3 # Shifts kept in memory (current + previous ones, i.e. one production day)
+THROUGHPUT_WINDOW = timedelta(hours=1)
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def shift_for(when):
+    """Returns (shift name, shift start datetime) for a datetime."""
+    day = when.replace(hour=0, minute=0, second=0, microsecond=0)
+    name, start_hour = SHIFT_STARTS[-1]
+    start = day - timedelta(days=1) + timedelta(hours=start_hour)
+    for shift_name, shift_hour in SHIFT_STARTS:
+        if when.hour >= shift_hour:
+            name, start = shift_name, day + timedelta(hours=shift_hour)
+    return name, start
+
+
+class _ShiftCounters:
+    def __init__(self, name, start):
+        self.name = name
+        self.start = start
+        self.ok = 0
+        self.ng = 0
+        self.bolts = {} # bolt_id -> [ng, total]
+
+    def to_dict(self, include_bolts=False):
+        total = self.ok + self.ng
+        data = {
+            "name": self.name,
+            "start": self.start.strftime(TIME_FORMAT),
+            "ok": self.ok,
+            "ng": self.ng,
+            "total": total,
+            "yield": round(self.ok / total, 4) if total else None,
+        }
+        if include_bolts:
+            data["bolts"] = {
+                bolt_id: {"ng": ng, "total": count, "ng_rate": round(ng / count, 4) if count else None}
+                for bolt_id, (ng, count) in self.bolts.items()
+            }
+        return data
+
+
+class StatsTracker:
+    """
+    Rolling dashboard statistics, updated per saved inspection (see database.add_insert_listener).
+    - OK/NG counts for the current and previous shifts, per-bolt NG rates for the current shift
+    - Throughput: units finished in the last hour
+    Memory and snapshot() cost are bounded by the number of shifts/bolts, not by the history size.
+    On startup, load() hydrates the counters from the hourly summary tables maintained by save_inspection.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._shifts = deque(maxlen=RECENT_SHIFTS)
+        self._finish_times = deque() # datetimes of inspections within THROUGHPUT_WINDOW
+
+    def _shift(self, when):
+        """Returns the counters of the shift containing 'when', rolling over to a new shift if needed."""
+        name, start = shift_for(when)
+        for shift in reversed(self._shifts):
+            if shift.start == start:
+                return shift
+        if self._shifts and start < self._shifts[-1].start:
+            return None # Older than anything tracked
+        shift = _ShiftCounters(name, start)
+        self._shifts.append(shift)
+        return shift
+
+    def _current_shift(self, now):
+        """Counters of the shift containing 'now'; the newest tracked shift if the clock stepped back before it."""
+        return self._shift(now) or self._shifts[-1]
+
+    def _trim_window(self, now):
+        cutoff = now - THROUGHPUT_WINDOW
+        while self._finish_times and self._finish_times[0] < cutoff:
+            self._finish_times.popleft()
+
+    def record(self, record):
+        """Insert listener: counts one saved inspection record."""
+        when = datetime.strptime(record["check_time"], TIME_FORMAT)
+        with self.lock:
+            shift = self._shift(when)
+            if shift is not None:
+                if record["final_result"] == "OK":
+                    shift.ok += 1
+                elif record["final_result"] == "NG":
+                    shift.ng += 1
+                for bolt_id, status in record["bolt_data"].items():
+                    counts = shift.bolts.setdefault(bolt_id, [0, 0])
+                    counts[0] += status == "NG"
+                    counts[1] += 1
+            self._finish_times.append(when)
+            self._trim_window(when)
+
+    def load(self, now=None):
+        """Hydrates the counters from the hourly summary tables (at most one day of hourly rows)."""
+        now = now or datetime.now()
+        _, current_start = shift_for(now)
+        since_hour = (current_start - timedelta(days=1)).strftime("%Y-%m-%d %H")
+        try:
+            conn = get_connection()
+            hours = conn.execute('''
+                SELECT hour, SUM(ok_count), SUM(ng_count) FROM inspection_stats_hourly
+                WHERE hour >= ? GROUP BY hour ORDER BY hour
+            ''', (since_hour,)).fetchall()
+            bolts = conn.execute('''
+                SELECT bolt_id, SUM(ng_count), SUM(total) FROM bolt_stats_hourly
+                WHERE hour >= ? GROUP BY bolt_id
+            ''', (current_start.strftime("%Y-%m-%d %H"),)).fetchall()
+            # Served by idx_inspections_check_time; bounded by one hour of production
+            recent = conn.execute(
+                "SELECT check_time FROM inspections WHERE check_time >= ? ORDER BY check_time",
+                ((now - THROUGHPUT_WINDOW).strftime(TIME_FORMAT),)
+            ).fetchall()
+        except Exception as e:
+            logger.error(f"Error loading statistics: {e}")
+            return
+
+        with self.lock:
+            self._shifts.clear()
+            for hour, ok, ng in hours:
+                shift = self._shift(datetime.strptime(hour, "%Y-%m-%d %H"))
+                shift.ok += ok
+                shift.ng += ng
+            current = self._current_shift(now)
+            current.bolts = {bolt_id: [ng, total] for bolt_id, ng, total in bolts}
+            self._finish_times = deque(datetime.strptime(row[0], TIME_FORMAT) for row in recent)
+        logger.info(f"Statistics loaded: {current.ok + current.ng} inspection(s) in the current shift.")
+
+    def snapshot(self, now=None):
+        """Returns the dashboard statistics as a JSON-serializable dict."""
+        now = now or datetime.now()
+        with self.lock:
+            current = self._current_shift(now)
+            self._trim_window(now)
+            return {
+                "timestamp": now.strftime(TIME_FORMAT),
+                "shift": current.to_dict(include_bolts=True),
+                "recent_shifts": [shift.to_dict() for shift in self._shifts],
+                "throughput": {
+                    "units_per_hour": len(self._finish_times) * 3600 / THROUGHPUT_WINDOW.total_seconds(),
+                },
+            }
+
+
+stats_tracker = StatsTracker()
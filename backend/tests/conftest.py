@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+# The backend modules are imported as top-level modules (like main.py does)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Points the database module at an empty SQLite file for the duration of a test."""
+    path = str(tmp_path / "inspection_history.db")
+    monkeypatch.setattr(database, "DB_PATH", path)
+    yield path
+    database.close_connection()
+    database.invalidate_record_cache()
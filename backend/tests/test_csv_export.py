@@ -0,0 +1,33 @@
+import database
+
+
+def export_lines(**kwargs):
+    return "".join(database.iter_csv_export(**kwargs)).splitlines()
+
+
+def test_since_last_export_only_returns_new_rows(db_path):
+    database.init_db()
+    database.save_inspection("MH1A", "PCX 160", "OK", {"B1": "OK"}, {})
+    assert len(export_lines(since_last=True)) == 2
+    assert len(export_lines(since_last=True)) == 1 # Header only: nothing new
+
+    database.save_inspection("MH1B", "PCX 160", "NG", {"B1": "NG"}, {})
+    lines = export_lines(since_last=True)
+    assert len(lines) == 2 and lines[1].split(",")[1] == "MH1B"
+
+
+def test_full_export_does_not_move_the_incremental_marker(db_path):
+    database.init_db()
+    database.save_inspection("MH1A", "PCX 160", "OK", {"B1": "OK"}, {})
+    assert len(export_lines()) == 2
+    assert database.get_last_exported_id("csv") == 0
+    assert len(export_lines(since_last=True)) == 2
+
+
+def test_aborted_export_does_not_move_the_marker(db_path):
+    database.init_db()
+    database.save_inspection("MH1A", "PCX 160", "OK", {"B1": "OK"}, {})
+    stream = database.iter_csv_export(since_last=True)
+    next(stream) # Header only, then the client disconnects
+    stream.close()
+    assert database.get_last_exported_id("csv") == 0
@@ -0,0 +1,56 @@
+import numpy as np
+
+from yolo_processor import DetectionDecoder
+
+NAMES = {0: "bolt 1", 1: "Bolt (2)", 2: "frame id", 4: "bolt 4"}
+
+
+def test_labels_are_formatted_once_per_class():
+    decoder = DetectionDecoder(NAMES)
+    # Gaps in the names table fall back to the class id
+    assert decoder.labels.tolist() == ["BOLT_1", "BOLT_2", "FRAME_ID", "3", "BOLT_4"]
+    assert DetectionDecoder(["a b", "c"]).labels.tolist() == ["A_B", "C"]
+
+
+def test_details_are_sorted_by_confidence():
+    decoder = DetectionDecoder(NAMES)
+    detected, details = decoder.decode([2, 0], [0.4, 0.8], [[1, 2, 3, 4], [5, 6, 7, 8]])
+    assert detected == ["BOLT_1", "FRAME_ID"]
+    assert [d["label"] for d in details] == ["BOLT_1", "FRAME_ID"]
+    assert details[0]["box"] == [5.0, 6.0, 7.0, 8.0]
+    assert details[0]["conf"] == np.float32(0.8).item()
+
+
+def test_detected_ids_are_unique_in_confidence_order():
+    decoder = DetectionDecoder(NAMES)
+    detected, details = decoder.decode([1, 0, 1, 4], [0.6, 0.7, 0.9, 0.3], np.zeros((4, 4)))
+    assert detected == ["BOLT_2", "BOLT_1", "BOLT_4"]
+    assert len(details) == 4
+
+
+def test_per_class_thresholds():
+    decoder = DetectionDecoder(NAMES, class_thresholds={"BOLT_1": 0.5, "FRAME_ID": 0.9})
+    detected, details = decoder.decode([0, 0, 2, 1], [0.49, 0.5, 0.8, 0.1], np.zeros((4, 4)))
+    assert detected == ["BOLT_1", "BOLT_2"]
+    assert [(d["label"], round(d["conf"], 2)) for d in details] == [("BOLT_1", 0.5), ("BOLT_2", 0.1)]
+
+
+def test_bolt_mask_limits_detected_but_keeps_details():
+    decoder = DetectionDecoder(NAMES, bolt_ids={"BOLT_1", "BOLT_4"})
+    detected, details = decoder.decode([2, 0, 1], [0.9, 0.8, 0.7], np.zeros((3, 4)))
+    assert detected == ["BOLT_1"]
+    assert [d["label"] for d in details] == ["FRAME_ID", "BOLT_1", "BOLT_2"]
+
+
+def test_unknown_class_ids_are_dropped():
+    decoder = DetectionDecoder(NAMES)
+    detected, details = decoder.decode([7, 0], [0.99, 0.5], np.zeros((2, 4)))
+    assert detected == ["BOLT_1"]
+    assert len(details) == 1
+
+
+def test_empty_inputs():
+    assert DetectionDecoder(NAMES).decode([], [], np.zeros((0, 4))) == ([], [])
+    # A model without class names (e.g. before the model is loaded) decodes nothing
+    assert DetectionDecoder({}).decode([0], [0.9], [[0, 0, 1, 1]]) == ([], [])
+    assert DetectionDecoder(None).decode([], [], []) == ([], [])
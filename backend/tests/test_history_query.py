@@ -0,0 +1,84 @@
+import pytest
+
+import database
+
+# (frame_id, model, check_time, final_result, bolts); several units share a second, so the
+# keyset has to fall back on the id to order and split them
+ROWS = [
+    ("MH1A001", "PCX 160", "2026-10-16 08:00:00", "OK", {"B1": "OK"}),
+    ("MH1A002", "PCX 160", "2026-10-16 08:00:00", "NG", {"B1": "NG"}),
+    ("MH1A003", "ADV 160", "2026-10-16 08:00:00", "OK", {"B1": "OK"}),
+    ("MH1B001", "PCX 160", "2026-10-16 08:00:01", "NG", {"B1": "OK", "B2": "NG"}),
+    ("MH1B002", "ADV 160", "2026-10-16 08:00:02", "OK", {"B1": "OK"}),
+    ("MH1B003", "PCX 160", "2026-10-16 08:00:02", "NG", {"B1": "NG"}),
+    ("MH1C001", "PCX 160", "2026-10-16 09:30:00", "OK", {"B1": "OK"}),
+]
+
+
+@pytest.fixture
+def history(db_path):
+    database.init_db()
+    ids = []
+    for frame_id, model, check_time, result, bolts in ROWS:
+        record_id = database.save_inspection(frame_id, model, result, bolts, {})
+        with database.get_connection() as conn:
+            conn.execute("UPDATE inspections SET check_time = ? WHERE id = ?", (check_time, record_id))
+        ids.append(record_id)
+    database.invalidate_record_cache()
+    return ids
+
+
+def all_pages(limit, **filters):
+    pages = []
+    cursor = None
+    while True:
+        records, cursor = database.query_history(limit=limit, cursor=cursor, **filters)
+        pages.append([r["frame_id"] for r in records])
+        if cursor is None:
+            return pages
+
+
+def newest_first(rows):
+    """Expected order: check_time descending, then insertion (id) descending."""
+    order = sorted(range(len(rows)), key=lambda i: (rows[i][2], i), reverse=True)
+    return [rows[i][0] for i in order]
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 7, 50])
+def test_pages_cover_every_row_once_in_order(history, limit):
+    pages = all_pages(limit)
+    assert [frame_id for page in pages for frame_id in page] == newest_first(ROWS)
+    assert all(len(page) <= limit for page in pages)
+    assert all(pages)
+
+
+def test_last_page_has_no_cursor(history):
+    records, cursor = database.query_history(limit=len(ROWS))
+    assert len(records) == len(ROWS) and cursor is None
+
+
+def test_cursor_splits_rows_with_the_same_check_time(history):
+    records, cursor = database.query_history(limit=5)
+    # Page boundary inside the 08:00:00 second
+    assert cursor == f"2026-10-16 08:00:00|{records[-1]['id']}"
+    rest, _ = database.query_history(limit=10, cursor=cursor)
+    assert [r["frame_id"] for r in rest] == ["MH1A002", "MH1A001"]
+
+
+def test_filters_combine_with_pagination(history):
+    pages = all_pages(1, final_result="NG", model="PCX 160")
+    assert [p[0] for p in pages] == ["MH1B003", "MH1B001", "MH1A002"]
+
+    pages = all_pages(2, frame_id_prefix="mh1b")
+    assert [frame_id for page in pages for frame_id in page] == ["MH1B003", "MH1B002", "MH1B001"]
+
+    records, _ = database.query_history(ng_bolt="B2")
+    assert [r["frame_id"] for r in records] == ["MH1B001"]
+
+    records, _ = database.query_history(date_from="2026-10-16T08:00:01", date_to="2026-10-16 08:00:02")
+    assert [r["frame_id"] for r in records] == ["MH1B003", "MH1B002", "MH1B001"]
+
+
+def test_malformed_cursor_raises(history):
+    with pytest.raises(ValueError):
+        database.query_history(cursor="not-a-cursor")
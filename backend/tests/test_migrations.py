@@ -0,0 +1,104 @@
+import json
+import sqlite3
+
+import database
+
+# Schema of the inspections table before any migration (as created by the original init_db)
+LEGACY_SCHEMA = '''
+    CREATE TABLE inspections (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        frame_id TEXT NOT NULL,
+        model TEXT NOT NULL,
+        check_time DATETIME NOT NULL,
+        final_result TEXT NOT NULL,
+        bolt_data TEXT NOT NULL,
+        images TEXT NOT NULL
+    )
+'''
+
+
+def make_legacy_db(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute(LEGACY_SCHEMA)
+    conn.executemany(
+        "INSERT INTO inspections (frame_id, model, check_time, final_result, bolt_data, images) VALUES (?, ?, ?, ?, ?, ?)",
+        [(frame_id, model, check_time, result, json.dumps(bolts), "{}") for frame_id, model, check_time, result, bolts in rows]
+    )
+    conn.commit()
+    conn.close()
+
+
+LEGACY_ROWS = [
+    ("MH1A", "PCX 160", "2026-10-16 08:10:00", "OK", {"B1": "OK", "B2": "OK"}),
+    ("MH1B", "PCX 160", "2026-10-16 08:40:00", "NG", {"B1": "NG", "B2": "OK"}),
+    ("MH1C", "ADV 160", "2026-10-16 09:05:00", "NG", {"B1": "OK", "B2": "NG"}),
+]
+
+
+def user_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def test_migrates_existing_database_to_latest(db_path):
+    make_legacy_db(db_path, LEGACY_ROWS)
+    database.init_db()
+    conn = database.get_connection()
+
+    assert user_version(conn) == len(database.MIGRATIONS)
+    indexes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_inspections_check_time", "idx_inspections_frame_id", "idx_inspections_result_time",
+            "idx_inspections_model_time", "idx_inspection_bolts_bolt_status"} <= indexes
+    assert "idx_inspections_final_result" not in indexes
+
+    # 3: per-bolt rows backfilled from the JSON
+    bolts = conn.execute("SELECT COUNT(*), SUM(status = 'NG') FROM inspection_bolts").fetchone()
+    assert tuple(bolts) == (6, 2)
+    # 4: export bookkeeping exists and starts empty
+    assert database.get_last_exported_id("csv") == 0
+    # 5: hourly summaries backfilled
+    hourly = conn.execute("SELECT hour, model, ok_count, ng_count FROM inspection_stats_hourly ORDER BY hour, model").fetchall()
+    assert [tuple(r) for r in hourly] == [("2026-10-16 08", "PCX 160", 1, 1), ("2026-10-16 09", "ADV 160", 0, 1)]
+    bolt_hourly = conn.execute("SELECT ng_count, total FROM bolt_stats_hourly WHERE hour = '2026-10-16 08' AND bolt_id = 'B1'").fetchone()
+    assert tuple(bolt_hourly) == (1, 2)
+    # 6: detections column, empty for old rows
+    record = database.get_inspection(1)
+    assert record["frame_id"] == "MH1A" and record["detections"] is None
+
+
+def test_init_db_is_idempotent(db_path):
+    make_legacy_db(db_path, LEGACY_ROWS)
+    database.init_db()
+    database.init_db()
+    conn = database.get_connection()
+    assert user_version(conn) == len(database.MIGRATIONS)
+    assert conn.execute("SELECT COUNT(*) FROM inspection_bolts").fetchone()[0] == 6
+    assert conn.execute("SELECT SUM(ok_count + ng_count) FROM inspection_stats_hourly").fetchone()[0] == 3
+
+
+def test_resumes_from_partial_migration(db_path):
+    make_legacy_db(db_path, LEGACY_ROWS)
+    conn = sqlite3.connect(db_path)
+    for statements in database.MIGRATIONS[:3]:
+        for statement in statements:
+            conn.execute(statement)
+    conn.execute("PRAGMA user_version = 3")
+    conn.commit()
+    conn.close()
+
+    database.init_db()
+    conn = database.get_connection()
+    assert user_version(conn) == len(database.MIGRATIONS)
+    assert conn.execute("SELECT COUNT(*) FROM inspection_bolts").fetchone()[0] == 6
+    assert conn.execute("SELECT COUNT(*) FROM inspection_stats_hourly").fetchone()[0] == 2
+
+
+def test_new_inspections_after_migration(db_path):
+    make_legacy_db(db_path, LEGACY_ROWS)
+    database.init_db()
+    record_id = database.save_inspection("MH1D", "PCX 160", "NG", {"B1": "NG"}, {"left_step1": "left/x.jpg"},
+                                         detections={"left_step1": [{"label": "B1", "box": [0.1, 0.1, 0.2, 0.2]}]})
+    record = database.get_inspection(record_id)
+    assert record["bolt_data"] == {"B1": "NG"}
+    assert record["detections"]["left_step1"][0]["label"] == "B1"
+    conn = database.get_connection()
+    assert conn.execute("SELECT status FROM inspection_bolts WHERE inspection_id = ?", (record_id,)).fetchone()[0] == "NG"
@@ -0,0 +1,100 @@
+import itertools
+
+import numpy as np
+
+from metrics import metrics
+from ocr_processor import RealOcrProcessor, make_variants, vote_characters
+
+
+def test_vote_without_candidates():
+    assert vote_characters([]) is None
+    assert vote_characters([(None, 0.9), ("", 0.5)]) is None
+
+
+def test_vote_single_candidate():
+    assert vote_characters([("MH1ABC", 0.4)]) == "MH1ABC"
+
+
+def test_vote_is_per_character_and_confidence_weighted():
+    candidates = [("MH1A8C", 0.9), ("MH1ABC", 0.6), ("MH1ABC", 0.5), ("NH1ABC", 0.3)]
+    # Position 4: '8' (0.9) loses to 'B' (0.6 + 0.5); position 0: 'M' wins over 'N'
+    assert vote_characters(candidates) == "MH1ABC"
+
+
+def test_vote_uses_the_best_supported_length_only():
+    candidates = [("MH1ABCD", 0.95), ("MH1ABC", 0.5), ("MH1XBC", 0.6)]
+    # Length 6 has 1.1 of support vs 0.95 for length 7; the 7-character reading is ignored
+    assert vote_characters(candidates) == "MH1XBC"
+
+
+def test_variants_keep_the_crop_shape_and_differ():
+    crop = np.random.default_rng(0).integers(0, 255, (40, 160, 3), dtype=np.uint8)
+    variants = make_variants(crop)
+    assert len(variants) == 5
+    assert all(v.shape == crop.shape for v in variants)
+    assert variants[0] is crop
+    for i, a in enumerate(variants):
+        for b in variants[i + 1:]:
+            assert not np.array_equal(a, b)
+
+
+class FakeEngine:
+    """Stands in for PaddleOCR: returns the next scripted text from ocr()."""
+    def __init__(self, texts):
+        self.texts = iter(texts)
+        self.calls = 0
+
+    def ocr(self, frame):
+        self.calls += 1
+        return [{"rec_texts": [next(self.texts)], "rec_scores": [0.9]}]
+
+
+class FakeRecognizer:
+    def __init__(self, text, score):
+        self.text = text
+        self.score = score
+
+    def predict(self, crop):
+        return [{"rec_text": self.text, "rec_score": self.score}]
+
+
+def crop():
+    return np.zeros((40, 160, 3), np.uint8)
+
+
+def test_voting_skips_variants_that_raise():
+    built = []
+
+    def engine_factory():
+        built.append(1)
+        if len(built) == 2: # The first voting worker fails to build its engine
+            raise RuntimeError("engine build failed")
+        return FakeEngine(itertools.repeat("MH1ABC"))
+
+    processor = RealOcrProcessor(engine_mode="VOTING", rec_only=False, engine_factory=engine_factory)
+    errors = metrics.snapshot()["counters"].get("ocr.errors", 0)
+    try:
+        assert processor.process(crop()) == "MH1ABC"
+    finally:
+        processor.close()
+    assert metrics.snapshot()["counters"]["ocr.errors"] == errors + 1
+
+
+def test_failed_reads_are_not_cached():
+    engine = FakeEngine(["", "MH1ABC"])
+    processor = RealOcrProcessor(rec_only=False, engine_factory=lambda: engine)
+    assert processor.process(crop()) is None
+    assert processor.process(crop()) == "MH1ABC"
+    assert processor.process(crop()) == "MH1ABC"
+    assert engine.calls == 2 # The last read came from the cache
+
+
+def test_fast_path_falls_back_to_the_full_pipeline_when_unsure():
+    engine = FakeEngine(itertools.repeat("MH1FULL"))
+    sure = RealOcrProcessor(engine_factory=lambda: engine, recognizer_factory=lambda: FakeRecognizer("mh1 fast", 0.95))
+    assert sure.process(crop()) == "MH1FAST"
+    assert engine.calls == 0
+
+    unsure = RealOcrProcessor(engine_factory=lambda: engine, recognizer_factory=lambda: FakeRecognizer("MH1FAST", 0.5))
+    assert unsure.process(crop()) == "MH1FULL"
+    assert engine.calls == 1
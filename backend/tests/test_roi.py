@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from metrics import metrics
+from yolo_processor import YoloProcessorBase, merge_regions
+
+
+class CropRecorder(YoloProcessorBase):
+    """Reports one detection per crop, at a fixed position inside the crop."""
+    def __init__(self):
+        super().__init__()
+        self.crops = {}
+
+    def _infer_crops(self, crops):
+        self.crops = crops
+        return {
+            crop_key: (["BOLT_1"], [{"label": "BOLT_1", "box": [10.0, 5.0, 20.0, 15.0], "conf": 0.9}])
+            for crop_key in crops
+        }
+
+    def process(self, frame):
+        return ["FULL"], frame, [{"label": "FULL", "box": [0.0, 0.0, 1.0, 1.0], "conf": 0.5}]
+
+
+def test_merge_regions_keeps_disjoint_regions():
+    assert merge_regions([(0.1, 0.1, 0.2, 0.2), (0.5, 0.5, 0.6, 0.6)]) == [(0.1, 0.1, 0.2, 0.2), (0.5, 0.5, 0.6, 0.6)]
+
+
+def test_merge_regions_merges_overlaps_transitively():
+    regions = [(0.1, 0.1, 0.3, 0.3), (0.5, 0.1, 0.7, 0.3), (0.25, 0.1, 0.55, 0.2)]
+    assert merge_regions(regions) == [(0.1, 0.1, 0.7, 0.3)]
+
+
+def test_merge_regions_margin_clamps_and_can_merge():
+    merged = merge_regions([(0.0, 0.0, 0.2, 0.2), (0.23, 0.0, 0.4, 0.2), (0.9, 0.9, 1.0, 1.0)], margin=0.02)
+    assert merged[0] == pytest.approx((0.0, 0.0, 0.42, 0.22))
+    assert merged[1] == pytest.approx((0.88, 0.88, 1.0, 1.0))
+
+
+def test_inference_size_rounds_up_to_the_stride():
+    processor = YoloProcessorBase()
+    assert processor._inference_size((1080, 1920, 3), 640 / 1920) == (384, 640)
+    assert processor._inference_size((100, 250, 3), 640 / 1920) == (64, 96)
+    assert processor._inference_size((10, 10, 3), 0.1) == (32, 32)
+
+
+def test_roi_boxes_are_mapped_back_to_frame_coordinates():
+    processor = CropRecorder()
+    processor.render_mode = "JSON"
+    processor.set_rois({"left": {"BOLT_1": (0.25, 0.5, 0.5, 1.0), "BOLT_2": (0.75, 0.0, 1.0, 0.25)}}, margin=0)
+    frame = np.zeros((400, 800, 3), np.uint8)
+
+    results = processor.process_many({"left": frame, "upper": frame, "right": None})
+
+    detected, annotated, details = results["left"]
+    assert detected == ["BOLT_1"] # Listed once although both crops found it
+    assert annotated is frame
+    assert sorted(d["box"] for d in details) == [[210.0, 205.0, 220.0, 215.0], [610.0, 5.0, 620.0, 15.0]]
+    # Cameras without ROIs take the full-frame path, missing frames stay None
+    assert results["upper"][0] == ["FULL"]
+    assert results["right"] is None
+
+    # Crops keep the pixel scale of full-frame inference (640 / 800)
+    sizes = {key: size for key, (_, size) in processor.crops.items()}
+    assert sizes == {"left#roi0": (160, 160), "left#roi1": (96, 160)}
+    assert metrics.snapshot()["gauges"]["yolo.roi_pixel_fraction"] == round((160 * 160 + 96 * 160) / (320 * 640), 3)
@@ -0,0 +1,59 @@
+import copy
+
+from state_manager import diff_state
+
+
+def make_state(version=1):
+    return {
+        "version": version,
+        "timestamp": "2026-10-17 08:00:00",
+        "system": {"engine_active": True, "unit_present": False, "final_result": "-", "frame_id": "-"},
+        "statuses": {"B1": "-", "B2": "-"},
+        "images": {"left_step1": None, "left_step2": None},
+        "bolt_data": {"left": ["B1", "B2"]},
+    }
+
+
+def test_unchanged_state_gives_an_empty_delta():
+    old = make_state()
+    new = make_state(version=2)
+    assert diff_state(old, new) == {"type": "delta", "version": 2, "timestamp": new["timestamp"]}
+
+
+def test_only_changed_entries_are_included():
+    old = make_state()
+    new = copy.deepcopy(old)
+    new["version"] = 5
+    new["system"]["unit_present"] = True
+    new["statuses"]["B2"] = "OK"
+    new["images"]["left_step1"] = {"version": 4, "url": "/api/live/left_step1.jpg?v=4"}
+
+    delta = diff_state(old, new)
+    assert delta["version"] == 5
+    assert delta["system"] == {"unit_present": True}
+    assert delta["statuses"] == {"B2": "OK"}
+    assert delta["images"] == {"left_step1": {"version": 4, "url": "/api/live/left_step1.jpg?v=4"}}
+    assert "bolt_data" not in delta
+
+
+def test_cleared_image_is_sent_as_none():
+    old = make_state()
+    old["images"]["left_step1"] = {"version": 4, "url": "/api/live/left_step1.jpg?v=4"}
+    new = make_state(version=6)
+    assert diff_state(old, new)["images"] == {"left_step1": None}
+
+
+def test_changed_boxes_count_as_an_image_change():
+    old = make_state()
+    old["images"]["left_step1"] = {"version": 4, "url": "u", "boxes": [{"label": "B1", "box": [0, 0, 0.1, 0.1]}]}
+    new = copy.deepcopy(old)
+    new["images"]["left_step1"]["boxes"] = []
+    assert diff_state(old, new)["images"]["left_step1"]["boxes"] == []
+
+
+def test_missing_sections_in_the_old_state_send_everything():
+    new = make_state()
+    delta = diff_state({}, new)
+    assert delta["system"] == new["system"]
+    assert delta["statuses"] == new["statuses"]
+    assert delta["images"] == new["images"]
@@ -0,0 +1,138 @@
+from datetime import datetime
+
+import pytest
+
+import database
+from stats import StatsTracker, shift_for
+
+
+@pytest.fixture
+def clock(db_path, monkeypatch):
+    """Fresh database; controls the check_time save_inspection() stamps on records."""
+    database.init_db()
+    class FakeDatetime(datetime):
+        current = datetime(2026, 10, 17, 12, 0, 0)
+
+        @classmethod
+        def now(cls, tz=None):
+            return cls.current
+
+    monkeypatch.setattr(database, "datetime", FakeDatetime)
+    return FakeDatetime
+
+
+def save(clock, when, result, bolts):
+    clock.current = when
+    return database.save_inspection(f"F{when:%H%M%S}", "MODEL_A", result, bolts, {})
+
+
+def record(when, result, bolts=None):
+    return {"check_time": when.strftime("%Y-%m-%d %H:%M:%S"), "final_result": result, "bolt_data": bolts or {}}
+
+
+@pytest.mark.parametrize("when, name, start", [
+    (datetime(2026, 10, 17, 5, 59), "3", datetime(2026, 10, 16, 22)),
+    (datetime(2026, 10, 17, 6, 0), "1", datetime(2026, 10, 17, 6)),
+    (datetime(2026, 10, 17, 13, 59), "1", datetime(2026, 10, 17, 6)),
+    (datetime(2026, 10, 17, 14, 0), "2", datetime(2026, 10, 17, 14)),
+    (datetime(2026, 10, 17, 22, 0), "3", datetime(2026, 10, 17, 22)),
+    (datetime(2026, 10, 18, 0, 30), "3", datetime(2026, 10, 17, 22)),
+])
+def test_shift_boundaries(when, name, start):
+    assert shift_for(when) == (name, start)
+
+
+def test_save_inspection_feeds_hourly_tables_and_load(clock):
+    save(clock, datetime(2026, 10, 17, 12, 10), "OK", {"B1": "OK", "B2": "OK"})
+    save(clock, datetime(2026, 10, 17, 12, 50), "NG", {"B1": "NG", "B2": "OK"})
+    save(clock, datetime(2026, 10, 17, 13, 30), "OK", {"B1": "OK", "B2": "OK"})
+    save(clock, datetime(2026, 10, 17, 14, 5), "NG", {"B1": "OK", "B2": "NG"})
+
+    conn = database.get_connection()
+    rows = lambda sql: [tuple(row) for row in conn.execute(sql)]
+    assert rows("SELECT hour, ok_count, ng_count FROM inspection_stats_hourly ORDER BY hour") == [("2026-10-17 12", 1, 1), ("2026-10-17 13", 1, 0), ("2026-10-17 14", 0, 1)]
+    assert rows("SELECT hour, bolt_id, ng_count, total FROM bolt_stats_hourly ORDER BY hour, bolt_id") == [
+        ("2026-10-17 12", "B1", 1, 2), ("2026-10-17 12", "B2", 0, 2),
+        ("2026-10-17 13", "B1", 0, 1), ("2026-10-17 13", "B2", 0, 1),
+        ("2026-10-17 14", "B1", 0, 1), ("2026-10-17 14", "B2", 1, 1),
+    ]
+
+    now = datetime(2026, 10, 17, 14, 20)
+    tracker = StatsTracker()
+    tracker.load(now=now)
+    data = tracker.snapshot(now=now)
+
+    assert data["shift"] == {
+        "name": "2", "start": "2026-10-17 14:00:00", "ok": 0, "ng": 1, "total": 1, "yield": 0.0,
+        "bolts": {"B1": {"ng": 0, "total": 1, "ng_rate": 0.0}, "B2": {"ng": 1, "total": 1, "ng_rate": 1.0}},
+    }
+    assert [(s["name"], s["ok"], s["ng"]) for s in data["recent_shifts"]] == [("1", 2, 1), ("2", 0, 1)]
+    # 13:30 and 14:05 are within the last hour
+    assert data["throughput"]["units_per_hour"] == 2
+
+
+def test_load_matches_live_recording(clock):
+    live = StatsTracker()
+    database.add_insert_listener(live.record)
+    try:
+        save(clock, datetime(2026, 10, 17, 13, 58), "OK", {"B1": "OK"})
+        save(clock, datetime(2026, 10, 17, 14, 1), "NG", {"B1": "NG"})
+    finally:
+        database._insert_listeners.remove(live.record)
+
+    now = datetime(2026, 10, 17, 14, 2)
+    loaded = StatsTracker()
+    loaded.load(now=now)
+    assert loaded.snapshot(now=now) == live.snapshot(now=now)
+
+
+def test_record_rolls_over_to_the_next_shift():
+    tracker = StatsTracker()
+    tracker.record(record(datetime(2026, 10, 17, 21, 59, 59), "OK", {"B1": "OK"}))
+    tracker.record(record(datetime(2026, 10, 17, 22, 0, 0), "NG", {"B1": "NG"}))
+
+    data = tracker.snapshot(now=datetime(2026, 10, 17, 22, 0, 1))
+    assert (data["shift"]["name"], data["shift"]["ng"], data["shift"]["ok"]) == ("3", 1, 0)
+    assert data["shift"]["bolts"] == {"B1": {"ng": 1, "total": 1, "ng_rate": 1.0}}
+    assert [(s["name"], s["total"]) for s in data["recent_shifts"]] == [("2", 1), ("3", 1)]
+
+
+def test_recent_shifts_are_bounded():
+    tracker = StatsTracker()
+    for day, hour in [(16, 7), (16, 15), (16, 23), (17, 7)]:
+        tracker.record(record(datetime(2026, 10, day, hour), "OK"))
+    data = tracker.snapshot(now=datetime(2026, 10, 17, 7, 30))
+    assert [s["start"] for s in data["recent_shifts"]] == [
+        "2026-10-16 14:00:00", "2026-10-16 22:00:00", "2026-10-17 06:00:00",
+    ]
+
+
+def test_throughput_window():
+    tracker = StatsTracker()
+    for minute in (0, 30, 50):
+        tracker.record(record(datetime(2026, 10, 17, 12, minute), "OK"))
+    assert tracker.snapshot(now=datetime(2026, 10, 17, 12, 55))["throughput"]["units_per_hour"] == 3
+    assert tracker.snapshot(now=datetime(2026, 10, 17, 13, 20))["throughput"]["units_per_hour"] == 2
+    assert tracker.snapshot(now=datetime(2026, 10, 17, 14, 0))["throughput"]["units_per_hour"] == 0
+
+
+def test_snapshot_before_the_newest_shift_falls_back_to_it():
+    # Clock stepped back across a shift change (e.g. NTP correction)
+    tracker = StatsTracker()
+    tracker.record(record(datetime(2026, 10, 17, 14, 0, 5), "OK", {"B1": "OK"}))
+
+    data = tracker.snapshot(now=datetime(2026, 10, 17, 13, 59, 59))
+    assert (data["shift"]["name"], data["shift"]["ok"]) == ("2", 1)
+    # A record older than every tracked shift is not counted in any shift
+    tracker.record(record(datetime(2026, 10, 17, 13, 59, 58), "NG"))
+    assert tracker.snapshot(now=datetime(2026, 10, 17, 14, 1))["shift"]["ng"] == 0
+
+
+def test_load_before_the_newest_hourly_row(clock):
+    save(clock, datetime(2026, 10, 17, 14, 0, 5), "NG", {"B1": "NG"})
+
+    now = datetime(2026, 10, 17, 13, 59, 59)
+    tracker = StatsTracker()
+    tracker.load(now=now)
+    data = tracker.snapshot(now=now)
+    assert (data["shift"]["name"], data["shift"]["ng"]) == ("2", 1)
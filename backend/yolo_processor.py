@@ -1,21 +1,277 @@
+import ast
+import importlib.util
 import logging
+import os
 import random
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
-try:
-    from ultralytics import YOLO
-except ImportError:
-    YOLO = None
+import cv2
+import numpy as np
+
+from metrics import metrics
+
+# ultralytics (and torch) are only imported when a RealYoloProcessor is built: importing them
+# costs seconds and hundreds of MB, which MOCK mode never needs.
+ULTRALYTICS_AVAILABLE = importlib.util.find_spec("ultralytics") is not None
+ONNXRUNTIME_AVAILABLE = importlib.util.find_spec("onnxruntime") is not None
 
 logger = logging.getLogger("yolo_processor")
 
+def format_label(raw_label):
+    """Formats a model class name to match our dashboard IDs."""
+    return raw_label.replace(" ", "_").replace("(", "").replace(")", "").upper()
+
+# BGR colors for draw_detections(), picked per label so a bolt keeps its color across frames
+BOX_COLORS = [
+    (56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255), (49, 210, 207), (10, 249, 72),
+    (23, 204, 146), (134, 219, 61), (52, 147, 26), (187, 212, 0), (168, 153, 44), (255, 194, 0),
+    (147, 69, 52), (255, 115, 100), (236, 24, 0), (255, 56, 132), (133, 0, 82), (255, 56, 203),
+]
+
+def draw_detections(frame, details, copy=True):
+    """Draws the detection boxes and labels (like ultralytics Result.plot()), on a copy of frame by default."""
+    annotated = frame.copy() if copy else frame
+    for d in details:
+        x1, y1, x2, y2 = map(int, d["box"])
+        color = BOX_COLORS[zlib.crc32(d["label"].encode()) % len(BOX_COLORS)]
+        text = f"{d['label']} {d['conf']:.2f}" if "conf" in d else d["label"]
+        (tw, th), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), color, 2)
+        cv2.rectangle(annotated, (x1, max(0, y1 - th - 6)), (x1 + tw + 4, max(th + 6, y1)), color, -1)
+        cv2.putText(annotated, text, (x1 + 2, max(th + 2, y1 - 4)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
+    return annotated
+
+def normalize_detections(details, frame_shape):
+    """Detection details with boxes as 0..1 fractions of the frame size (resolution independent, for the frontend)."""
+    h, w = frame_shape[:2]
+    return [
+        {**d, "box": [round(d["box"][0] / w, 4), round(d["box"][1] / h, 4),
+                      round(d["box"][2] / w, 4), round(d["box"][3] / h, 4)]}
+        for d in details
+    ]
+
+class DetectionDecoder:
+    """
+    Vectorized post-processing of one image's detections, given as NumPy arrays
+    (class ids (N,), confidences (N,), xyxy boxes (N, 4)). Built once per model:
+    - class id -> label lookup table (formatted once, no per-box string work)
+    - class id -> confidence threshold (class_thresholds: {label: min_conf}, others keep the model's own)
+    - class id -> bolt mask, so 'detected' only lists known bolt IDs (bolt_ids=None: every label counts)
+    """
+    def __init__(self, names, class_thresholds=None, bolt_ids=None):
+        names = dict(enumerate(names)) if isinstance(names, (list, tuple)) else dict(names or {})
+        size = max(names) + 1 if names else 0
+        self.labels = np.array([format_label(str(names.get(i, i))) for i in range(size)], dtype=object)
+        self.thresholds = np.zeros(size, np.float32)
+        for label, threshold in (class_thresholds or {}).items():
+            self.thresholds[self.labels == label] = threshold
+        self.is_bolt = np.array([bolt_ids is None or label in bolt_ids for label in self.labels], dtype=bool)
+
+    def decode(self, class_ids, confs, boxes):
+        """Returns (detected bolt IDs, unique and in confidence order, detection details)."""
+        class_ids = np.asarray(class_ids, np.int64).reshape(-1)
+        confs = np.asarray(confs, np.float32).reshape(-1)
+        boxes = np.asarray(boxes, np.float32).reshape(-1, 4)
+
+        known = class_ids < len(self.labels)
+        class_ids, confs, boxes = class_ids[known], confs[known], boxes[known]
+        keep = confs >= self.thresholds[class_ids]
+        order = np.argsort(-confs[keep], kind="stable")
+        class_ids, confs, boxes = class_ids[keep][order], confs[keep][order], boxes[keep][order]
+
+        labels = self.labels[class_ids].tolist()
+        bolt_classes = class_ids[self.is_bolt[class_ids]]
+        _, first = np.unique(bolt_classes, return_index=True)
+        detected = self.labels[bolt_classes[np.sort(first)]].tolist()
+        details = [
+            {"label": label, "box": box, "conf": conf}
+            for label, box, conf in zip(labels, boxes.tolist(), confs.tolist())
+        ]
+        return detected, details
+
+# How the 'annotated' image returned by the processors is produced:
+# - "FULL":  full-resolution copy with boxes and labels drawn (original behaviour)
+# - "LIGHT": boxes drawn directly on a downscaled display copy (DISPLAY_MAX_WIDTH) for the live view; the pipeline
+#            has the full-resolution history image annotated off the critical path (ImageWriter)
+# - "JSON":  the raw frame is returned untouched; boxes travel as JSON to the dashboard/DB and the frontend draws them
+RENDER_MODES = ["FULL", "LIGHT", "JSON"]
+DISPLAY_MAX_WIDTH = 640
+
+def merge_regions(regions, margin=0.0):
+    """
+    Expands normalized (x1, y1, x2, y2) regions by margin, clamps them to [0, 1] and merges
+    overlapping ones, so every pixel is inferred at most once and no bolt is split between crops.
+    """
+    rects = [
+        [max(0.0, x1 - margin), max(0.0, y1 - margin), min(1.0, x2 + margin), min(1.0, y2 + margin)]
+        for x1, y1, x2, y2 in regions
+    ]
+    merged = True
+    while merged:
+        merged = False
+        result = []
+        for rect in rects:
+            for other in result:
+                if rect[0] < other[2] and other[0] < rect[2] and rect[1] < other[3] and other[1] < rect[3]:
+                    other[:] = [min(rect[0], other[0]), min(rect[1], other[1]),
+                                max(rect[2], other[2]), max(rect[3], other[3])]
+                    merged = True
+                    break
+            else:
+                result.append(rect)
+        rects = result
+    return [tuple(rect) for rect in rects]
+
 # Abstract Base Class
 class YoloProcessorBase:
     def __init__(self, model_path="best.pt"):
         self.model_path = model_path
+        self.rois = {} # {cam_key: [normalized (x1, y1, x2, y2) crop regions]}, see set_rois()
+        self.render_mode = "FULL"
+        self.names = {}
+        self.class_thresholds = {}
+        self.bolt_ids = None
+        self.decoder = DetectionDecoder(self.names)
+        self.infer_size = 640 # Longest side full frames are inferred at (the model's imgsz)
         
     def process(self, frame):
         raise NotImplementedError
 
+    def set_postprocessing(self, class_thresholds=None, bolt_ids=None):
+        """Configures per-class confidence thresholds ({label: min_conf}) and the known bolt IDs."""
+        self.class_thresholds = dict(class_thresholds or {})
+        self.bolt_ids = set(bolt_ids) if bolt_ids is not None else None
+        self._build_decoder()
+
+    def _build_decoder(self):
+        self.decoder = DetectionDecoder(self.names, self.class_thresholds, self.bolt_ids)
+
+    def _render(self, frame, details):
+        """Produces the 'annotated' image for the configured render mode (see RENDER_MODES)."""
+        if self.render_mode == "JSON":
+            return frame
+        if self.render_mode == "LIGHT":
+            h, w = frame.shape[:2]
+            if w <= DISPLAY_MAX_WIDTH:
+                return draw_detections(frame, details)
+            scale = DISPLAY_MAX_WIDTH / w
+            display = cv2.resize(frame, (DISPLAY_MAX_WIDTH, int(h * scale)), interpolation=cv2.INTER_AREA)
+            scaled = [{**d, "box": [v * scale for v in d["box"]]} for d in details]
+            return draw_detections(display, scaled, copy=False)
+        return draw_detections(frame, details)
+
+    def set_rois(self, layout, margin=0.02):
+        """
+        Enables ROI-only inference from a per-camera bolt layout:
+        {cam_key: {bolt_id: (x1, y1, x2, y2)}}, coordinates normalized to the frame size (0..1).
+        The regions of each camera are padded by margin and merged into non-overlapping crops.
+        Cameras without an entry keep full-frame inference.
+        """
+        self.rois = {cam_key: merge_regions(regions.values(), margin) for cam_key, regions in (layout or {}).items()}
+        for cam_key, crops in self.rois.items():
+            area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in crops)
+            logger.info(f"YOLO ROI: {cam_key} -> {len(crops)} crop(s), {area:.0%} of the frame")
+
+    def process_many(self, frames):
+        """
+        Runs detection on several camera frames, e.g. {"left": img, "right": img, "upper": img}.
+        Returns {cam_key: (detected, annotated, details)}, with None for missing frames.
+        With an ROI map (set_rois) only the configured crops of those cameras are inferred.
+        """
+        if not self.rois:
+            return self._process_frames(frames)
+        return self._process_rois(frames)
+
+    def _inference_size(self, shape, scale):
+        """Input size (h, w) an image of this shape is inferred at when resized by scale (multiples of the stride, 32)."""
+        return tuple(max(32, -(-int(round(side * scale)) // 32) * 32) for side in shape[:2])
+
+    def _process_rois(self, frames):
+        """
+        Infers the ROI crops of each camera at the pixel scale full-frame inference would use, so the
+        network sees fewer pixels instead of every crop being upscaled to the full model size.
+        Cameras without ROIs go through the normal full-frame path. Boxes are mapped back to frame coordinates.
+        """
+        full_frames = {}
+        crops = {}
+        offsets = {}
+        total_pixels = inferred_pixels = 0
+        for cam_key, frame in frames.items():
+            if frame is None or cam_key not in self.rois:
+                full_frames[cam_key] = frame
+                continue
+            h, w = frame.shape[:2]
+            scale = self.infer_size / max(h, w)
+            fh, fw = self._inference_size(frame.shape, scale)
+            total_pixels += fh * fw
+            for i, (x1, y1, x2, y2) in enumerate(self.rois[cam_key]):
+                px1, py1, px2, py2 = int(x1 * w), int(y1 * h), int(round(x2 * w)), int(round(y2 * h))
+                crop = frame[py1:py2, px1:px2]
+                if crop.size == 0:
+                    continue
+                crop_key = f"{cam_key}#roi{i}"
+                size = self._inference_size(crop.shape, scale)
+                crops[crop_key] = (crop, size)
+                offsets[crop_key] = (cam_key, px1, py1)
+                inferred_pixels += size[0] * size[1]
+        if total_pixels:
+            # Share of the network input pixels a full-frame inference of the same cameras would use
+            metrics.set_gauge("yolo.roi_pixel_fraction", round(inferred_pixels / total_pixels, 3))
+
+        results = self._process_frames(full_frames) if full_frames else {}
+        crop_results = self._infer_crops(crops)
+        merged = {cam_key: ([], []) for cam_key, frame in frames.items() if frame is not None and cam_key in self.rois}
+        for crop_key, (cam_key, dx, dy) in offsets.items():
+            detected, details = merged[cam_key]
+            crop_detected, crop_details = crop_results.get(crop_key, ([], []))
+            detected.extend(crop_detected)
+            for d in crop_details:
+                x1, y1, x2, y2 = d["box"]
+                details.append({**d, "box": [x1 + dx, y1 + dy, x2 + dx, y2 + dy]})
+        for cam_key, (detected, details) in merged.items():
+            # A bolt split across two crops must still be listed once
+            results[cam_key] = (list(dict.fromkeys(detected)), self._render(frames[cam_key], details), details)
+        return results
+
+    def _infer_crops(self, crops):
+        """
+        Detection without rendering on {crop_key: (image, (h, w) inference size)}.
+        Returns {crop_key: (detected, details)}. Default implementation ignores the size.
+        """
+        results = {}
+        for crop_key, (image, _) in crops.items():
+            detected, _, details = self.process(image)
+            results[crop_key] = (detected, details)
+        return results
+
+    def _process_frames(self, frames):
+        """Full-frame detection. Default implementation processes the frames one after another."""
+        results = {}
+        for cam_key, frame in frames.items():
+            results[cam_key] = self.process(frame) if frame is not None else None
+        return results
+
+    def warmup(self, frame_shape=(480, 640, 3), cameras=("left", "right", "upper"), runs=2):
+        """
+        Runs dummy inference on blank frames of frame_shape, exactly like a capture (same camera count,
+        so batched/parallel paths are initialized too). Pass the production camera size (main.py
+        WARMUP_FRAME_SHAPE) so the warm-up also covers the preprocessing of real frames.
+        Returns the duration of each run in ms; the first one is the cold (first-inference) time.
+        """
+        frames = {cam_key: np.zeros(frame_shape, np.uint8) for cam_key in cameras}
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            self.process_many(frames)
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    def close(self):
+        pass
+
 # Mock Implementation
 class MockYoloProcessor(YoloProcessorBase):
     def __init__(self, model_path="best.pt"):
@@ -54,53 +310,309 @@ class MockYoloProcessor(YoloProcessorBase):
         return detected, frame, details
 
 # Real Implementation
+# Inference modes for RealYoloProcessor.process_many():
+# - "SEQUENTIAL": one model call per camera, one after another (original behaviour)
+# - "BATCH":      all camera frames submitted as a single batched model call
+# - "PARALLEL":   one model call per camera on a worker pool (one model instance per worker,
+#                 since a single ultralytics predictor is not safe to share between threads)
+INFERENCE_MODES = ["SEQUENTIAL", "BATCH", "PARALLEL"]
+
 class RealYoloProcessor(YoloProcessorBase):
-    def __init__(self, model_path="best.pt"):
+    def __init__(self, model_path="best.pt", inference_mode="BATCH", max_workers=3):
         super().__init__(model_path)
         self.model = None
-        if YOLO:
+        self.inference_mode = inference_mode if inference_mode in INFERENCE_MODES else "SEQUENTIAL"
+        self.max_workers = max_workers
+        self._executor = None
+        self._local = threading.local()
+        self._yolo_cls = None
+        if ULTRALYTICS_AVAILABLE:
             try:
+                from ultralytics import YOLO
+                self._yolo_cls = YOLO
                 self.model = YOLO(model_path)
-                logger.info(f"REAL YOLO: Loaded model from {model_path}")
+                self.names = self.model.names
+                self._build_decoder()
+                logger.info(f"REAL YOLO: Loaded model from {model_path} (Inference mode: {self.inference_mode})")
             except Exception:
                 logger.exception(f"REAL YOLO Error loading model from {model_path}")
         else:
             logger.error("ultralytics not installed! Real mode will fail.")
 
+    def _decode_result(self, result):
+        """Returns (detected, details) of a single ultralytics Result."""
+        # Whole tensors are moved to NumPy once; box coordinates (xyxy) are kept for cropping
+        boxes = result.boxes
+        return self.decoder.decode(boxes.cls.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.xyxy.cpu().numpy())
+
+    def _parse_result(self, result):
+        """Converts a single ultralytics Result into the (detected, annotated, details) tuple."""
+        detected, detection_details = self._decode_result(result)
+
+        # Extract the image with drawn bounding boxes
+        if self.render_mode == "FULL":
+            annotated_frame = result.plot()
+        else:
+            annotated_frame = self._render(result.orig_img, detection_details)
+        return detected, annotated_frame, detection_details
+
     def process(self, frame):
         if not self.model or frame is None:
-            return [], frame
-            
+            return [], frame, []
+
+        return self._run(self.model, frame)
+
+    def _run(self, model, frame):
         detected = []
-        detection_details = [] # Store raw details like boxes for cropping
+        detection_details = []
         annotated_frame = frame
         try:
-            results = self.model(frame)
+            results = model(frame)
             for result in results:
-                for box in result.boxes:
-                     class_id = int(box.cls)
-                     raw_label = self.model.names[class_id]
-                     
-                     # Format the label to match our dashboard IDs...
-                     formatted_label = raw_label.replace(" ", "_").replace("(", "").replace(")", "").upper()
-                     detected.append(formatted_label)
-
-                     # Store box coordinates for cropping (xyxy format)
-                     detection_details.append({
-                         "label": formatted_label,
-                         "box": box.xyxy[0].tolist() 
-                     })
-                     
-                # Extract the image with drawn bounding boxes
-                annotated_frame = result.plot()
-                
+                detected, annotated_frame, detection_details = self._parse_result(result)
         except Exception as e:
             logger.error(f"YOLO Inference Error: {e}")
-            
+
         return detected, annotated_frame, detection_details
 
+    def _infer_crops(self, crops):
+        """ROI crops: one call per crop at its own (small) imgsz, decoded without plotting."""
+        results = {}
+        for crop_key, (image, size) in crops.items():
+            results[crop_key] = ([], [])
+            if not self.model:
+                continue
+            try:
+                results[crop_key] = self._decode_result(self.model(image, imgsz=list(size))[0])
+            except Exception as e:
+                logger.error(f"YOLO ROI Inference Error: {e}")
+        return results
+
+    def _process_frames(self, frames):
+        if not self.model or self.inference_mode == "SEQUENTIAL":
+            return super()._process_frames(frames)
+
+        results = {cam_key: None for cam_key in frames}
+        valid = {cam_key: frame for cam_key, frame in frames.items() if frame is not None}
+        if not valid:
+            return results
+
+        if self.inference_mode == "BATCH":
+            results.update(self._process_batch(valid))
+        else:
+            results.update(self._process_parallel(valid))
+        return results
+
+    def _process_batch(self, frames):
+        """Submits all frames as one batched model call."""
+        keys = list(frames.keys())
+        try:
+            batch_results = self.model([frames[k] for k in keys])
+            return {
+                cam_key: self._parse_result(result)
+                for cam_key, result in zip(keys, batch_results)
+            }
+        except Exception as e:
+            logger.error(f"YOLO Batch Inference Error: {e}")
+            return {cam_key: ([], frames[cam_key], []) for cam_key in keys}
+
+    def _worker_model(self):
+        """Returns the model instance owned by the current worker thread."""
+        model = getattr(self._local, "model", None)
+        if model is None:
+            model = self._yolo_cls(self.model_path)
+            self._local.model = model
+            logger.info(f"REAL YOLO: Loaded worker model for {threading.current_thread().name}")
+        return model
+
+    def _process_parallel(self, frames):
+        """Fans the frames out to the worker pool, one model call per camera."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="yolo")
+
+        futures = {
+            cam_key: self._executor.submit(lambda f=frame: self._run(self._worker_model(), f))
+            for cam_key, frame in frames.items()
+        }
+        return {cam_key: future.result() for cam_key, future in futures.items()}
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+# Exported CPU backend (see export_model.py): the same network as ONNX, run with onnxruntime.
+# The OpenVINO execution provider is used automatically when onnxruntime-openvino is installed.
+# - "PYTORCH": best.pt through ultralytics (RealYoloProcessor)
+# - "ONNX":    best.onnx / best-int8.onnx through onnxruntime (OnnxYoloProcessor)
+YOLO_BACKENDS = ["PYTORCH", "ONNX"]
+
+def letterbox(frame, size, color=(114, 114, 114)):
+    """
+    Resizes frame to fit size (h, w) keeping the aspect ratio and pads the rest (ultralytics preprocessing).
+    Returns (image, ratio, (pad_x, pad_y)).
+    """
+    h, w = frame.shape[:2]
+    ratio = min(size[0] / h, size[1] / w)
+    new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+    pad_x, pad_y = (size[1] - new_w) / 2, (size[0] - new_h) / 2
+    if (new_w, new_h) != (w, h):
+        frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    image = cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+    return image, ratio, (pad_x, pad_y)
+
+def to_blob(images):
+    """Stacks letterboxed BGR images into a float32 NCHW RGB batch in [0, 1]."""
+    batch = np.stack(images)[..., ::-1].transpose(0, 3, 1, 2)
+    return np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+
+class OnnxYoloProcessor(YoloProcessorBase):
+    def __init__(self, model_path="best.onnx", conf_threshold=0.25, iou_threshold=0.7, max_det=300):
+        super().__init__(model_path)
+        # Same defaults as ultralytics predict(), so results match the PyTorch backend
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.max_det = max_det
+        self.session = None
+        self.imgsz = (640, 640)
+        self.dynamic_batch = False
+        self.dynamic_shape = False # Input height/width not fixed: ROI crops can be inferred at their own size
+        if not ONNXRUNTIME_AVAILABLE:
+            logger.error("onnxruntime not installed! ONNX backend will fail.")
+            return
+        try:
+            import onnxruntime as ort
+            available = ort.get_available_providers()
+            providers = [p for p in ("OpenVINOExecutionProvider", "CPUExecutionProvider") if p in available]
+            self.session = ort.InferenceSession(model_path, providers=providers)
+            self._read_metadata()
+            logger.info(f"ONNX YOLO: Loaded model from {model_path} (Providers: {self.session.get_providers()}, "
+                        f"Input: {self.imgsz}, Dynamic batch: {self.dynamic_batch})")
+        except Exception:
+            logger.exception(f"ONNX YOLO Error loading model from {model_path}")
+            self.session = None
+
+    def _read_metadata(self):
+        """Reads class names and input size from the metadata ultralytics embeds in exported models."""
+        meta = self.session.get_modelmeta().custom_metadata_map
+        if "names" in meta:
+            self.names = {int(k): v for k, v in ast.literal_eval(meta["names"]).items()}
+            self._build_decoder()
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        height, width = model_input.shape[2:]
+        if isinstance(height, int) and isinstance(width, int):
+            self.imgsz = (height, width)
+        else:
+            self.dynamic_shape = True
+            if "imgsz" in meta:
+                self.imgsz = tuple(ast.literal_eval(meta["imgsz"]))
+        self.infer_size = max(self.imgsz)
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+
+    def set_rois(self, layout, margin=0.02):
+        super().set_rois(layout, margin)
+        if self.rois and self.session and not self.dynamic_shape:
+            logger.warning(f"ONNX YOLO: {self.model_path} has a fixed input size, ROI crops are inferred at "
+                           f"{self.imgsz} (export with dynamic=True to infer them at their own size).")
+
+    def _inference_size(self, shape, scale):
+        if not self.dynamic_shape:
+            return self.imgsz
+        return super()._inference_size(shape, scale)
+
+    def process(self, frame):
+        if not self.session or frame is None:
+            return [], frame, []
+        return self._process_frames({"frame": frame})["frame"]
+
+    def _process_frames(self, frames):
+        results = {cam_key: None for cam_key in frames}
+        valid = {cam_key: frame for cam_key, frame in frames.items() if frame is not None}
+        if not self.session:
+            results.update({cam_key: ([], frame, []) for cam_key, frame in valid.items()})
+            return results
+
+        keys = list(valid.keys())
+        try:
+            if self.dynamic_batch:
+                outputs = self._infer([valid[k] for k in keys])
+            else:
+                outputs = [self._infer([valid[k]])[0] for k in keys]
+            results.update(zip(keys, outputs))
+        except Exception as e:
+            logger.error(f"ONNX YOLO Inference Error: {e}")
+            results.update({cam_key: ([], valid[cam_key], []) for cam_key in keys})
+        return results
+
+    def _infer_crops(self, crops):
+        """ROI crops: one session call per crop, letterboxed to its own size when the model input is dynamic."""
+        results = {}
+        for crop_key, (image, size) in crops.items():
+            results[crop_key] = ([], [])
+            if not self.session:
+                continue
+            try:
+                letterboxed, ratio, pad = letterbox(image, size)
+                prediction = self.session.run(None, {self.input_name: to_blob([letterboxed])})[0][0]
+                results[crop_key] = self._decode(prediction, image.shape, ratio, pad)
+            except Exception as e:
+                logger.error(f"ONNX YOLO ROI Inference Error: {e}")
+        return results
+
+    def _infer(self, frames):
+        """Runs one batched session call; returns a (detected, annotated, details) tuple per frame."""
+        letterboxed = [letterbox(frame, self.imgsz) for frame in frames]
+        output = self.session.run(None, {self.input_name: to_blob([img for img, _, _ in letterboxed])})[0]
+        return [
+            self._postprocess(prediction, frame, ratio, pad)
+            for prediction, frame, (_, ratio, pad) in zip(output, frames, letterboxed)
+        ]
+
+    def _postprocess(self, prediction, frame, ratio, pad):
+        """Decodes one output and renders it: (detected, annotated, details)."""
+        detected, detection_details = self._decode(prediction, frame.shape, ratio, pad)
+        return detected, self._render(frame, detection_details), detection_details
+
+    def _decode(self, prediction, frame_shape, ratio, pad):
+        """Decodes one (4 + classes, anchors) YOLOv8 output: threshold, undo letterbox, class-wise NMS."""
+        prediction = prediction.T
+        class_ids = prediction[:, 4:].argmax(axis=1)
+        scores = prediction[np.arange(len(prediction)), 4 + class_ids]
+        keep = scores > self.conf_threshold
+        boxes, scores, class_ids = prediction[keep, :4], scores[keep], class_ids[keep]
+
+        # (cx, cy, w, h) in letterboxed pixels -> (x, y, w, h) in frame pixels
+        boxes = np.column_stack([boxes[:, :2] - boxes[:, 2:] / 2, boxes[:, 2:]])
+        boxes[:, :2] -= pad
+        boxes /= ratio
+
+        if len(boxes):
+            indices = np.array(cv2.dnn.NMSBoxesBatched(
+                boxes.tolist(), scores.tolist(), class_ids.tolist(), self.conf_threshold, self.iou_threshold
+            ), np.int64).reshape(-1)
+            indices = indices[np.argsort(-scores[indices], kind="stable")][:self.max_det]
+            boxes, scores, class_ids = boxes[indices], scores[indices], class_ids[indices]
+
+        # (x, y, w, h) -> xyxy clipped to the frame
+        h, w = frame_shape[:2]
+        xyxy = np.column_stack([boxes[:, :2], boxes[:, :2] + boxes[:, 2:]])
+        np.clip(xyxy, 0, [w, h, w, h], out=xyxy)
+        return self.decoder.decode(class_ids, scores, xyxy)
+
 # Factory Function
-def get_yolo_processor(mode="MOCK", model_path="best.pt"):
+def get_yolo_processor(mode="MOCK", model_path="best.pt", inference_mode="BATCH", backend="PYTORCH",
+                       onnx_path="best.onnx", rois=None, render_mode="FULL", class_thresholds=None, bolt_ids=None):
+    processor = _create_yolo_processor(mode, model_path, inference_mode, backend, onnx_path)
+    if rois and not isinstance(processor, MockYoloProcessor):
+        processor.set_rois(rois)
+    processor.set_postprocessing(class_thresholds, bolt_ids)
+    processor.render_mode = render_mode if render_mode in RENDER_MODES else "FULL"
+    return processor
+
+def _create_yolo_processor(mode, model_path, inference_mode, backend, onnx_path):
     if mode == "REAL" or mode == "TEST": 
         # TEST mode can utilize REAL YOLO if desired, or Mock YOLO. 
         # User asked for "Mock code", "Testing code (images from dir)", "Real code".
@@ -115,9 +627,15 @@ def get_yolo_processor(mode="MOCK", model_path="best.pt"):
         # Usually yes. But if they just want to test Layout, Mock YOLO is fine.
         # I will default TEST to use RealYolo, but fallback to Mock if import fails logic is inside Real Class?
         # Actually, let's allow "TEST" to use RealYoloProcessor.
-        if YOLO:
+        if backend == "ONNX":
+            if ONNXRUNTIME_AVAILABLE and os.path.exists(onnx_path):
+                logger.info(f"Initializing ONNX YOLO Processor ({onnx_path}) for Mode: " + mode)
+                return OnnxYoloProcessor(onnx_path)
+            logger.warning(f"ONNX backend unavailable (onnxruntime installed: {ONNXRUNTIME_AVAILABLE}, "
+                           f"model: {onnx_path}), falling back to PyTorch.")
+        if ULTRALYTICS_AVAILABLE:
             logger.info("Initializing REAL YOLO Processor for Mode: " + mode)
-            return RealYoloProcessor(model_path)
+            return RealYoloProcessor(model_path, inference_mode=inference_mode)
         else:
             logger.warning("Ultralytics missing, falling back to MOCK YOLO for Mode: " + mode)
             return MockYoloProcessor(model_path)
@@ -5,6 +5,13 @@ const WS_URL = `${protocol}//${host}/ws`;
 const API_URL = `${window.location.protocol}//${host}/api`;
 
 let historyData = [];
+let historyNextCursor = null;
+let historyReloadTimer = null;
+
+// Live state merged from the WS "full" snapshot + "delta" messages
+let liveState = { system: {}, statuses: {}, images: {} };
+// Image version currently shown in each live <img>, so src is only touched on change
+const shownImageVersions = {};
 let selectedHistoryItem = null;
 let currentHistoryCamera = 'right';
 
@@ -59,6 +66,9 @@ const elements = {
         search: document.getElementById('search-frame-id'),
         filterFrom: document.getElementById('filter-from'),
         filterTo: document.getElementById('filter-to'),
+        filterResult: document.getElementById('filter-result'),
+        filterNgBolt: document.getElementById('filter-ng-bolt'),
+        loadMore: document.getElementById('btn-load-more'),
         details: {
             frame: document.getElementById('hist-detail-frame'),
             model: document.getElementById('hist-detail-model'),
@@ -83,7 +93,76 @@ function switchTab(tabId) {
 
     if (tabId === 'history') {
         loadHistory();
+    } else {
+        updateMonitoringDashboard(liveState);
+    }
+    redrawAllOverlays(); // Overlays of hidden tabs were laid out at zero size
+}
+
+// --- Detection Overlays ---
+// With the backend render mode "JSON", images arrive without drawn boxes; the normalized boxes
+// ({label, box: [x1, y1, x2, y2] in 0..1, conf}) are drawn here on a canvas over the <img>.
+const overlayBoxes = new Map(); // img element -> boxes (or null)
+const overlayCanvases = new Map(); // img element -> canvas
+
+function setImageOverlay(imgEl, boxes) {
+    if (!boxes && !overlayBoxes.has(imgEl)) return;
+    overlayBoxes.set(imgEl, boxes || null);
+    if (!overlayCanvases.has(imgEl)) {
+        const canvas = document.createElement('canvas');
+        canvas.className = 'detection-overlay';
+        imgEl.insertAdjacentElement('afterend', canvas);
+        overlayCanvases.set(imgEl, canvas);
+        imgEl.addEventListener('load', () => drawImageOverlay(imgEl));
     }
+    // Boxes belong to the new image: draw once it has loaded (or clear right away if there is none)
+    if (!imgEl.getAttribute('src') || imgEl.complete) drawImageOverlay(imgEl);
+}
+
+function drawImageOverlay(imgEl) {
+    const canvas = overlayCanvases.get(imgEl);
+    if (!canvas) return;
+    const width = imgEl.offsetWidth;
+    const height = imgEl.offsetHeight;
+    const dpr = window.devicePixelRatio || 1;
+    canvas.style.left = `${imgEl.offsetLeft}px`;
+    canvas.style.top = `${imgEl.offsetTop}px`;
+    canvas.style.width = `${width}px`;
+    canvas.style.height = `${height}px`;
+    canvas.width = Math.round(width * dpr);
+    canvas.height = Math.round(height * dpr);
+
+    const ctx = canvas.getContext('2d');
+    ctx.setTransform(dpr, 0, 0, dpr, 0, 0);
+    ctx.clearRect(0, 0, width, height);
+    const boxes = overlayBoxes.get(imgEl);
+    if (!boxes || !boxes.length || !imgEl.getAttribute('src') || !imgEl.naturalWidth) return;
+
+    // Area actually covered by the picture inside the element (object-fit: contain)
+    const scale = Math.min(width / imgEl.naturalWidth, height / imgEl.naturalHeight);
+    const contentW = imgEl.naturalWidth * scale;
+    const contentH = imgEl.naturalHeight * scale;
+    const offsetX = (width - contentW) / 2;
+    const offsetY = (height - contentH) / 2;
+
+    ctx.lineWidth = 2;
+    ctx.font = '10px Inter, sans-serif';
+    ctx.textBaseline = 'bottom';
+    boxes.forEach(({ label, box, conf }) => {
+        const x = offsetX + box[0] * contentW;
+        const y = offsetY + box[1] * contentH;
+        const text = conf !== undefined ? `${label} ${conf.toFixed(2)}` : label;
+        ctx.strokeStyle = '#01B763';
+        ctx.strokeRect(x, y, (box[2] - box[0]) * contentW, (box[3] - box[1]) * contentH);
+        ctx.fillStyle = '#01B763';
+        ctx.fillRect(x, Math.max(0, y - 12), ctx.measureText(text).width + 4, 12);
+        ctx.fillStyle = '#000';
+        ctx.fillText(text, x + 2, Math.max(12, y));
+    });
+}
+
+function redrawAllOverlays() {
+    overlayCanvases.forEach((_, imgEl) => drawImageOverlay(imgEl));
 }
 
 // --- WS Performance Analytics (For Research Logging) ---
@@ -119,7 +198,7 @@ function connectWebSocket() {
                 }
                 ws_lastLatency = latency;
 
-                // Log a summary every 50 packets (~10 Seconds)
+                // Log a summary every 50 packets (messages are only sent when the state changes)
                 if (ws_messageCount % 50 === 0) {
                     console.log(`%c--- WS Performance Report (${ws_messageCount} Packets) ---`, 'color: #01B763; font-weight: bold;');
                     console.log(`Avg Latency: ${(ws_totalLatency / ws_messageCount).toFixed(2)} ms`);
@@ -130,7 +209,8 @@ function connectWebSocket() {
                 }
             }
 
-            updateMonitoringDashboard(data);
+            applyStateMessage(data);
+            updateMonitoringDashboard(liveState);
         } catch (e) {
             console.error("WS Error:", e);
         }
@@ -138,6 +218,22 @@ function connectWebSocket() {
     socket.onclose = () => setTimeout(connectWebSocket, 3000);
 }
 
+function applyStateMessage(data) {
+    if (data.type === 'full') {
+        liveState = {
+            system: data.system || {},
+            bolt_data: data.bolt_data,
+            statuses: data.statuses || {},
+            images: data.images || {}
+        };
+    } else {
+        Object.assign(liveState.system, data.system || {});
+        Object.assign(liveState.statuses, data.statuses || {});
+        Object.assign(liveState.images, data.images || {});
+    }
+    liveState.version = data.version;
+}
+
 function updateMonitoringDashboard(state) {
     if (!elements.tabs.monitoring.classList.contains('active')) return;
 
@@ -178,10 +274,13 @@ function updateMonitoringDashboard(state) {
 
         // 1. Update Images
         if (state.images) {
-            for (const [key, b64] of Object.entries(state.images)) {
+            for (const [key, image] of Object.entries(state.images)) {
                 const imgEl = elements.monitoring.images[key];
-                if (imgEl) {
-                    imgEl.src = b64 || "";
+                const version = image ? image.version : null;
+                if (imgEl && shownImageVersions[key] !== version) {
+                    imgEl.src = image ? image.url : "";
+                    shownImageVersions[key] = version;
+                    setImageOverlay(imgEl, image ? image.boxes : null);
                 }
             }
         }
@@ -241,47 +340,46 @@ function updateMonitoringDashboard(state) {
 }
 
 // --- History Logic ---
-async function loadHistory() {
+// Filtering and pagination happen server-side (/api/history with keyset cursor)
+function buildHistoryQuery(cursor) {
+    const params = new URLSearchParams({ limit: 50 });
+    const searchTerm = elements.history.search.value.trim();
+    if (searchTerm) params.set('frame_id', searchTerm);
+    if (elements.history.filterFrom.value) params.set('date_from', elements.history.filterFrom.value);
+    if (elements.history.filterTo.value) params.set('date_to', elements.history.filterTo.value);
+    if (elements.history.filterResult.value) params.set('result', elements.history.filterResult.value);
+    if (elements.history.filterNgBolt.value) params.set('ng_bolt', elements.history.filterNgBolt.value);
+    if (cursor) params.set('cursor', cursor);
+    return params.toString();
+}
+
+async function loadHistory(append = false) {
     try {
-        const response = await fetch(`${API_URL}/history`);
+        const cursor = append ? historyNextCursor : null;
+        const response = await fetch(`${API_URL}/history?${buildHistoryQuery(cursor)}`);
         const json = await response.json();
         if (json.status === 'success') {
-            historyData = json.data;
+            historyData = append ? historyData.concat(json.data) : json.data;
+            historyNextCursor = json.next_cursor;
             renderHistoryTable();
+        } else {
+            console.error("History query failed:", json.message);
         }
     } catch (e) {
         console.error("Failed to load history:", e);
     }
 }
 
-function renderHistoryTable() {
-    const searchTerm = elements.history.search.value.toLowerCase().trim();
-    const fromDate = elements.history.filterFrom.value;
-    const toDate = elements.history.filterTo.value;
-
-    console.log(`Filtering: search="${searchTerm}", from="${fromDate}", to="${toDate}"`);
+// Debounced reload for filter inputs (search typing fires on every key)
+function scheduleHistoryReload() {
+    clearTimeout(historyReloadTimer);
+    historyReloadTimer = setTimeout(() => loadHistory(false), 300);
+}
 
+function renderHistoryTable() {
     elements.history.tbody.innerHTML = '';
 
-    const filtered = historyData.filter(item => {
-        // Search Filter
-        const matchesSearch = !searchTerm || item.frame_id.toLowerCase().includes(searchTerm);
-
-        // Date Filters
-        let matchesDate = true;
-
-        if (fromDate || toDate) {
-            const itemTime = new Date(item.check_time).getTime();
-            if (fromDate && itemTime < new Date(fromDate).getTime()) matchesDate = false;
-            if (toDate && itemTime > new Date(toDate).getTime()) matchesDate = false;
-        }
-
-        return matchesSearch && matchesDate;
-    });
-
-    console.log(`Filtered items: ${filtered.length}`);
-
-    filtered.forEach(item => {
+    historyData.forEach(item => {
         const tr = document.createElement('tr');
         if (selectedHistoryItem && selectedHistoryItem.id === item.id) tr.classList.add('selected');
         tr.innerHTML = `
@@ -293,6 +391,8 @@ function renderHistoryTable() {
         tr.onclick = () => selectHistoryItem(item, tr);
         elements.history.tbody.appendChild(tr);
     });
+
+    elements.history.loadMore.disabled = !historyNextCursor;
 }
 
 function selectHistoryItem(item, rowEl) {
@@ -349,6 +449,11 @@ function updateHistoryDetailPanel() {
 
     elements.history.details.image1.src = img1 ? `/history_images/${img1}` : "";
     elements.history.details.image2.src = img2 ? `/history_images/${img2}` : "";
+
+    // Boxes stored with the record (render mode JSON) are drawn over the raw images
+    const detections = selectedHistoryItem.detections || {};
+    setImageOverlay(elements.history.details.image1, detections[`${side}_step1`]);
+    setImageOverlay(elements.history.details.image2, detections[`${side}_step2`]);
 }
 
 // --- Engine Toggle API ---
@@ -430,6 +535,7 @@ document.addEventListener('DOMContentLoaded', () => {
     updateDateTime();
     setInterval(updateDateTime, 1000);
     connectWebSocket();
+    window.addEventListener('resize', redrawAllOverlays);
 
     // System Control Buttons
     const engineToggleBtn = document.getElementById('btn-toggle-engine');
@@ -452,15 +558,24 @@ document.addEventListener('DOMContentLoaded', () => {
     elements.navBtns.history.onclick = () => switchTab('history');
 
     // Search and Filter Listeners
-    elements.history.search.addEventListener('input', renderHistoryTable);
+    Object.values(boltHierarchy).flat().forEach(boltId => {
+        const option = document.createElement('option');
+        option.value = boltId;
+        option.textContent = boltId.replace(/_/g, ' ');
+        elements.history.filterNgBolt.appendChild(option);
+    });
+    elements.history.search.addEventListener('input', scheduleHistoryReload);
     elements.history.search.addEventListener('keydown', (e) => {
         if (e.key === 'Enter') {
-            console.log("Search Enter pressed");
-            renderHistoryTable();
+            clearTimeout(historyReloadTimer);
+            loadHistory(false);
         }
     });
-    elements.history.filterFrom.addEventListener('change', renderHistoryTable);
-    elements.history.filterTo.addEventListener('change', renderHistoryTable);
+    elements.history.filterFrom.addEventListener('change', () => loadHistory(false));
+    elements.history.filterTo.addEventListener('change', () => loadHistory(false));
+    elements.history.filterResult.addEventListener('change', () => loadHistory(false));
+    elements.history.filterNgBolt.addEventListener('change', () => loadHistory(false));
+    elements.history.loadMore.onclick = () => loadHistory(true);
 
     // Camera Navigation Buttons
     document.querySelectorAll('.cam-btn').forEach(btn => {